@@ -2,21 +2,23 @@
 # All comments and user messages are in English (requirement)
 
 from datetime import datetime
+from decimal import Decimal, InvalidOperation, ROUND_HALF_UP
 
 # -----------------------------
 # CONSTANTS
 # -----------------------------
 FORMATO_FECHA = "%Y-%m-%d %H:%M:%S"
+CENTAVOS_POR_UNIDAD = 100
 
 # -----------------------------
-# INITIAL DATA (5 required)
+# INITIAL DATA (5 required, prices in cents)
 # -----------------------------
 productos = {
-    1: {'titulo': "El Camino Python", 'autor': "Ana Torres", 'categoria': "Programación", 'precio': 29.90, 'stock': 10, 'vendidos': 0},
-    2: {'titulo': "Estructuras de Datos", 'autor': "Luis Gómez", 'categoria': "Informática", 'precio': 24.50, 'stock': 8, 'vendidos': 0},
-    3: {'titulo': "Algoritmos Básicos", 'autor': "Ana Torres", 'categoria': "Programación", 'precio': 34.75, 'stock': 5, 'vendidos': 0},
-    4: {'titulo': "Literatura Universal", 'autor': "Claudia Ríos", 'categoria': "Ficción", 'precio": 15.00, 'stock': 20, 'vendidos': 0},
-    5: {'titulo': "Redes para Principiantes", 'autor': "Diego Pérez", 'categoria': "Redes", 'precio': 39.99, 'stock': 4, 'vendidos': 0}
+    1: {'titulo': "El Camino Python", 'autor': "Ana Torres", 'categoria': "Programación", 'precio': 2990, 'stock': 10, 'vendidos': 0},
+    2: {'titulo': "Estructuras de Datos", 'autor': "Luis Gómez", 'categoria': "Informática", 'precio': 2450, 'stock': 8, 'vendidos': 0},
+    3: {'titulo': "Algoritmos Básicos", 'autor': "Ana Torres", 'categoria': "Programación", 'precio': 3475, 'stock': 5, 'vendidos': 0},
+    4: {'titulo': "Literatura Universal", 'autor': "Claudia Ríos", 'categoria': "Ficción", 'precio': 1500, 'stock': 20, 'vendidos': 0},
+    5: {'titulo': "Redes para Principiantes", 'autor': "Diego Pérez", 'categoria': "Redes", 'precio': 3999, 'stock': 4, 'vendidos': 0}
 }
 
 ventas = []
@@ -36,15 +38,22 @@ def validarEnteroPositivo(valorStr, nombreCampo="value"):
     except:
         raise ValueError(f"Invalid {nombreCampo}. Enter a positive integer.")
 
-def validarFloatNoNegativo(valorStr, nombreCampo="value"):
-    """Validate non-negative float."""
+def validarDineroNoNegativo(valorStr, nombreCampo="value"):
+    """Validate non-negative amount of money, returned in cents."""
     try:
-        v = float(valorStr)
-        if v < 0:
-            raise ValueError(f"{nombreCampo} must be non-negative.")
-        return v
-    except:
+        v = Decimal(valorStr.strip().lstrip("$"))
+        centavos = int((v * CENTAVOS_POR_UNIDAD).quantize(Decimal(1), rounding=ROUND_HALF_UP))
+    except (InvalidOperation, ValueError):
         raise ValueError(f"Invalid {nombreCampo}. Enter a non-negative number.")
+    if centavos < 0:
+        raise ValueError(f"{nombreCampo} must be non-negative.")
+    return centavos
+
+def formatearDinero(centavos):
+    """Format cents as an amount with two decimals."""
+    signo = "-" if centavos < 0 else ""
+    unidades, resto = divmod(abs(centavos), CENTAVOS_POR_UNIDAD)
+    return f"{signo}{unidades}.{resto:02d}"
 
 # -----------------------------
 # PRODUCT CRUD FUNCTIONS
@@ -57,7 +66,7 @@ def listarProductos():
     print("\nID | Título | Autor | Categoría | Precio | Stock")
     print("-" * 60)
     for pid, p in productos.items():
-        print(f"{pid} | {p['titulo']} | {p['autor']} | {p['categoria']} | ${p['precio']:.2f} | {p['stock']}")
+        print(f"{pid} | {p['titulo']} | {p['autor']} | {p['categoria']} | ${formatearDinero(p['precio'])} | {p['stock']}")
     print()
 
 def verProducto():
@@ -85,7 +94,7 @@ def agregarProducto():
         titulo = input("Title: ").strip()
         autor = input("Author: ").strip()
         categoria = input("Category: ").strip()
-        precio = validarFloatNoNegativo(input("Price: "), "price")
+        precio = validarDineroNoNegativo(input("Price: "), "price")
         stock = validarEnteroPositivo(input("Stock: "), "stock")
 
         if not titulo or not autor or not categoria:
@@ -126,8 +135,8 @@ def actualizarProducto():
     categoria = input(f"Category [{p['categoria']}]: ").strip() or p['categoria']
 
     try:
-        precioStr = input(f"Price [{p['precio']}]: ").strip()
-        precio = p['precio'] if precioStr == "" else validarFloatNoNegativo(precioStr, "price")
+        precioStr = input(f"Price [{formatearDinero(p['precio'])}]: ").strip()
+        precio = p['precio'] if precioStr == "" else validarDineroNoNegativo(precioStr, "price")
 
         stockStr = input(f"Stock [{p['stock']}]: ").strip()
         stock = p['stock'] if stockStr == "" else validarEnteroPositivo(stockStr, "stock")
@@ -191,8 +200,10 @@ def registrarVenta():
         return
 
     precioUnitario = producto['precio']
+    # Integer cents; the discount is rounded half-up via basis points
     totalBruto = precioUnitario * cantidad
-    totalNeto = totalBruto * (1 - descuento / 100)
+    montoDescuento = (totalBruto * round(descuento * 100) + 5000) // 10000
+    totalNeto = totalBruto - montoDescuento
 
     venta = {
         'id': idVentaSiguiente,
@@ -202,8 +213,8 @@ def registrarVenta():
         'fecha': datetime.now().strftime(FORMATO_FECHA),
         'descuento': descuento,
         'precioUnitario': precioUnitario,
-        'totalBruto': round(totalBruto, 2),
-        'totalNeto': round(totalNeto, 2)
+        'totalBruto': totalBruto,
+        'totalNeto': totalNeto
     }
 
     ventas.append(venta)
@@ -222,7 +233,7 @@ def listarVentas():
     print("\nID | Cliente | Producto | Cantidad | Fecha | Bruto | Neto")
     print("-" * 80)
     for v in ventas:
-        print(f"{v['id']} | {v['cliente']} | {v['idProducto']} | {v['cantidad']} | {v['fecha']} | ${v['totalBruto']} | ${v['totalNeto']}")
+        print(f"{v['id']} | {v['cliente']} | {v['idProducto']} | {v['cantidad']} | {v['fecha']} | ${formatearDinero(v['totalBruto'])} | ${formatearDinero(v['totalNeto'])}")
     print()
 
 # -----------------------------
@@ -254,7 +265,7 @@ def ventasPorAutor():
 
     print("\nAuthor | Units | Gross | Net")
     for autor, r in resumen.items():
-        print(f"{autor} | {r['unidades']} | ${r['bruto']:.2f} | ${r['neto']:.2f}")
+        print(f"{autor} | {r['unidades']} | ${formatearDinero(r['bruto'])} | ${formatearDinero(r['neto'])}")
     print()
 
 def resumenIngresos():
@@ -263,8 +274,8 @@ def resumenIngresos():
     totalNeto = sum(map(lambda v: v['totalNeto'], ventas))
 
     print("\nIncome Summary:")
-    print(f"Gross: ${totalBruto:.2f}")
-    print(f"Net:   ${totalNeto:.2f}\n")
+    print(f"Gross: ${formatearDinero(totalBruto)}")
+    print(f"Net:   ${formatearDinero(totalNeto)}\n")
 
 # -----------------------------
 # MAIN MENU (SWITCH-CASE)
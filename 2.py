@@ -5,58 +5,381 @@ Date: November 2024
 Description: A robust system for managing bookstore inventory, sales, and generating dynamic reports.
 """
 
+import argparse
+import base64
+import contextlib
+import hashlib
+import heapq
+import json
+import math
+import mmap
+import os
+import queue
+import re
+import socket
+import struct
+import sys
+import tempfile
+import threading
+import time
+import unicodedata
+import zlib
+from bisect import bisect_left, bisect_right
+from collections import OrderedDict
 from datetime import datetime
-from typing import Dict, List, Tuple
+from decimal import Decimal, InvalidOperation, ROUND_HALF_UP
+from functools import lru_cache
+from itertools import islice
+from typing import Dict, Iterable, Iterator, List, Optional, Set, Tuple
+
+try:
+    import numpy as np
+except ImportError:  # Forecasting is unavailable without NumPy
+    np = None
 
 # Constants
+DATE_FORMAT = "%Y-%m-%d %H:%M:%S"
 MIN_STOCK = 0
-MIN_PRICE = 0.0
+MIN_PRICE = 0
 MIN_QUANTITY = 1
 
-# Pre-loaded inventory with 5 products
+# Money is stored as integer cents; discounts are applied in basis points
+CENTS_PER_UNIT = 100
+BASIS_POINTS_PER_PERCENT = 100
+
+# Catalogue search settings
+SEARCH_FIELDS = ("title", "author", "category")
+SEARCH_NGRAM_SIZE = 3
+SEARCH_MIN_SIMILARITY = 0.3
+SEARCH_RESULT_LIMIT = 10
+
+# Product fields kept in each catalogue version
+VERSIONED_FIELDS = ("title", "author", "category", "price", "stock")
+
+# Streaming analytics error bounds: counts are within EPSILON * total units
+# with probability 1 - DELTA; distinct customers within HLL_ERROR (one std. dev.)
+STREAM_EPSILON = 0.001
+STREAM_DELTA = 0.01
+STREAM_HLL_ERROR = 0.01
+STREAM_TOP_K = 10
+
+# Rolling revenue windows: (label, seconds per slot, number of slots)
+ROLLING_WINDOWS = (
+    ("Last 5 minutes", 1, 300),
+    ("Last hour", 60, 60),
+    ("Last 24 hours", 60, 1440)
+)
+ROLLING_METRICS = ("revenue", "units", "discount")
+
+# Log-shipping replication
+REPLICATION_HOST = "127.0.0.1"
+REPLICATION_PORT = 5050
+REPLICATION_HEARTBEAT = 1.0
+REPLICATION_RETRY_DELAY = 1.0
+
+# Mutation log retention: entries kept for replicas to catch up from (the
+# log is cut back to this once it is twice as long); a replica further
+# behind is sent a checkpoint of the whole state instead
+MUTATION_LOG_RETAIN = 10000
+
+# Change-data-capture stream: events per delivery batch, how many events
+# are kept for lagging subscribers, how many already acknowledged events
+# stay available to new subscribers, and subscriber retry/ack timing
+CDC_BATCH_SIZE = 256
+CDC_MAX_BACKLOG = 100000
+CDC_RETAIN_ACKED = 1000
+CDC_RETRY_DELAY = 1.0
+CDC_ACK_TIMEOUT = 5.0
+CDC_HEARTBEAT = 1.0
+
+# Stock reservations: default hold time and the timing wheel that expires
+# holds (TIMING_WHEEL_LEVELS wheels of 2**TIMING_WHEEL_BITS one-tick slots)
+RESERVATION_TTL = 900
+RESERVATION_TICK = 1.0
+TIMING_WHEEL_BITS = 6
+TIMING_WHEEL_LEVELS = 4
+
+# Demand forecasting: history length, smoothing factor, moving-average
+# window, supplier lead time, review period and service-level z-score
+FORECAST_HISTORY_DAYS = 90
+FORECAST_ALPHA = 0.3
+FORECAST_MA_WINDOW = 28
+FORECAST_LEAD_TIME_DAYS = 7
+FORECAST_REVIEW_DAYS = 14
+FORECAST_SERVICE_Z = 1.65
+FORECAST_REPORT_LIMIT = 20
+
+# What-if pricing: discount policies tried for every price change (label,
+# flat discount % or None, cap on historical discounts %), how many
+# scenario x group cells to evaluate per chunk, and rows to show
+PRICING_POLICIES = (
+    ("As sold", None, 100.0),
+    ("No discounts", 0.0, 100.0),
+    ("Cap at 10%", None, 10.0),
+    ("Cap at 25%", None, 25.0)
+)
+PRICING_CHUNK_CELLS = 4_000_000
+PRICING_REPORT_LIMIT = 10
+
+# Tiered sales storage: sales older than HOT_SALES_DAYS are sealed into
+# compressed per-month segment files (in a temporary directory if None)
+HOT_SALES_DAYS = 30
+SALES_ARCHIVE_DIR: Optional[str] = None
+SEGMENT_COMPRESSION_LEVEL = 6
+
+# OLAP cube: base dimensions, levels derived from them, measures kept per
+# cell, discount bands (upper bound %, label) and how many group-bys to
+# keep materialized alongside the base cuboid
+OLAP_DIMENSIONS = ("product", "author", "category", "customer", "day", "discount_band")
+OLAP_DERIVED_LEVELS = {"month": ("day", 7), "year": ("day", 4)}
+OLAP_MEASURES = ("units", "gross", "discount", "net", "sales")
+DISCOUNT_BANDS = ((0, "none"), (10, "1-10%"), (25, "11-25%"), (50, "26-50%"), (100, "51-100%"))
+OLAP_MAX_CUBOIDS = 32
+
+# Ad-hoc queries: queryable fields per store and their types
+# ("text", "int", "money", "float"), and how many compiled plans to cache
+QUERY_FIELDS = {
+    "inventory": {"id": "int", "title": "text", "author": "text", "category": "text",
+                  "price": "money", "stock": "int"},
+    "sales": {"sale_id": "int", "customer": "text", "product_id": "int",
+              "product_title": "text", "author": "text", "category": "text",
+              "quantity": "int", "unit_price": "money", "subtotal": "money",
+              "discount_percent": "float", "discount_amount": "money", "total": "money",
+              "date": "text", "day": "text"}
+}
+QUERY_PLAN_CACHE_SIZE = 256
+QUERY_TOKEN_PATTERN = re.compile(
+    r"\s*(?:(?P<number>\d+(?:\.\d+)?)|(?P<string>\"[^\"]*\"|'[^']*')|"
+    r"(?P<op>==|!=|<=|>=|<|>|\(|\))|(?P<word>[A-Za-z_]+))")
+
+# Idempotent sale submission: how many recent request ids are remembered,
+# and the false-positive rate of the Bloom prefilter (None disables it)
+SALE_DEDUP_WINDOW = 100000
+SALE_DEDUP_BLOOM_ERROR: Optional[float] = 0.01
+
+# Promotions: customer tiers (lowest first), what a rule can target and
+# the kinds of rule ("percent" off, or "buy_get": buy N get M free)
+CUSTOMER_TIERS = ("Regular", "Silver", "Gold")
+PROMOTION_SCOPES = ("product", "author", "category", "all")
+PROMOTION_KINDS = ("percent", "buy_get")
+
+# Receipts: templates (filled by render_receipt), how many receipts may
+# wait for the writer thread before sales block, and how many it writes
+# per batch
+RECEIPT_WIDTH = 50
+RECEIPT_TEMPLATES = {
+    "sale": ("\n{rule}\n{heading}\n{rule}\n"
+             "Customer: {customer}\n"
+             "Product: {product_title}\n"
+             "Quantity: {quantity}\n"
+             "Unit Price: ${unit_price}\n"
+             "Subtotal: ${subtotal}\n"
+             "{discount_line}"
+             "Total: ${total}\n"
+             "Date: {date}\n"
+             "{rule}\n"),
+    "return": ("\n{rule}\n{heading}\n{rule}\n"
+               "Original Sale: #{returns_sale_id}\n"
+               "Customer: {customer}\n"
+               "Product: {product_title}\n"
+               "Quantity Returned: {quantity}\n"
+               "Refund: ${total}\n"
+               "Date: {date}\n"
+               "{rule}\n")
+}
+RECEIPT_QUEUE_SIZE = 1000
+RECEIPT_BATCH_SIZE = 64
+
+# Mutations that can change a product's price or stock, and so its value
+VALUATION_OPS = ("add_product", "update_product", "delete_product", "sale", "return")
+
+# Reports menu entries that run against a read snapshot instead of the lock
+SNAPSHOT_REPORTS = {'1', '2', '3', '10'}
+
+# Reports menu entries that take their own snapshot or lock: after their
+# prompts, so nothing is held while the user types, or together with a
+# copy of the aggregates they compare against the ledger
+SELF_GUARDED_REPORTS = {'4', '5', '7', '12', '13', '17'}
+
+# Snapshot-read benchmark: seconds per run and reports run concurrently
+SNAPSHOT_BENCHMARK_SECONDS = 3.0
+SNAPSHOT_BENCHMARK_READERS = 2
+
+# Catalogue snapshots: header (magic, version, product count, string count,
+# snapshot time) and one fixed-size record per product, sorted by id
+# (id, title/author/category string numbers, price in cents, stock)
+CATALOGUE_MAGIC = b"BOOKCAT\x00"
+CATALOGUE_VERSION = 1
+CATALOGUE_HEADER = struct.Struct("<8sIIId")
+CATALOGUE_RECORD = struct.Struct("<IIIIqi")
+CATALOGUE_BENCHMARK_SIZES = (1000, 10000, 100000, 1000000)
+
+# Money benchmark: sale totals summed per representation, generated per chunk
+MONEY_BENCHMARK_SALES = 10_000_000
+MONEY_BENCHMARK_CHUNK = 1_000_000
+
+# Workload capture/replay log format version
+WORKLOAD_LOG_VERSION = 1
+
+# Pre-loaded inventory with 5 products (prices in cents)
 inventory: Dict[int, Dict] = {
     1: {
         "title": "One Hundred Years of Solitude",
         "author": "Gabriel García Márquez",
         "category": "Fiction",
-        "price": 25.99,
+        "price": 2599,
         "stock": 15
     },
     2: {
         "title": "The Alchemist",
         "author": "Paulo Coelho",
         "category": "Fiction",
-        "price": 18.50,
+        "price": 1850,
         "stock": 20
     },
     3: {
         "title": "Sapiens",
         "author": "Yuval Noah Harari",
         "category": "Non-Fiction",
-        "price": 22.00,
+        "price": 2200,
         "stock": 12
     },
     4: {
         "title": "Educated",
         "author": "Tara Westover",
         "category": "Biography",
-        "price": 19.99,
+        "price": 1999,
         "stock": 8
     },
     5: {
         "title": "Becoming",
         "author": "Michelle Obama",
         "category": "Biography",
-        "price": 24.99,
+        "price": 2499,
         "stock": 10
     }
 }
 
-# Sales records storage
+# Sales records storage: recent (hot) sales in memory, older ones sealed
+# into compressed segments described by sales_segments
 sales_records: List[Dict] = []
+sales_segments: List[Dict] = []
+
+# Amounts already refunded per sale id: [units, subtotal, discount, total]
+sale_returns: Dict[int, List[int]] = {}
 
-# Product ID counter
+# Product and sale ID counters
 next_product_id = 6
+next_sale_id = 1
+
+# Trigram inverted index: trigram -> product ids, plus each product's trigrams.
+# After a catalogue snapshot is loaded the index is rebuilt on first search.
+search_index: Dict[str, Set[int]] = {}
+search_terms: Dict[int, Set[str]] = {}
+search_index_ready = True
+
+# Catalogue history: product id -> (sorted valid-from timestamps, versions).
+# A version is a tuple of VERSIONED_FIELDS, or None once the product is deleted.
+product_versions: Dict[int, Tuple[List[float], List[Optional[Tuple]]]] = {}
+
+# Constant-memory sketches fed by every sale (created once functions are defined)
+stream_sketches: Dict = {}
+
+# Ring buffers behind the rolling metrics, one per ROLLING_WINDOWS entry
+rolling_windows: List[Dict] = []
+
+# OLAP cube: dimension tuple -> {cell key -> measures}; the base cuboid
+# (all OLAP_DIMENSIONS) is always kept for the hot sales, others once they
+# are queried (rolled up from the base cuboid and the sealed segments)
+olap_cuboids: Dict[Tuple[str, ...], Dict[Tuple, List[int]]] = {OLAP_DIMENSIONS: {}}
+
+# Stock on hand valued at list price (cents): totals plus, per category and
+# per author, [value, units, products]. Kept up to date by apply_mutation;
+# after a catalogue snapshot is loaded it is rebuilt when first needed.
+inventory_valuation: Dict = {"ready": False, "value": 0, "units": 0, "products": 0,
+                             "category": {}, "author": {}}
+
+# Recent committed mutations in order; replicas replay them to build their
+# copy. log_state["base"] is the seq just before the first retained entry.
+mutation_log: List[Dict] = []
+log_state: Dict = {"base": 0, "truncated": 0, "checkpoints": 0}
+
+# Typed change events (oldest retained first) derived from each committed
+# mutation, the offset just before the first retained one, and subscribers
+change_events: List[Dict] = []
+change_stream: Dict = {"base": 0, "subscribers": {}, "trimmed": 0}
+
+# Serializes writers against readers of the shared state, and wakes the
+# replication and change-stream threads whenever the log grows
+state_lock = threading.RLock()
+log_updated = threading.Condition()
+
+# Per-thread read snapshot taken by snapshot_reads(); reports running
+# inside one see a fixed view of the inventory and the sales ledger
+read_snapshots = threading.local()
+
+# Log seq of each open read snapshot -> how many are open at it, and, while
+# any are open, each changed product's earlier versions: product_id ->
+# ((seq of the change, product before it or None), ...) in seq order
+open_snapshots: Dict[int, int] = {}
+replaced_products: Dict[int, Tuple[Tuple[int, Optional[Dict]], ...]] = {}
+
+# Recent sale request ids -> recorded sale (least recently used first),
+# plus the current and previous Bloom filter generations in front of it
+sale_requests: "OrderedDict[str, Dict]" = OrderedDict()
+sale_request_filters: List[Dict] = []
+sale_request_stats: Dict[str, int] = {"inserted": 0, "duplicates": 0, "prefiltered": 0}
+
+# Promotion rules by id, the rule index (scope, value) -> rule ids that
+# pricing probes, and each customer's tier (normalized name -> tier number)
+promotions: Dict[int, Dict] = {}
+promotion_index: Dict[Tuple[str, object], Set[int]] = {}
+customer_tiers: Dict[str, int] = {}
+next_promotion_id = 1
+
+# Receipts waiting for the writer thread, and where they are written
+# (None: the terminal)
+receipt_queue: "queue.Queue[Tuple[str, Dict]]" = queue.Queue(maxsize=RECEIPT_QUEUE_SIZE)
+receipt_state: Dict = {"thread": None, "path": None, "written": 0, "batches": 0}
+
+# Stock holds: reservation id -> hold, and units held per product
+reservations: Dict[int, Dict] = {}
+reserved_stock: Dict[int, int] = {}
+next_reservation_id = 1
+
+# Hierarchical timing wheel of reservation ids, keyed by expiry tick
+timing_wheel: Dict = {
+    "tick": int(time.time() // RESERVATION_TICK),
+    "levels": [[set() for _ in range(1 << TIMING_WHEEL_BITS)]
+               for _ in range(TIMING_WHEEL_LEVELS)]
+}
+
+# Workload capture/replay: mode ("live", "record" or "replay"), log file or
+# recorded events, timed operations in progress and latency samples, and
+# while replaying, the recording's start and the recorded wall-clock time
+# of the latest input
+workload_state: Dict = {
+    "mode": "live",
+    "log": None,
+    "events": [],
+    "position": 0,
+    "speed": 1.0,
+    "started": 0.0,
+    "recorded": 0.0,
+    "clock": 0.0,
+    "operations": [],
+    "latencies": {}
+}
+
+# Role of this process and replication progress
+replication_state: Dict = {
+    "role": "standalone",
+    "replicas": {},
+    "primary_seq": 0,
+    "applied_seq": 0,
+    "lag_seconds": 0.0,
+    "connected": False
+}
 
 
 # ==================== VALIDATION FUNCTIONS ====================
@@ -74,7 +397,7 @@ def validate_positive_number(prompt: str, number_type=float) -> float:
     """
     while True:
         try:
-            value = number_type(input(prompt))
+            value = number_type(prompt_input(prompt))
             if value <= 0:
                 print("Error: Value must be positive.")
                 continue
@@ -83,6 +406,27 @@ def validate_positive_number(prompt: str, number_type=float) -> float:
             print(f"Error: Please enter a valid {number_type._name_}.")
 
 
+def validate_money(prompt: str) -> int:
+    """
+    Validates and returns a positive amount of money from user input.
+    
+    Args:
+        prompt: Message to display to user
+    
+    Returns:
+        Amount in cents
+    """
+    while True:
+        try:
+            value = parse_money(prompt_input(prompt))
+            if value <= MIN_PRICE:
+                print("Error: Value must be positive.")
+                continue
+            return value
+        except ValueError:
+            print("Error: Please enter a valid amount.")
+
+
 def validate_non_empty_string(prompt: str) -> str:
     """
     Validates and returns a non-empty string from user input.
@@ -94,7 +438,7 @@ def validate_non_empty_string(prompt: str) -> str:
         Non-empty string
     """
     while True:
-        value = input(prompt).strip()
+        value = prompt_input(prompt).strip()
         if value:
             return value
         print("Error: This field cannot be empty.")
@@ -102,7 +446,7 @@ def validate_non_empty_string(prompt: str) -> str:
 
 def validate_stock(quantity: int, product_id: int) -> bool:
     """
-    Validates if there is sufficient stock for a sale.
+    Validates if there is sufficient unreserved stock for a sale.
     
     Args:
         quantity: Requested quantity
@@ -113,247 +457,4588 @@ def validate_stock(quantity: int, product_id: int) -> bool:
     """
     if product_id not in inventory:
         return False
-    return inventory[product_id]["stock"] >= quantity
+    return available_stock(product_id) >= quantity
 
 
-# ==================== INVENTORY MANAGEMENT ====================
+# ==================== MONEY ====================
+
+def parse_money(text: str) -> int:
+    """
+    Converts a typed amount such as "25.99" or "$7" into cents.
+    
+    Args:
+        text: Amount as entered by the user
+    
+    Returns:
+        Amount in cents, rounded half-up to the nearest cent
+    
+    Raises:
+        ValueError: If the text is not a number
+    """
+    try:
+        amount = Decimal(text.strip().lstrip("$"))
+    except InvalidOperation:
+        raise ValueError(f"Invalid amount: {text!r}")
+    if not amount.is_finite():
+        raise ValueError(f"Invalid amount: {text!r}")
+    return int((amount * CENTS_PER_UNIT).quantize(Decimal(1), rounding=ROUND_HALF_UP))
+
+
+def format_money(cents: int) -> str:
+    """
+    Formats an amount in cents for display, e.g. 2599 -> "25.99".
+    
+    Args:
+        cents: Amount in cents
+    
+    Returns:
+        Amount with two decimals
+    """
+    sign = "-" if cents < 0 else ""
+    units, remainder = divmod(abs(cents), CENTS_PER_UNIT)
+    return f"{sign}{units}.{remainder:02d}"
+
+
+def calculate_sale_totals(unit_price: int, quantity: int, discount: float) -> Tuple[int, int, int]:
+    """
+    Calculates the totals of a sale line in exact integer arithmetic.
+    
+    Args:
+        unit_price: Price per unit in cents
+        quantity: Units sold
+        discount: Discount percentage (0-100)
+    
+    Returns:
+        Tuple of (subtotal, discount_amount, total) in cents
+    """
+    subtotal = unit_price * quantity
+    basis_points = round(discount * BASIS_POINTS_PER_PERCENT)
+    full = 100 * BASIS_POINTS_PER_PERCENT
+    discount_amount = (subtotal * basis_points + full // 2) // full
+    return subtotal, discount_amount, subtotal - discount_amount
+
+
+def benchmark_money_sums(sales: int = MONEY_BENCHMARK_SALES,
+                         chunk: int = MONEY_BENCHMARK_CHUNK) -> None:
+    """
+    Times summing sale totals held as floats, Decimals, integer cents and
+    an int64 NumPy column, and shows how far each sum is from exact.
+    
+    Totals are generated in chunks (so the Decimal run fits in memory)
+    and only the summing is timed.
+    
+    Args:
+        sales: Number of synthetic sale totals
+        chunk: Totals generated and summed per chunk
+    """
+    if np is None:
+        print("Error: NumPy is required to generate the benchmark ledger.")
+        return
+    
+    rng = np.random.default_rng(0)
+    full = 100 * BASIS_POINTS_PER_PERCENT
+    timings = {"float": 0.0, "Decimal": 0.0, "int cents": 0.0, "numpy int64": 0.0}
+    sums = {"float": 0.0, "Decimal": Decimal(0), "int cents": 0, "numpy int64": 0}
+    for start in range(0, sales, chunk):
+        size = min(chunk, sales - start)
+        subtotal = rng.integers(500, 5000, size) * rng.integers(1, 4, size)
+        basis_points = rng.choice([0, 500, 1000, 1500, 2500], size)
+        cents = subtotal - (subtotal * basis_points + full // 2) // full
+        columns = {
+            "float": (cents / CENTS_PER_UNIT).tolist(),
+            "Decimal": [Decimal(value).scaleb(-2) for value in cents.tolist()],
+            "int cents": cents.tolist(),
+            "numpy int64": cents
+        }
+        for name, column in columns.items():
+            started = time.perf_counter()
+            total = column.sum() if name == "numpy int64" else sum(column)
+            timings[name] += time.perf_counter() - started
+            sums[name] += int(total) if name == "numpy int64" else total
+    
+    # Every sum as exact dollars: floats and Decimals already are, cents are scaled
+    dollars = {
+        "float": Decimal(sums["float"]),
+        "Decimal": sums["Decimal"],
+        "int cents": Decimal(sums["int cents"]).scaleb(-2),
+        "numpy int64": Decimal(sums["numpy int64"]).scaleb(-2)
+    }
+    print("\n" + "="*60)
+    print(f"SUM OF {sales:,} SALE TOTALS".center(60))
+    print("="*60)
+    print(f"{'Representation':<16} {'Seconds':<10} {'Error (cents)':<16}")
+    print("-"*60)
+    for name, seconds in timings.items():
+        error = (dollars[name] - dollars["int cents"]) * CENTS_PER_UNIT
+        print(f"{name:<16} {seconds:<10.3f} {float(error):<16.4f}")
+    print(f"\nExact total: ${format_money(sums['int cents'])}")
+    print("="*60)
+
+
+# ==================== CATALOGUE SEARCH ====================
+
+def normalize_text(text: str) -> str:
+    """
+    Normalizes text for searching: casefolded, accent-stripped and with
+    punctuation collapsed to single spaces.
+    
+    Args:
+        text: Text to normalize
+    
+    Returns:
+        Normalized text
+    """
+    decomposed = unicodedata.normalize("NFKD", text.casefold())
+    stripped = "".join(ch for ch in decomposed if not unicodedata.combining(ch))
+    return " ".join("".join(ch if ch.isalnum() else " " for ch in stripped).split())
+
+
+def extract_ngrams(text: str) -> Set[str]:
+    """
+    Splits text into the padded character n-grams used by the search index.
+    
+    Args:
+        text: Raw text (normalized internally)
+    
+    Returns:
+        Set of n-grams
+    """
+    ngrams = set()
+    padding = " " * (SEARCH_NGRAM_SIZE - 1)
+    for word in normalize_text(text).split():
+        padded = f"{padding}{word} "
+        for i in range(len(padded) - SEARCH_NGRAM_SIZE + 1):
+            ngrams.add(padded[i:i + SEARCH_NGRAM_SIZE])
+    return ngrams
+
+
+def index_product(product_id: int) -> None:
+    """
+    Adds or refreshes a product in the search index.
+    
+    Args:
+        product_id: Product identifier
+    """
+    if not search_index_ready:
+        return  # Picked up when the index is rebuilt
+    unindex_product(product_id)
+    product = inventory[product_id]
+    terms = set()
+    for field in SEARCH_FIELDS:
+        terms |= extract_ngrams(str(product[field]))
+    for term in terms:
+        search_index.setdefault(term, set()).add(product_id)
+    search_terms[product_id] = terms
+
+
+def unindex_product(product_id: int) -> None:
+    """
+    Removes a product from the search index.
+    
+    Args:
+        product_id: Product identifier
+    """
+    for term in search_terms.pop(product_id, ()):
+        postings = search_index[term]
+        postings.discard(product_id)
+        if not postings:
+            del search_index[term]
+
+
+def rebuild_search_index() -> None:
+    """Rebuilds the search index from the whole inventory."""
+    global search_index_ready
+    search_index.clear()
+    search_terms.clear()
+    search_index_ready = True
+    for product_id in inventory:
+        index_product(product_id)
+
+
+def search_products(query: str, limit: int = SEARCH_RESULT_LIMIT) -> List[Tuple[int, float]]:
+    """
+    Finds products whose title, author or category fuzzily match a query.
+    
+    Candidates are gathered only from the rarest query n-grams: a product
+    sharing fewer than the required number of n-grams cannot appear in
+    any of them, so the common n-grams are only probed for scoring.
+    
+    Args:
+        query: Free text (case and accents are ignored)
+        limit: Maximum number of results
+    
+    Returns:
+        List of (product_id, similarity) pairs, best match first
+    """
+    if not search_index_ready:
+        rebuild_search_index()
+    query_terms = sorted(extract_ngrams(query),
+                         key=lambda term: len(search_index.get(term, ())))
+    if not query_terms:
+        return []
+    
+    required = max(1, int(len(query_terms) * SEARCH_MIN_SIMILARITY + 0.999999))
+    prefix = len(query_terms) - required + 1
+    
+    candidates: Dict[int, int] = {}
+    for term in query_terms[:prefix]:
+        for product_id in search_index.get(term, ()):
+            candidates[product_id] = candidates.get(product_id, 0) + 1
+    
+    results = []
+    for product_id, shared in candidates.items():
+        for term in query_terms[prefix:]:
+            if product_id in search_index.get(term, ()):
+                shared += 1
+        if shared >= required:
+            results.append((product_id, shared / len(query_terms)))
+    
+    results.sort(key=lambda x: (-x[1], x[0]))
+    return results[:limit]
+
+
+def select_product_id(prompt: str) -> int:
+    """
+    Reads a product ID, or searches the catalogue when text is entered.
+    
+    Args:
+        prompt: Message to display to user
+    
+    Returns:
+        Selected product ID, or 0 if nothing was selected
+    """
+    value = prompt_input(prompt).strip()
+    if value.isdigit():
+        return int(value)
+    
+    matches = search_products(value)
+    if not matches:
+        print("No matching products found.")
+        return 0
+    
+    print(f"\n{'#':<4} {'ID':<5} {'Title':<30} {'Author':<25} {'Match':<6}")
+    print("-"*70)
+    for number, (product_id, score) in enumerate(matches, 1):
+        product = inventory[product_id]
+        print(f"{number:<4} {product_id:<5} {product['title']:<30} "
+              f"{product['author']:<25} {score:<6.0%}")
+    
+    choice = prompt_input("Select a result number (Enter to cancel): ").strip()
+    if choice.isdigit() and 1 <= int(choice) <= len(matches):
+        return matches[int(choice) - 1][0]
+    return 0
+
+
+def search_catalogue() -> None:
+    """Searches the catalogue by title, author or category."""
+    print("\n=== SEARCH CATALOGUE ===")
+    query = validate_non_empty_string("Enter search text: ")
+    matches = search_products(query)
+    
+    if not matches:
+        print("No matching products found.")
+        return
+    
+    print(f"\n{'ID':<5} {'Title':<30} {'Author':<20} {'Category':<12} {'Match':<6}")
+    print("-"*80)
+    for product_id, score in matches:
+        product = inventory[product_id]
+        print(f"{product_id:<5} {product['title']:<30} {product['author']:<20} "
+              f"{product['category']:<12} {score:<6.0%}")
+
+
+# ==================== CATALOGUE HISTORY ====================
+
+def record_product_version(product_id: int, timestamp: Optional[float] = None) -> None:
+    """
+    Records the current state of a product as a new catalogue version.
+    
+    The new version is valid from the timestamp until the next one. A
+    product that is no longer in the inventory is recorded as deleted.
+    
+    Args:
+        product_id: Product identifier
+        timestamp: Start of validity (defaults to now)
+    """
+    if timestamp is None:
+        timestamp = current_time()
+    if product_id not in product_versions:
+        baseline = snapshot_baseline(product_id)
+        product_versions[product_id] = ([baseline[0]], [baseline[1]]) if baseline else ([], [])
+    product = inventory.get(product_id)
+    version = tuple(product[field] for field in VERSIONED_FIELDS) if product else None
+    
+    valid_from, versions = product_versions[product_id]
+    if valid_from and timestamp <= valid_from[-1]:
+        # Same instant (or clock stepped back): the latest version wins
+        versions[-1] = version
+        return
+    valid_from.append(timestamp)
+    versions.append(version)
+
+
+def product_as_of(product_id: int, timestamp: float) -> Optional[Dict]:
+    """
+    Looks up a product as it was at a point in time.
+    
+    Args:
+        product_id: Product identifier
+        timestamp: Point in time (seconds since the epoch)
+    
+    Returns:
+        Product fields valid at that time, or None if it did not exist
+    """
+    if product_id not in product_versions:
+        # Untouched since the catalogue snapshot was loaded (if any)
+        baseline = snapshot_baseline(product_id)
+        if baseline is None or timestamp < baseline[0]:
+            return None
+        return dict(zip(VERSIONED_FIELDS, baseline[1]))
+    valid_from, versions = product_versions[product_id]
+    position = bisect_right(valid_from, timestamp) - 1
+    if position < 0 or versions[position] is None:
+        return None
+    return dict(zip(VERSIONED_FIELDS, versions[position]))
+
+
+def inventory_as_of(timestamp: float) -> List[Tuple[int, Dict]]:
+    """
+    Reconstructs the catalogue at a point in time.
+    
+    Args:
+        timestamp: Point in time (seconds since the epoch)
+    
+    Returns:
+        List of (product_id, product) pairs that existed at that time
+    """
+    catalogue = []
+    product_ids = set(product_versions)
+    if isinstance(inventory, LazyCatalogue):
+        product_ids.update(snapshot_product_ids(inventory.snapshot))
+    for product_id in sorted(product_ids):
+        product = product_as_of(product_id, timestamp)
+        if product is not None:
+            catalogue.append((product_id, product))
+    return catalogue
+
+
+def count_sales_as_of(as_of: Optional[float]) -> int:
+    """
+    Counts the hot (in-memory) sales registered up to a point in time.
+    
+    Sales are appended in date order, so the ledger prefix is found by
+    binary search and reports can iterate it without copying.
+    
+    Args:
+        as_of: Point in time, or None for all sales
+    
+    Returns:
+        Number of leading hot sales on or before as_of
+    """
+    _, hot, count = visible_ledger()
+    if as_of is None:
+        return count
+    cutoff = datetime.fromtimestamp(as_of).strftime(DATE_FORMAT)
+    return bisect_right(hot, cutoff, hi=count, key=lambda sale: sale['date'])
+
+
+def parse_timestamp(text: str) -> float:
+    """
+    Parses a date typed by the user. A bare date means the end of that day.
+    
+    Args:
+        text: "YYYY-MM-DD" or "YYYY-MM-DD HH:MM:SS"
+    
+    Returns:
+        Seconds since the epoch
+    
+    Raises:
+        ValueError: If the text is not a valid date
+    """
+    text = text.strip()
+    try:
+        return datetime.strptime(text, DATE_FORMAT).timestamp()
+    except ValueError:
+        day = datetime.strptime(text, "%Y-%m-%d")
+        return day.replace(hour=23, minute=59, second=59).timestamp()
+
+
+def view_price_history() -> None:
+    """Displays every recorded version of a product."""
+    product_id = select_product_id("\nEnter product ID or search text: ")
+    with snapshot_reads() as snapshot:
+        if product_id in product_versions:
+            # The history only grows at the end, so the versions recorded
+            # up to the snapshot are a stable prefix
+            valid_from, versions = product_versions[product_id]
+            count = bisect_right(valid_from, snapshot["ts"])
+            history = list(zip(valid_from[:count], versions[:count]))
+        else:
+            # Untouched since the catalogue snapshot was loaded (if any)
+            baseline = snapshot_baseline(product_id)
+            history = [] if baseline is None else [baseline]
+    if not history:
+        print("Error: Product not found.")
+        return
+    
+    print(f"\n{'Valid From':<20} {'Title':<30} {'Price':<10} {'Stock':<8}")
+    print("-"*70)
+    for timestamp, version in history:
+        date = datetime.fromtimestamp(timestamp).strftime(DATE_FORMAT)
+        if version is None:
+            print(f"{date:<20} (deleted)")
+            continue
+        product = dict(zip(VERSIONED_FIELDS, version))
+        print(f"{date:<20} {product['title']:<30} "
+              f"${format_money(product['price']):<9} {product['stock']:<8}")
+
+
+def reports_as_of() -> None:
+    """Runs the inventory and sales reports as of a past date."""
+    try:
+        as_of = parse_timestamp(prompt_input("\nAs of (YYYY-MM-DD [HH:MM:SS]): "))
+    except ValueError:
+        print("Error: Invalid date format.")
+        return
+    
+    with snapshot_reads():
+        view_inventory(as_of)
+        generate_top_products_report(as_of)
+        generate_sales_by_author_report(as_of)
+        generate_financial_summary(as_of)
+
+
+# ==================== CATALOGUE SNAPSHOTS ====================
+
+class LazyCatalogue(dict):
+    """
+    Inventory backed by a memory-mapped catalogue snapshot.
+    
+    Products are decoded into ordinary product dicts the first time they
+    are looked up, so a sale touches only the records it needs. Iterating
+    the whole catalogue decodes whatever is still pending, in id order.
+    """
+    
+    def __init__(self, snapshot: Dict):
+        super().__init__()
+        self.snapshot = snapshot
+        self.pending = bytearray(b"\x01") * snapshot["count"]
+        self.pending_count = snapshot["count"]
+    
+    def pending_position(self, product_id) -> int:
+        position = snapshot_position(self.snapshot, product_id)
+        return position if position >= 0 and self.pending[position] else -1
+    
+    def load(self, position: int) -> Dict:
+        product_id, product = read_snapshot_product(self.snapshot, position)
+        dict.__setitem__(self, product_id, product)
+        self.pending[position] = 0
+        self.pending_count -= 1
+        return product
+    
+    def load_all(self) -> None:
+        if not self.pending_count:
+            return
+        snapshot = self.snapshot
+        strings = read_snapshot_strings(snapshot)
+        records = snapshot["data"][snapshot["records_offset"]:snapshot["offsets_offset"]]
+        loaded = dict(dict.items(self))
+        products = {}
+        for position, (product_id, title, author, category, price, stock) in enumerate(
+                CATALOGUE_RECORD.iter_unpack(records)):
+            if self.pending[position]:
+                product = {"title": strings[title], "author": strings[author],
+                           "category": strings[category], "price": price, "stock": stock}
+            elif product_id in loaded:
+                product = loaded.pop(product_id)
+            else:
+                continue  # Deleted
+            products[product_id] = product
+        products.update(loaded)
+        dict.clear(self)
+        dict.update(self, products)
+        self.pending = bytearray(self.snapshot["count"])
+        self.pending_count = 0
+    
+    def __missing__(self, product_id) -> Dict:
+        position = self.pending_position(product_id)
+        if position < 0:
+            raise KeyError(product_id)
+        return self.load(position)
+    
+    def __contains__(self, product_id) -> bool:
+        return dict.__contains__(self, product_id) or self.pending_position(product_id) >= 0
+    
+    def __len__(self) -> int:
+        return dict.__len__(self) + self.pending_count
+    
+    def __iter__(self):
+        self.load_all()
+        return dict.__iter__(self)
+    
+    def __setitem__(self, product_id, product) -> None:
+        position = self.pending_position(product_id)
+        dict.__setitem__(self, product_id, product)
+        if position >= 0:
+            self.pending[position] = 0
+            self.pending_count -= 1
+    
+    def __delitem__(self, product_id) -> None:
+        self[product_id]
+        dict.__delitem__(self, product_id)
+    
+    def get(self, product_id, default=None):
+        return self[product_id] if product_id in self else default
+    
+    def keys(self):
+        self.load_all()
+        return dict.keys(self)
+    
+    def values(self):
+        self.load_all()
+        return dict.values(self)
+    
+    def items(self):
+        self.load_all()
+        return dict.items(self)
+
+
+def write_catalogue_snapshot(path: str, products: Optional[Iterable[Tuple[int, Dict]]] = None) -> None:
+    """
+    Writes a catalogue snapshot: a header, fixed-size product records
+    sorted by id, and a string table in which each distinct title, author
+    and category is stored once (offsets followed by UTF-8 text).
+    
+    Args:
+        path: Snapshot file to write
+        products: (product_id, product) pairs (default: the inventory)
+    """
+    if products is None:
+        products = inventory.items()
+    strings: Dict[str, int] = {}
+    records = bytearray()
+    count = 0
+    for product_id, product in sorted(products, key=lambda item: item[0]):
+        numbers = [strings.setdefault(product[field], len(strings))
+                   for field in ("title", "author", "category")]
+        records += CATALOGUE_RECORD.pack(product_id, *numbers, product['price'], product['stock'])
+        count += 1
+    
+    encoded = [text.encode("utf-8") for text in strings]
+    offsets = [0]
+    for text in encoded:
+        offsets.append(offsets[-1] + len(text))
+    
+    with open(path + ".tmp", "wb") as handle:
+        handle.write(CATALOGUE_HEADER.pack(CATALOGUE_MAGIC, CATALOGUE_VERSION, count,
+                                           len(encoded), time.time()))
+        handle.write(records)
+        handle.write(struct.pack(f"<{len(offsets)}Q", *offsets))
+        handle.write(b"".join(encoded))
+    os.replace(path + ".tmp", path)
+
+
+def open_catalogue_snapshot(path: str) -> Dict:
+    """
+    Memory-maps a catalogue snapshot without decoding any product.
+    
+    Args:
+        path: Snapshot file
+    
+    Returns:
+        Snapshot descriptor used by the read_snapshot_* functions
+    
+    Raises:
+        ValueError: If the file is not a catalogue snapshot
+    """
+    with open(path, "rb") as handle:
+        data = mmap.mmap(handle.fileno(), 0, access=mmap.ACCESS_READ)
+    magic, version, count, string_count, created = CATALOGUE_HEADER.unpack_from(data, 0)
+    if magic != CATALOGUE_MAGIC or version != CATALOGUE_VERSION:
+        raise ValueError(f"{path} is not a version {CATALOGUE_VERSION} catalogue snapshot")
+    
+    records_offset = CATALOGUE_HEADER.size
+    offsets_offset = records_offset + count * CATALOGUE_RECORD.size
+    snapshot = {
+        "path": path,
+        "data": data,
+        "count": count,
+        "created": created,
+        "records_offset": records_offset,
+        "offsets_offset": offsets_offset,
+        "strings_offset": offsets_offset + (string_count + 1) * 8,
+        "first_id": 0,
+        "last_id": 0
+    }
+    if count:
+        snapshot["first_id"] = snapshot_product_id(snapshot, 0)
+        snapshot["last_id"] = snapshot_product_id(snapshot, count - 1)
+    return snapshot
+
+
+def snapshot_product_id(snapshot: Dict, position: int) -> int:
+    """Reads the product id of the record at a position."""
+    return struct.unpack_from("<I", snapshot["data"],
+                              snapshot["records_offset"] + position * CATALOGUE_RECORD.size)[0]
+
+
+def snapshot_product_ids(snapshot: Dict) -> Iterator[int]:
+    """Yields every product id stored in a snapshot, in order."""
+    for position in range(snapshot["count"]):
+        yield snapshot_product_id(snapshot, position)
+
+
+def snapshot_position(snapshot: Dict, product_id) -> int:
+    """
+    Finds a product's record: directly when ids are dense, otherwise by
+    binary search over the sorted records.
+    
+    Returns:
+        Record position, or -1 if the snapshot has no such product
+    """
+    if not isinstance(product_id, int) or not snapshot["first_id"] <= product_id <= snapshot["last_id"]:
+        return -1
+    position = product_id - snapshot["first_id"]
+    if position >= snapshot["count"] or snapshot_product_id(snapshot, position) != product_id:
+        position = bisect_left(range(snapshot["count"]), product_id,
+                               key=lambda i: snapshot_product_id(snapshot, i))
+        if position >= snapshot["count"] or snapshot_product_id(snapshot, position) != product_id:
+            return -1
+    return position
+
+
+def read_snapshot_string(snapshot: Dict, number: int) -> str:
+    """Decodes one entry of a snapshot's string table."""
+    start, end = struct.unpack_from("<QQ", snapshot["data"], snapshot["offsets_offset"] + number * 8)
+    base = snapshot["strings_offset"]
+    return snapshot["data"][base + start:base + end].decode("utf-8")
+
+
+def read_snapshot_strings(snapshot: Dict) -> List[str]:
+    """Decodes a snapshot's whole string table."""
+    data = snapshot["data"]
+    count = (snapshot["strings_offset"] - snapshot["offsets_offset"]) // 8
+    offsets = struct.unpack_from(f"<{count}Q", data, snapshot["offsets_offset"])
+    text = data[snapshot["strings_offset"]:snapshot["strings_offset"] + offsets[-1]]
+    return [text[start:end].decode("utf-8") for start, end in zip(offsets, offsets[1:])]
+
+
+def read_snapshot_product(snapshot: Dict, position: int) -> Tuple[int, Dict]:
+    """
+    Decodes the product record at a position.
+    
+    Returns:
+        Tuple of (product_id, product)
+    """
+    product_id, title, author, category, price, stock = CATALOGUE_RECORD.unpack_from(
+        snapshot["data"], snapshot["records_offset"] + position * CATALOGUE_RECORD.size)
+    return product_id, {
+        "title": read_snapshot_string(snapshot, title),
+        "author": read_snapshot_string(snapshot, author),
+        "category": read_snapshot_string(snapshot, category),
+        "price": price,
+        "stock": stock
+    }
+
+
+def snapshot_baseline(product_id: int) -> Optional[Tuple[float, Tuple]]:
+    """
+    Returns a product's version as loaded from the catalogue snapshot.
+    
+    Args:
+        product_id: Product identifier
+    
+    Returns:
+        Tuple of (snapshot time, version), or None if it is not in a snapshot
+    """
+    if not isinstance(inventory, LazyCatalogue):
+        return None
+    snapshot = inventory.snapshot
+    position = snapshot_position(snapshot, product_id)
+    if position < 0:
+        return None
+    product = read_snapshot_product(snapshot, position)[1]
+    return snapshot["created"], tuple(product[field] for field in VERSIONED_FIELDS)
+
+
+def load_catalogue_snapshot(path: str) -> None:
+    """
+    Replaces the inventory with a catalogue snapshot, decoded lazily.
+    
+    Only the header is read up front; the search index is rebuilt on the
+    first search and catalogue history starts from the snapshot's time.
+    
+    Args:
+        path: Snapshot file
+    """
+    global inventory, next_product_id, search_index_ready
+    snapshot = open_catalogue_snapshot(path)
+    with state_lock:
+        inventory = LazyCatalogue(snapshot)
+        next_product_id = snapshot["last_id"] + 1 if snapshot["count"] else 1
+        product_versions.clear()
+        search_index.clear()
+        search_terms.clear()
+        search_index_ready = False
+        inventory_valuation["ready"] = False
+
+
+def benchmark_catalogue_startup(sizes: Iterable[int] = CATALOGUE_BENCHMARK_SIZES) -> None:
+    """
+    Measures how long it takes to become ready for sales as the catalogue
+    grows: opening the snapshot, then the first sale, then (for reference)
+    a full scan that decodes every product.
+    
+    Args:
+        sizes: Catalogue sizes to generate
+    """
+    print("\n" + "="*80)
+    print("CATALOGUE STARTUP BENCHMARK".center(80))
+    print("="*80)
+    print(f"{'Products':<12} {'File (KiB)':<12} {'Load (ms)':<12} {'First Sale (ms)':<17} {'Full Scan (ms)':<15}")
+    print("-"*80)
+    
+    directory = tempfile.mkdtemp(prefix="catalogue-")
+    for size in sizes:
+        path = os.path.join(directory, f"catalogue-{size}.bin")
+        write_catalogue_snapshot(path, (
+            (product_id, {"title": f"Title {product_id}", "author": f"Author {product_id % 5000}",
+                          "category": f"Category {product_id % 40}", "price": 500 + product_id % 4000,
+                          "stock": 100})
+            for product_id in range(1, size + 1)))
+        
+        started = time.perf_counter()
+        load_catalogue_snapshot(path)
+        loaded = time.perf_counter()
+        create_sale("Benchmark", size // 2 + 1, 1, 0)
+        sold = time.perf_counter()
+        len(inventory.items())
+        scanned = time.perf_counter()
+        
+        print(f"{size:<12} {os.path.getsize(path) // 1024:<12} {(loaded - started) * 1000:<12.2f} "
+              f"{(sold - loaded) * 1000:<17.2f} {(scanned - sold) * 1000:<15.0f}")
+        os.remove(path)
+    os.rmdir(directory)
+    print("="*80)
+
+
+# ==================== MUTATION LOG ====================
+
+def apply_mutation(mutation: Dict) -> None:
+    """
+    Applies one mutation to inventory, sales and every derived structure.
+    
+    This is the only code path that changes state, so a replica replaying
+    the primary's log ends up with identical inventory and reports.
+    Products are replaced rather than modified (see replace_product), and
+    sealed sales leave a new hot list behind, so read snapshots stay valid.
+    
+    Args:
+        mutation: Log entry with "op", "ts" and the operation's fields
+    """
+    global next_product_id, next_sale_id, next_promotion_id
+    
+    op = mutation["op"]
+    timestamp = mutation["ts"]
+    product_id = mutation["sale"]['product_id'] if "sale" in mutation else mutation.get("product_id")
+    revalue = inventory_valuation["ready"] and op in VALUATION_OPS
+    if revalue:
+        add_to_valuation(inventory_valuation, product_id, -1)
+    
+    if op == "add_product":
+        product_id = mutation["product_id"]
+        replace_product(product_id, dict(mutation["product"]), mutation["seq"])
+        next_product_id = max(next_product_id, product_id + 1)
+        index_product(product_id)
+        record_product_version(product_id, timestamp)
+    elif op == "update_product":
+        product_id = mutation["product_id"]
+        replace_product(product_id, dict(inventory[product_id], **mutation["changes"]), mutation["seq"])
+        index_product(product_id)
+        record_product_version(product_id, timestamp)
+    elif op == "delete_product":
+        product_id = mutation["product_id"]
+        replace_product(product_id, None, mutation["seq"])
+        unindex_product(product_id)
+        record_product_version(product_id, timestamp)
+    elif op == "add_promotion":
+        promotion_id = mutation["promotion_id"]
+        promotions[promotion_id] = dict(mutation["promotion"])
+        next_promotion_id = max(next_promotion_id, promotion_id + 1)
+        index_promotion(promotion_id)
+    elif op == "end_promotion":
+        unindex_promotion(mutation["promotion_id"])
+        del promotions[mutation["promotion_id"]]
+    elif op == "customer_tier":
+        customer_tiers[normalize_text(mutation["customer"])] = mutation["tier"]
+    elif op == "reserve":
+        apply_reservation(mutation)
+    elif op == "release":
+        apply_release(mutation["reservation_id"])
+    elif op in ("sale", "return"):
+        # A return is a reversing entry: same fields, negated quantities.
+        # A sale confirming a reservation releases the hold it sells.
+        sale = mutation["sale"]
+        if mutation.get("reservation_id") is not None:
+            apply_release(mutation["reservation_id"])
+        if sale['product_id'] in inventory:
+            product = inventory[sale['product_id']]
+            replace_product(sale['product_id'], dict(product, stock=product['stock'] - sale['quantity']),
+                            mutation["seq"])
+            record_product_version(sale['product_id'], timestamp)
+        sales_records.append(sale)
+        next_sale_id = max(next_sale_id, sale['sale_id'] + 1)
+        if op == "return":
+            refunded = sale_returns.setdefault(sale['returns_sale_id'], [0, 0, 0, 0])
+            for i, field in enumerate(('quantity', 'subtotal', 'discount_amount', 'total')):
+                refunded[i] -= sale[field]
+        update_stream_sketches(sale)
+        update_rolling_windows(sale, timestamp)
+        update_olap_cube(sale)
+        if mutation.get("request_id"):
+            remember_sale_request(mutation["request_id"], sale)
+        seal_cold_sales(timestamp)
+    else:
+        raise ValueError(f"Unknown mutation: {op}")
+    
+    if revalue:
+        add_to_valuation(inventory_valuation, product_id, 1)
+
+
+def commit_mutation(mutation: Dict) -> Dict:
+    """
+    Applies a mutation and appends it to the mutation log.
+    
+    Entries coming from a primary keep their sequence number and timestamp;
+    new ones are stamped here. Replication threads are woken afterwards.
+    
+    Args:
+        mutation: Mutation to commit
+    
+    Returns:
+        The logged entry
+    """
+    with state_lock:
+        mutation.setdefault("ts", current_time())
+        mutation.setdefault("seq", log_head() + 1)
+        hold = reservations.get(mutation.get("reservation_id"))
+        stock_before = None
+        if mutation["op"] == "update_product" and mutation["product_id"] in inventory:
+            stock_before = inventory[mutation["product_id"]]['stock']
+        apply_mutation(mutation)
+        mutation_log.append(mutation)
+        if len(mutation_log) >= 2 * MUTATION_LOG_RETAIN:
+            truncate_mutation_log()
+        publish_change_events(mutation, hold, stock_before)
+    with log_updated:
+        log_updated.notify_all()
+    return mutation
+
+
+def log_head() -> int:
+    """Returns the sequence number of the last committed mutation."""
+    return log_state["base"] + len(mutation_log)
+
+
+def truncate_mutation_log() -> None:
+    """
+    Drops all but the newest MUTATION_LOG_RETAIN log entries.
+    
+    Everything they did is already in the state itself, which is what a
+    checkpoint ships to a replica that is further behind than that.
+    """
+    with state_lock:
+        drop = len(mutation_log) - MUTATION_LOG_RETAIN
+        if drop > 0:
+            del mutation_log[:drop]
+            log_state["base"] += drop
+            log_state["truncated"] += drop
+
+
+def read_mutation_log(cursor: int) -> Tuple[Optional[Dict], List[Dict]]:
+    """
+    Returns what a replica at a log position needs to catch up.
+    
+    Args:
+        cursor: Seq of the last entry the replica has applied
+    
+    Returns:
+        Tuple of (checkpoint if the entries after cursor have already been
+        truncated, else None; log entries after the cursor or checkpoint)
+    """
+    with state_lock:
+        checkpoint = None
+        if cursor < log_state["base"]:
+            # The checkpoint refers to live state, so it is put in its wire
+            # form before the lock is released and later sales can reach it
+            checkpoint = json.loads(json.dumps(build_checkpoint()))
+            cursor = checkpoint["seq"]
+        return checkpoint, mutation_log[cursor - log_state["base"]:]
+
+
+def build_checkpoint() -> Dict:
+    """
+    Captures the whole state as of the current log head.
+    
+    A checkpoint holds the base state (inventory, ledger, history, rules,
+    holds, dedup window) and the aggregates that cannot be recomputed
+    from it cheaply (sketches, rolling windows, base cuboid). Sealed
+    segments travel as their compressed files. The search index,
+    valuation and materialized cuboids are rebuilt by the receiver.
+    
+    Returns:
+        JSON-serializable checkpoint, shipped as a "checkpoint" log message
+    """
+    with state_lock:
+        log_state["checkpoints"] += 1
+        versions = {product_id: history for product_id, history in product_versions.items()}
+        if isinstance(inventory, LazyCatalogue):
+            # Untouched products' history starts at the catalogue snapshot
+            for product_id in snapshot_product_ids(inventory.snapshot):
+                if product_id not in versions:
+                    baseline = snapshot_baseline(product_id)
+                    versions[product_id] = ([baseline[0]], [baseline[1]])
+        
+        segments = []
+        for segment in sales_segments:
+            with open(segment["path"], "rb") as handle:
+                data = base64.b64encode(handle.read()).decode("ascii")
+            segments.append(dict(segment, data=data))
+        
+        return {
+            "op": "checkpoint",
+            "seq": log_head(),
+            "ts": time.time(),
+            "inventory": list(inventory.items()),
+            "next_ids": [next_product_id, next_sale_id, next_promotion_id, next_reservation_id],
+            "sales": sales_records,
+            "segments": segments,
+            "returns": list(sale_returns.items()),
+            "versions": [[product_id, valid_from, history] for product_id, (valid_from, history)
+                         in versions.items()],
+            "promotions": list(promotions.items()),
+            "customer_tiers": customer_tiers,
+            "reservations": [[reservation_id, {field: hold[field] for field in
+                                               ("product_id", "quantity", "expires_at")}]
+                             for reservation_id, hold in reservations.items()],
+            "sale_requests": list(sale_requests.items()),
+            "sketches": stream_sketches,
+            "rolling_windows": rolling_windows,
+            "cube": list(olap_cuboids[OLAP_DIMENSIONS].items())
+        }
+
+
+def load_checkpoint(checkpoint: Dict) -> None:
+    """
+    Replaces the whole state with a checkpoint from build_checkpoint().
+    
+    The local log restarts empty at the checkpoint's seq.
+    
+    Args:
+        checkpoint: Checkpoint received from the primary
+    """
+    global inventory, sales_records, next_product_id, next_sale_id
+    global next_promotion_id, next_reservation_id
+    
+    with state_lock:
+        inventory = {product_id: product for product_id, product in checkpoint["inventory"]}
+        next_product_id, next_sale_id, next_promotion_id, next_reservation_id = checkpoint["next_ids"]
+        sales_records = checkpoint["sales"]
+        
+        sales_segments.clear()
+        for segment in checkpoint["segments"]:
+            data = base64.b64decode(segment.pop("data"))
+            products = segment["summary"]["products"]
+            segment["summary"]["products"] = {int(product_id): totals
+                                              for product_id, totals in products.items()}
+            segment["path"] = os.path.join(sales_archive_directory(), os.path.basename(segment["path"]))
+            with open(segment["path"], "wb") as handle:
+                handle.write(data)
+            sales_segments.append(segment)
+        
+        sale_returns.clear()
+        sale_returns.update((sale_id, refunded) for sale_id, refunded in checkpoint["returns"])
+        product_versions.clear()
+        for product_id, valid_from, history in checkpoint["versions"]:
+            product_versions[product_id] = (valid_from, [tuple(version) if version else None
+                                                         for version in history])
+        
+        promotions.clear()
+        promotion_index.clear()
+        for promotion_id, rule in checkpoint["promotions"]:
+            promotions[promotion_id] = rule
+            index_promotion(promotion_id)
+        customer_tiers.clear()
+        customer_tiers.update(checkpoint["customer_tiers"])
+        
+        reservations.clear()
+        reserved_stock.clear()
+        for level in timing_wheel["levels"]:
+            for slot in level:
+                slot.clear()
+        for reservation_id, hold in checkpoint["reservations"]:
+            apply_reservation(dict(hold, reservation_id=reservation_id))
+        
+        sale_requests.clear()
+        sale_request_filters.clear()
+        for request_id, sale in checkpoint["sale_requests"]:
+            remember_sale_request(request_id, sale)
+        
+        stream_sketches.clear()
+        stream_sketches.update(checkpoint["sketches"])
+        for summary in ("top_products", "top_authors"):
+            rebuild_space_saving_heap(stream_sketches[summary])
+        rolling_windows[:] = checkpoint["rolling_windows"]
+        olap_cuboids.clear()
+        olap_cuboids[OLAP_DIMENSIONS] = {tuple(key): measures for key, measures in checkpoint["cube"]}
+        
+        rebuild_search_index()
+        inventory_valuation.update(compute_inventory_valuation())
+        mutation_log.clear()
+        log_state["base"] = checkpoint["seq"]
+
+
+# ==================== SNAPSHOT READS ====================
+
+def replace_product(product_id: int, product: Optional[Dict], seq: int) -> None:
+    """
+    Replaces a product (or deletes it, given None) as of a log entry.
+    
+    While read snapshots are open, the version being replaced is kept so
+    the snapshots taken before this change still see it. Versions every
+    open snapshot has moved past are dropped here; the rest go when the
+    last snapshot closes.
+    
+    Args:
+        product_id: Product identifier
+        product: New product dict, or None to delete the product
+        seq: Seq of the log entry making the change
+    """
+    if open_snapshots:
+        oldest = min(open_snapshots)
+        changes = replaced_products.get(product_id, ())
+        keep = bisect_right(changes, oldest, key=lambda change: change[0])
+        # A new tuple, so a reader never sees the history shift under it
+        replaced_products[product_id] = changes[keep:] + ((seq, inventory.get(product_id)),)
+    if product is None:
+        del inventory[product_id]
+    else:
+        inventory[product_id] = product
+
+
+class InventorySnapshot:
+    """
+    Read-only view of the inventory as of a log position.
+    
+    Nothing is copied when the view is taken: a product is read from the
+    live inventory and, if it has changed since, replaced by the version
+    kept for it by replace_product. The live product is read first, and a
+    writer keeps the old version before installing the new one, so a
+    change racing the lookup is always found.
+    """
+    
+    def __init__(self, catalogue: Dict[int, Dict], seq: int):
+        self.catalogue = catalogue
+        self.seq = seq
+    
+    def live_product(self, product_id) -> Optional[Dict]:
+        catalogue = self.catalogue
+        if not isinstance(catalogue, LazyCatalogue):
+            return catalogue.get(product_id)
+        # Decode pending records without caching them: only writers load
+        position = snapshot_position(catalogue.snapshot, product_id)
+        pending = position >= 0 and catalogue.pending[position]
+        product = dict.get(catalogue, product_id)
+        if product is None and pending:
+            return read_snapshot_product(catalogue.snapshot, position)[1]
+        if product is None and position >= 0:
+            # Deleted, or caught mid load_all(), which runs under the lock
+            with state_lock:
+                product = dict.get(catalogue, product_id)
+        return product
+    
+    def get(self, product_id, default=None):
+        product = self.live_product(product_id)
+        changes = replaced_products.get(product_id)
+        if changes:
+            position = bisect_right(changes, self.seq, key=lambda change: change[0])
+            if position < len(changes):
+                product = changes[position][1]
+        return default if product is None else product
+    
+    def __getitem__(self, product_id) -> Dict:
+        product = self.get(product_id)
+        if product is None:
+            raise KeyError(product_id)
+        return product
+    
+    def __contains__(self, product_id) -> bool:
+        return self.get(product_id) is not None
+    
+    def items(self) -> List[Tuple[int, Dict]]:
+        catalogue = self.catalogue
+        if isinstance(catalogue, LazyCatalogue):
+            last_id = catalogue.snapshot["last_id"]
+            product_ids = list(snapshot_product_ids(catalogue.snapshot))
+            product_ids += [product_id for product_id in list(dict.keys(catalogue)) if product_id > last_id]
+        else:
+            product_ids = list(catalogue)
+        # Products deleted since the snapshot are only in their history
+        known = set(product_ids)
+        deleted = [product_id for product_id in list(replaced_products) if product_id not in known]
+        if deleted:
+            product_ids = sorted(product_ids + deleted)
+        products = []
+        for product_id in product_ids:
+            product = self.get(product_id)
+            if product is not None:
+                products.append((product_id, product))
+        return products
+    
+    def keys(self) -> List[int]:
+        return [product_id for product_id, _ in self.items()]
+    
+    def values(self) -> List[Dict]:
+        return [product for _, product in self.items()]
+    
+    def __iter__(self) -> Iterator[int]:
+        return iter(self.keys())
+    
+    def __len__(self) -> int:
+        return len(self.keys())
+
+
+def take_read_snapshot() -> Dict:
+    """
+    Captures a consistent, immutable view of the inventory and the ledger.
+    
+    Only references, lengths and the log position are taken under the
+    lock, so the cost does not grow with the catalogue: the inventory is
+    an InventorySnapshot at the current seq, the hot sales list and the
+    segment list only grow at the end, and sealing replaces the hot list
+    instead of trimming it. Held stock is copied; it only lists products
+    with open holds. The snapshot must be closed with release_read_snapshot.
+    
+    Returns:
+        Snapshot with the inventory, held stock and ledger bounds
+    """
+    with state_lock:
+        seq = log_head()
+        open_snapshots[seq] = open_snapshots.get(seq, 0) + 1
+        return {
+            "seq": seq,
+            "ts": current_time(),
+            "inventory": InventorySnapshot(inventory, seq),
+            "reserved_stock": dict(reserved_stock),
+            "segments": tuple(sales_segments),
+            "hot": sales_records,
+            "hot_count": len(sales_records)
+        }
+
+
+def release_read_snapshot(snapshot: Dict) -> None:
+    """Closes a read snapshot, dropping product versions no longer needed."""
+    with state_lock:
+        open_snapshots[snapshot["seq"]] -= 1
+        if not open_snapshots[snapshot["seq"]]:
+            del open_snapshots[snapshot["seq"]]
+        if not open_snapshots:
+            replaced_products.clear()
+
+
+@contextlib.contextmanager
+def snapshot_reads() -> Iterator[Dict]:
+    """
+    Runs the enclosed reads against a snapshot instead of the live state,
+    without holding the state lock, so sales carry on meanwhile.
+    
+    Yields:
+        The snapshot in use
+    """
+    previous = getattr(read_snapshots, "snapshot", None)
+    read_snapshots.snapshot = take_read_snapshot()
+    try:
+        yield read_snapshots.snapshot
+    finally:
+        release_read_snapshot(read_snapshots.snapshot)
+        read_snapshots.snapshot = previous
+
+
+def visible_inventory() -> Dict[int, Dict]:
+    """Returns the inventory as seen by this thread (snapshot or live)."""
+    snapshot = getattr(read_snapshots, "snapshot", None)
+    return inventory if snapshot is None else snapshot["inventory"]
+
+
+def visible_reserved_stock() -> Dict[int, int]:
+    """Returns held units per product as seen by this thread."""
+    snapshot = getattr(read_snapshots, "snapshot", None)
+    return reserved_stock if snapshot is None else snapshot["reserved_stock"]
+
+
+def visible_ledger() -> Tuple[Iterable[Dict], List[Dict], int]:
+    """
+    Returns the sales ledger as seen by this thread.
+    
+    Returns:
+        Tuple of (sealed segments, hot sales list, number of hot sales
+        visible in that list)
+    """
+    snapshot = getattr(read_snapshots, "snapshot", None)
+    if snapshot is None:
+        return sales_segments, sales_records, len(sales_records)
+    return snapshot["segments"], snapshot["hot"], snapshot["hot_count"]
+
+
+def benchmark_snapshot_reads(seconds: float = SNAPSHOT_BENCHMARK_SECONDS,
+                             readers: int = SNAPSHOT_BENCHMARK_READERS) -> None:
+    """
+    Measures sale throughput and latency while reports run concurrently,
+    with reports holding the state lock versus reading from snapshots.
+    
+    Args:
+        seconds: Duration of each run
+        readers: Number of report threads
+    """
+    product_id = next(iter(inventory))
+    commit_mutation({"op": "update_product", "product_id": product_id,
+                     "changes": {"stock": 10 ** 9}})
+    for _ in range(20000):
+        create_sale("Benchmark", product_id, 1, 0)
+    
+    def run_reports(mode: str, stop: threading.Event, counter: List[int]) -> None:
+        while not stop.is_set():
+            with (state_lock if mode == "locked" else snapshot_reads()):
+                generate_financial_summary()
+                generate_top_products_report()
+                generate_sales_by_author_report()
+            counter[0] += 1
+    
+    # sys.stdout is shared by every thread, so the reports are silenced
+    # around the whole run and the results printed afterwards
+    rows = []
+    with open(os.devnull, "w") as devnull, contextlib.redirect_stdout(devnull):
+        for mode in ("none", "locked", "snapshot"):
+            stop = threading.Event()
+            counter = [0]
+            threads = [] if mode == "none" else [
+                threading.Thread(target=run_reports, args=(mode, stop, counter), daemon=True)
+                for _ in range(readers)]
+            for thread in threads:
+                thread.start()
+            
+            latencies = []
+            deadline = time.perf_counter() + seconds
+            while time.perf_counter() < deadline:
+                started = time.perf_counter()
+                create_sale("Benchmark", product_id, 1, 0)
+                latencies.append(time.perf_counter() - started)
+            stop.set()
+            for thread in threads:
+                thread.join()
+            
+            latencies.sort()
+            rows.append(f"{mode:<12} {len(latencies) / seconds:<12.0f} "
+                        f"{latencies[len(latencies) // 2] * 1000:<11.3f} "
+                        f"{latencies[int(len(latencies) * 0.99)] * 1000:<11.3f} "
+                        f"{latencies[-1] * 1000:<11.3f} {counter[0]:<8}")
+    
+    print("\n" + "="*80)
+    print("SALES THROUGHPUT WITH CONCURRENT REPORTS".center(80))
+    print("="*80)
+    print(f"{'Reads':<12} {'Sales/s':<12} {'p50 (ms)':<11} {'p99 (ms)':<11} {'Max (ms)':<11} {'Reports':<8}")
+    print("-"*80)
+    for row in rows:
+        print(row)
+    print("="*80)
+
+
+# ==================== INVENTORY MANAGEMENT ====================
+
+def add_product() -> None:
+    """Registers a new product in the inventory."""
+    print("\n=== ADD NEW PRODUCT ===")
+    try:
+        title = validate_non_empty_string("Enter product title: ")
+        author = validate_non_empty_string("Enter author name: ")
+        category = validate_non_empty_string("Enter category: ")
+        price = validate_money("Enter price: $")
+        stock = int(validate_positive_number("Enter initial stock: ", int))
+        
+        product_id = next_product_id
+        commit_mutation({
+            "op": "add_product",
+            "product_id": product_id,
+            "product": {
+                "title": title,
+                "author": author,
+                "category": category,
+                "price": price,
+                "stock": stock
+            }
+        })
+        
+        print(f"\n✓ Product added successfully with ID: {product_id}")
+        
+    except Exception as e:
+        print(f"Error adding product: {str(e)}")
+
+
+def view_inventory(as_of: Optional[float] = None) -> None:
+    """
+    Displays all products in the inventory.
+    
+    Args:
+        as_of: Show the catalogue as it was at this time (default: now)
+    """
+    products = visible_inventory().items() if as_of is None else inventory_as_of(as_of)
+    held_stock = visible_reserved_stock()
+    
+    print("\n" + "="*80)
+    print("INVENTORY".center(80))
+    print("="*80)
+    
+    if not products:
+        print("No products in inventory.")
+        return
+    
+    print(f"{'ID':<5} {'Title':<30} {'Author':<20} {'Price':<10} {'Stock':<8} {'Held':<5}")
+    print("-"*80)
+    
+    for product_id, product in products:
+        held = held_stock.get(product_id, 0) if as_of is None else 0
+        print(f"{product_id:<5} {product['title']:<30} {product['author']:<20} "
+              f"${format_money(product['price']):<9} {product['stock']:<8} {held:<5}")
+    print("="*80)
+
+
+def update_product() -> None:
+    """Updates an existing product in the inventory."""
+    view_inventory()
+    
+    try:
+        product_id = select_product_id("\nEnter product ID or search text to update: ")
+        
+        if product_id not in inventory:
+            print("Error: Product not found.")
+            return
+        
+        product = inventory[product_id]
+        print(f"\nUpdating: {product['title']}")
+        print("(Press Enter to keep current value)")
+        
+        changes = {}
+        title = prompt_input(f"New title [{product['title']}]: ").strip()
+        if title:
+            changes['title'] = title
+        
+        author = prompt_input(f"New author [{product['author']}]: ").strip()
+        if author:
+            changes['author'] = author
+        
+        category = prompt_input(f"New category [{product['category']}]: ").strip()
+        if category:
+            changes['category'] = category
+        
+        price_input = prompt_input(f"New price [${format_money(product['price'])}]: ").strip()
+        if price_input:
+            changes['price'] = parse_money(price_input)
+        
+        stock_input = prompt_input(f"New stock [{product['stock']}]: ").strip()
+        if stock_input:
+            changes['stock'] = int(stock_input)
+        
+        commit_mutation({"op": "update_product", "product_id": product_id, "changes": changes})
+        print("\n✓ Product updated successfully!")
+        
+    except ValueError:
+        print("Error: Invalid input format.")
+    except Exception as e:
+        print(f"Error updating product: {str(e)}")
+
+
+def delete_product() -> None:
+    """Removes a product from the inventory."""
+    view_inventory()
+    
+    try:
+        product_id = select_product_id("\nEnter product ID or search text to delete: ")
+        
+        if product_id not in inventory:
+            print("Error: Product not found.")
+            return
+        
+        product = inventory[product_id]
+        confirm = prompt_input(f"Are you sure you want to delete '{product['title']}'? (yes/no): ")
+        
+        if confirm.lower() == 'yes':
+            commit_mutation({"op": "delete_product", "product_id": product_id})
+            print("\n✓ Product deleted successfully!")
+        else:
+            print("Deletion cancelled.")
+            
+    except ValueError:
+        print("Error: Invalid product ID.")
+    except Exception as e:
+        print(f"Error deleting product: {str(e)}")
+
+
+# ==================== SALES MANAGEMENT ====================
+
+def create_sale(customer_name: str, product_id: int, quantity: int, discount: float,
+                request_id: Optional[str] = None, reservation_id: Optional[int] = None) -> Dict:
+    """
+    Records a sale: decrements stock and appends the sale record.
+    
+    A retried submission with the same request id returns the sale that
+    was recorded the first time instead of selling again. A sale that
+    confirms a reservation sells the held units and releases the hold in
+    the same log entry, so either both happen or neither does.
+    
+    Args:
+        customer_name: Customer name
+        product_id: Product identifier
+        quantity: Units sold
+        discount: Discount percentage (0-100)
+        request_id: Client-chosen idempotency key (optional)
+        reservation_id: Hold this sale confirms (optional)
+    
+    Returns:
+        The recorded sale
+    
+    Raises:
+        ValueError: If the customer, product, quantity, stock, discount or
+            reservation is invalid, or the request id was already used for
+            a different sale
+    """
+    with state_lock:
+        if request_id:
+            original = find_sale_request(request_id)
+            if original is not None:
+                return check_duplicate_sale(original, customer_name, product_id, quantity,
+                                            reservation_id)
+        
+        advance_reservations()
+        held = 0
+        if reservation_id is not None:
+            if reservation_id not in reservations:
+                raise ValueError("Reservation not found or expired.")
+            held = reservations[reservation_id]["quantity"]
+        if not customer_name.strip():
+            raise ValueError("Customer name cannot be empty.")
+        if product_id not in inventory:
+            raise ValueError("Product not found.")
+        if quantity < MIN_QUANTITY:
+            raise ValueError("Quantity must be positive.")
+        if available_stock(product_id) + held < quantity:
+            raise ValueError(f"Insufficient stock. Available: {available_stock(product_id) + held}")
+        if discount < 0 or discount > 100:
+            raise ValueError("Discount must be between 0 and 100.")
+        
+        product = inventory[product_id]
+        
+        # Price the sale (in cents) under the best manual or promotional discount
+        now = datetime.fromtimestamp(current_time())
+        pricing = price_sale(product_id, quantity, customer_name, discount, now.timestamp())
+        
+        # Create sale record
+        sale = {
+            "sale_id": next_sale_id,
+            "customer": customer_name,
+            "product_id": product_id,
+            "product_title": product['title'],
+            "author": product['author'],
+            "category": product['category'],
+            "quantity": quantity,
+            "unit_price": product['price'],
+            "subtotal": pricing["subtotal"],
+            "discount_percent": pricing["discount_percent"],
+            "discount_amount": pricing["discount_amount"],
+            "total": pricing["total"],
+            "promotion": pricing["promotion"],
+            "date": now.strftime(DATE_FORMAT)
+        }
+        if reservation_id is not None:
+            sale["reservation_id"] = reservation_id
+        
+        # Update inventory stock and add to sales records
+        mutation = {"op": "sale", "ts": now.timestamp(), "sale": sale}
+        if request_id:
+            mutation["request_id"] = request_id
+        if reservation_id is not None:
+            mutation["reservation_id"] = reservation_id
+        commit_mutation(mutation)
+        return sale
+
+
+def register_sale() -> None:
+    """Registers a new sale transaction."""
+    print("\n=== REGISTER NEW SALE ===")
+    view_inventory()
+    
+    try:
+        customer_name = validate_non_empty_string("\nEnter customer name: ")
+        product_id = select_product_id("Enter product ID or search text: ")
+        
+        if product_id not in inventory:
+            print("Error: Product not found.")
+            return
+        
+        product = inventory[product_id]
+        quantity = int(validate_positive_number("Enter quantity: ", int))
+        
+        if not validate_stock(quantity, product_id):
+            print(f"Error: Insufficient stock. Available: {available_stock(product_id)}")
+            return
+        
+        discount = float(prompt_input("Enter discount percentage (0 if none): "))
+        if discount < 0 or discount > 100:
+            print("Error: Discount must be between 0 and 100.")
+            return
+        
+        sale = create_sale(customer_name, product_id, quantity, discount)
+        submit_receipt("sale", sale)
+        wait_for_receipts()
+        print("✓ Sale registered successfully!")
+        
+    except ValueError:
+        print("Error: Invalid input format.")
+    except Exception as e:
+        print(f"Error registering sale: {str(e)}")
+
+
+def find_sale(sale_id: int) -> Optional[Dict]:
+    """
+    Looks up a sale by id in the hot records or its sealed segment.
+    
+    Args:
+        sale_id: Sale identifier
+    
+    Returns:
+        The sale record, or None if there is no such sale
+    """
+    position = bisect_left(sales_records, sale_id, key=lambda sale: sale['sale_id'])
+    if position < len(sales_records) and sales_records[position]['sale_id'] == sale_id:
+        return sales_records[position]
+    
+    position = bisect_left(sales_segments, sale_id, key=lambda segment: segment["last_sale_id"])
+    if position < len(sales_segments) and sales_segments[position]["first_sale_id"] <= sale_id:
+        for sale in read_segment(sales_segments[position]):
+            if sale['sale_id'] == sale_id:
+                return sale
+    return None
+
+
+def create_return(sale_id: int, quantity: int) -> Dict:
+    """
+    Records the return of units from an earlier sale as a reversing entry.
+    
+    The entry copies the original sale with negated quantity and amounts,
+    so stock, reports, sketches, rolling windows and the cube are all
+    adjusted by the same incremental updates that recorded the sale.
+    The last units returned get whatever is left of the original amounts,
+    so a sale returned in parts refunds exactly what was paid.
+    
+    Args:
+        sale_id: Sale being returned
+        quantity: Units returned
+    
+    Returns:
+        The reversing entry
+    
+    Raises:
+        ValueError: If the sale does not exist or the quantity is invalid
+    """
+    with state_lock:
+        original = find_sale(sale_id)
+        if original is None or 'returns_sale_id' in original:
+            raise ValueError("Sale not found.")
+        refunded = sale_returns.get(sale_id, [0, 0, 0, 0])
+        remaining = original['quantity'] - refunded[0]
+        if remaining == 0:
+            raise ValueError("All units of this sale have already been returned.")
+        if quantity < MIN_QUANTITY or quantity > remaining:
+            raise ValueError(f"Quantity must be between 1 and {remaining}.")
+        
+        if quantity == remaining:
+            subtotal = original['subtotal'] - refunded[1]
+            discount_amount = original['discount_amount'] - refunded[2]
+            total = original['total'] - refunded[3]
+        else:
+            subtotal, discount_amount, total = calculate_sale_totals(
+                original['unit_price'], quantity, original['discount_percent'])
+        
+        now = datetime.fromtimestamp(current_time())
+        entry = dict(original, sale_id=next_sale_id, quantity=-quantity, subtotal=-subtotal,
+                     discount_amount=-discount_amount, total=-total,
+                     date=now.strftime(DATE_FORMAT), returns_sale_id=sale_id)
+        commit_mutation({"op": "return", "ts": now.timestamp(), "sale": entry})
+        return entry
+
+
+def process_return() -> None:
+    """Processes a customer return and prints the refund receipt."""
+    print("\n=== PROCESS RETURN ===")
+    
+    try:
+        sale_id = int(validate_positive_number("Enter sale ID: ", int))
+        original = find_sale(sale_id)
+        if original is None or 'returns_sale_id' in original:
+            print("Error: Sale not found.")
+            return
+        
+        remaining = original['quantity'] - sale_returns.get(sale_id, [0])[0]
+        print(f"{original['product_title']} sold to {original['customer']} on {original['date']}")
+        if remaining == 0:
+            print("Error: All units of this sale have already been returned.")
+            return
+        
+        quantity = int(validate_positive_number(f"Enter quantity to return (max {remaining}): ", int))
+        entry = create_return(sale_id, quantity)
+        submit_receipt("return", entry)
+        wait_for_receipts()
+        print("✓ Return processed successfully!")
+        
+    except ValueError as e:
+        print(f"Error: {str(e)}")
+    except Exception as e:
+        print(f"Error processing return: {str(e)}")
+
+
+def view_sales() -> None:
+    """Displays all sales records."""
+    print("\n" + "="*100)
+    print("SALES HISTORY".center(100))
+    print("="*100)
+    
+    if next_sale_id == 1:
+        print("No sales recorded yet.")
+        return
+    
+    print(f"{'ID':<5} {'Customer':<15} {'Product':<25} {'Qty':<5} {'Total':<12} {'Date':<20}")
+    print("-"*100)
+    
+    for sale in iter_sales():
+        print(f"{sale['sale_id']:<5} {sale['customer']:<15} {sale['product_title']:<25} "
+              f"{sale['quantity']:<5} ${format_money(sale['total']):<11} {sale['date']:<20}")
+    print("="*100)
+
+
+# ==================== RECEIPTS ====================
+
+def render_receipt(kind: str, record: Dict) -> str:
+    """
+    Renders a sale or return receipt from its template.
+    
+    Args:
+        kind: "sale" or "return"
+        record: Sale record (or reversing entry)
+    
+    Returns:
+        Receipt text
+    """
+    discount_line = ""
+    if record['discount_amount'] > 0:
+        label = record.get('promotion') or f"{record['discount_percent']}%"
+        discount_line = f"Discount ({label}): -${format_money(record['discount_amount'])}\n"
+    sign = -1 if kind == "return" else 1
+    return RECEIPT_TEMPLATES[kind].format(
+        rule="=" * RECEIPT_WIDTH,
+        heading=f"{kind.upper()} RECEIPT".center(RECEIPT_WIDTH),
+        customer=record['customer'],
+        product_title=record['product_title'],
+        quantity=sign * record['quantity'],
+        unit_price=format_money(record['unit_price']),
+        subtotal=format_money(sign * record['subtotal']),
+        discount_line=discount_line,
+        total=format_money(sign * record['total']),
+        date=record['date'],
+        returns_sale_id=record.get('returns_sale_id'))
+
+
+def write_receipts() -> None:
+    """
+    Writer thread: renders queued receipts and writes them in batches.
+    
+    Whatever has queued up behind the first receipt (up to
+    RECEIPT_BATCH_SIZE) goes out in a single buffered write and flush.
+    """
+    while True:
+        batch = [receipt_queue.get()]
+        while len(batch) < RECEIPT_BATCH_SIZE:
+            try:
+                batch.append(receipt_queue.get_nowait())
+            except queue.Empty:
+                break
+        
+        try:
+            text = "".join(render_receipt(kind, record) for kind, record in batch)
+            if receipt_state["path"] is None:
+                sys.stdout.write(text)
+                sys.stdout.flush()
+            else:
+                with open(receipt_state["path"], "a", encoding="utf-8") as spool:
+                    spool.write(text)
+            receipt_state["written"] += len(batch)
+            receipt_state["batches"] += 1
+        except Exception as e:
+            print(f"Error writing receipts: {str(e)}", file=sys.stderr)
+        finally:
+            for _ in batch:
+                receipt_queue.task_done()
+
+
+def start_receipt_writer(path: Optional[str] = None) -> None:
+    """
+    Starts the receipt writer thread.
+    
+    Args:
+        path: File or printer spool to append receipts to (default: terminal)
+    """
+    receipt_state["path"] = path
+    if receipt_state["thread"] is None:
+        thread = threading.Thread(target=write_receipts, name="receipts", daemon=True)
+        receipt_state["thread"] = thread
+        thread.start()
+
+
+def submit_receipt(kind: str, record: Dict) -> None:
+    """
+    Queues a receipt for the writer thread.
+    
+    Rendering and output happen off the caller's thread. When the queue
+    is full the caller blocks until the writer catches up.
+    
+    Args:
+        kind: "sale" or "return"
+        record: Sale record (or reversing entry)
+    """
+    if receipt_state["thread"] is None:
+        start_receipt_writer()
+    receipt_queue.put((kind, record))
+
+
+def wait_for_receipts() -> None:
+    """Blocks until every queued receipt has been written to the terminal."""
+    if receipt_state["path"] is None:
+        receipt_queue.join()
+
+
+# ==================== IDEMPOTENT SALES ====================
+
+def new_bloom_filter(capacity: int, error: float) -> Dict:
+    """
+    Creates a Bloom filter sized for a number of keys and error rate.
+    
+    Args:
+        capacity: Keys expected before the filter is rotated
+        error: Target false-positive rate
+    
+    Returns:
+        Empty filter
+    """
+    size = max(8, math.ceil(-capacity * math.log(error) / math.log(2) ** 2))
+    hashes = max(1, round(size / capacity * math.log(2)))
+    return {"size": size, "hashes": hashes, "bits": bytearray((size + 7) // 8)}
+
+
+def bloom_positions(bloom: Dict, key_hash: int) -> List[int]:
+    """Bit positions of a key, by double hashing on its 64-bit stream_hash."""
+    first, second, size = key_hash >> 32, (key_hash & 0xFFFFFFFF) | 1, bloom["size"]
+    return [(first + i * second) % size for i in range(bloom["hashes"])]
+
+
+def bloom_add(bloom: Dict, key_hash: int) -> None:
+    """Sets a key's bits in a Bloom filter."""
+    bits = bloom["bits"]
+    for position in bloom_positions(bloom, key_hash):
+        bits[position >> 3] |= 1 << (position & 7)
+
+
+def bloom_contains(bloom: Dict, key_hash: int) -> bool:
+    """Tests a key against a Bloom filter (false positives possible)."""
+    bits = bloom["bits"]
+    for position in bloom_positions(bloom, key_hash):
+        if not bits[position >> 3] & (1 << (position & 7)):
+            return False
+    return True
+
+
+def find_sale_request(request_id: str) -> Optional[Dict]:
+    """
+    Looks up the sale recorded for a request id.
+    
+    The Bloom filters answer most first-time submissions without touching
+    the window; a hit refreshes the id so it stays remembered.
+    
+    Args:
+        request_id: Idempotency key
+    
+    Returns:
+        The original sale, or None if the id is new (or long forgotten)
+    """
+    if sale_request_filters:
+        key_hash = stream_hash(request_id)
+        if not any(bloom_contains(bloom, key_hash) for bloom in sale_request_filters):
+            sale_request_stats["prefiltered"] += 1
+            return None
+    
+    sale = sale_requests.get(request_id)
+    if sale is not None:
+        sale_requests.move_to_end(request_id)
+        if sale_request_filters:
+            bloom_add(sale_request_filters[0], key_hash)
+        sale_request_stats["duplicates"] += 1
+    return sale
+
+
+def remember_sale_request(request_id: str, sale: Dict) -> None:
+    """
+    Adds a request id to the dedup window, evicting the least recently used.
+    
+    Every SALE_DEDUP_WINDOW insertions the Bloom filters rotate: the current
+    generation becomes the previous one and the oldest is dropped, so every
+    id still in the window is in one of the two generations.
+    
+    Args:
+        request_id: Idempotency key
+        sale: Sale recorded for it
+    """
+    sale_requests[request_id] = sale
+    sale_requests.move_to_end(request_id)
+    if len(sale_requests) > SALE_DEDUP_WINDOW:
+        sale_requests.popitem(last=False)
+    
+    if SALE_DEDUP_BLOOM_ERROR:
+        if not sale_request_filters or sale_request_stats["inserted"] % SALE_DEDUP_WINDOW == 0:
+            sale_request_filters.insert(0, new_bloom_filter(SALE_DEDUP_WINDOW, SALE_DEDUP_BLOOM_ERROR))
+            del sale_request_filters[2:]
+        bloom_add(sale_request_filters[0], stream_hash(request_id))
+    sale_request_stats["inserted"] += 1
+
+
+def check_duplicate_sale(original: Dict, customer_name: str, product_id: int,
+                         quantity: int, reservation_id: Optional[int] = None) -> Dict:
+    """
+    Confirms that a retried submission matches the sale it repeats.
+    
+    Returns:
+        The original sale
+    
+    Raises:
+        ValueError: If the request id was used for a different sale
+    """
+    if (original['customer'], original['product_id'], original['quantity'],
+            original.get('reservation_id')) != (customer_name, product_id, quantity, reservation_id):
+        raise ValueError("Request id was already used for a different sale.")
+    return original
+
+
+# ==================== PROMOTIONS ====================
+
+def promotion_keys(product_id: int, product: Dict) -> Tuple[Tuple[str, object], ...]:
+    """
+    Returns the rule index keys that can apply to a product.
+    
+    Args:
+        product_id: Product identifier
+        product: Product fields
+    
+    Returns:
+        One (scope, value) key per PROMOTION_SCOPES entry
+    """
+    return (("product", product_id), ("author", product['author']),
+            ("category", product['category']), ("all", None))
+
+
+def index_promotion(promotion_id: int) -> None:
+    """Adds a rule to the promotion index under its (scope, value) key."""
+    rule = promotions[promotion_id]
+    promotion_index.setdefault((rule["scope"], rule["value"]), set()).add(promotion_id)
+
+
+def unindex_promotion(promotion_id: int) -> None:
+    """Removes a rule from the promotion index."""
+    rule = promotions[promotion_id]
+    key = (rule["scope"], rule["value"])
+    rule_ids = promotion_index.get(key, set())
+    rule_ids.discard(promotion_id)
+    if not rule_ids:
+        promotion_index.pop(key, None)
+
+
+def promotion_discount(rule: Dict, unit_price: int, quantity: int) -> int:
+    """
+    Calculates what a rule takes off a sale line.
+    
+    Args:
+        rule: Promotion rule
+        unit_price: Price per unit in cents
+        quantity: Units sold
+    
+    Returns:
+        Discount in cents
+    """
+    if rule["kind"] == "buy_get":
+        free_units = quantity // (rule["buy"] + rule["free"]) * rule["free"]
+        return free_units * unit_price
+    return calculate_sale_totals(unit_price, quantity, rule["percent"])[1]
+
+
+def price_sale(product_id: int, quantity: int, customer_name: str,
+               discount: float = 0.0, when: Optional[float] = None) -> Dict:
+    """
+    Prices a sale line under the best applicable discount.
+    
+    Only the rules indexed under the product, its author, its category or
+    the whole catalogue are looked at; each is checked against its date
+    window and minimum customer tier, and the one taking the most off wins
+    (against the manually entered percentage, too). Rules past their end
+    date are skipped; like every other change to the rules, removing them
+    is left to a logged end_promotion.
+    
+    Args:
+        product_id: Product identifier
+        quantity: Units sold
+        customer_name: Customer name (for tier rules)
+        discount: Manual discount percentage (0-100)
+        when: Time of the sale (defaults to now)
+    
+    Returns:
+        Dict with subtotal, discount_amount, total, discount_percent and
+        the name of the promotion applied (None for a manual discount)
+    """
+    if when is None:
+        when = current_time()
+    product = inventory[product_id]
+    subtotal, best_amount, _ = calculate_sale_totals(product['price'], quantity, discount)
+    best_rule = None
+    tier = customer_tiers.get(normalize_text(customer_name), 0)
+    
+    for key in promotion_keys(product_id, product):
+        for promotion_id in promotion_index.get(key, ()):
+            rule = promotions[promotion_id]
+            if ((rule["starts"] is not None and when < rule["starts"])
+                    or (rule["ends"] is not None and when > rule["ends"]) or tier < rule["min_tier"]):
+                continue
+            amount = promotion_discount(rule, product['price'], quantity)
+            if amount > best_amount:
+                best_amount, best_rule = amount, rule
+    
+    if best_rule is None:
+        discount_percent = discount
+    elif best_rule["kind"] == "percent":
+        discount_percent = best_rule["percent"]
+    else:
+        discount_percent = round(best_amount * 100 / subtotal, 2)
+    return {
+        "subtotal": subtotal,
+        "discount_amount": best_amount,
+        "total": subtotal - best_amount,
+        "discount_percent": discount_percent,
+        "promotion": best_rule["name"] if best_rule else None
+    }
+
+
+def add_promotion(name: str, kind: str, scope: str, value=None, percent: float = 0.0,
+                  buy: int = 0, free: int = 0, min_tier: int = 0,
+                  starts: Optional[float] = None, ends: Optional[float] = None) -> int:
+    """
+    Activates a promotion rule.
+    
+    Args:
+        name: Name shown on receipts
+        kind: "percent" or "buy_get"
+        scope: "product", "author", "category" or "all"
+        value: Product id, author or category the rule targets
+        percent: Percentage off (percent rules)
+        buy: Units to buy (buy_get rules)
+        free: Units given free for every `buy` bought (buy_get rules)
+        min_tier: Lowest customer tier that qualifies (index into CUSTOMER_TIERS)
+        starts: Start of the promotion window (None: already running)
+        ends: End of the promotion window (None: open-ended)
+    
+    Returns:
+        Promotion ID
+    
+    Raises:
+        ValueError: If the rule is invalid
+    """
+    if kind not in PROMOTION_KINDS:
+        raise ValueError(f"Kind must be one of: {', '.join(PROMOTION_KINDS)}.")
+    if scope not in PROMOTION_SCOPES:
+        raise ValueError(f"Scope must be one of: {', '.join(PROMOTION_SCOPES)}.")
+    if scope == "all":
+        value = None
+    elif scope == "product" and value not in inventory:
+        raise ValueError("Product not found.")
+    elif scope != "product" and not value:
+        raise ValueError(f"Enter the {scope} the promotion applies to.")
+    if kind == "percent" and not 0 < percent <= 100:
+        raise ValueError("Percentage must be between 0 and 100.")
+    if kind == "buy_get" and (buy < 1 or free < 1):
+        raise ValueError("Buy and free quantities must be positive.")
+    if not 0 <= min_tier < len(CUSTOMER_TIERS):
+        raise ValueError("Unknown customer tier.")
+    if starts is not None and ends is not None and ends <= starts:
+        raise ValueError("Promotion must end after it starts.")
+    
+    with state_lock:
+        promotion_id = next_promotion_id
+        commit_mutation({
+            "op": "add_promotion",
+            "promotion_id": promotion_id,
+            "promotion": {
+                "name": name,
+                "kind": kind,
+                "scope": scope,
+                "value": value,
+                "percent": percent,
+                "buy": buy,
+                "free": free,
+                "min_tier": min_tier,
+                "starts": starts,
+                "ends": ends
+            }
+        })
+        return promotion_id
+
+
+def end_promotion(promotion_id: int) -> None:
+    """
+    Withdraws a promotion rule.
+    
+    Raises:
+        ValueError: If the promotion does not exist
+    """
+    with state_lock:
+        if promotion_id not in promotions:
+            raise ValueError("Promotion not found.")
+        commit_mutation({"op": "end_promotion", "promotion_id": promotion_id})
+
+
+def set_customer_tier(customer_name: str, tier: int) -> None:
+    """
+    Assigns a customer to a tier for tier-restricted promotions.
+    
+    Raises:
+        ValueError: If the tier does not exist
+    """
+    if not 0 <= tier < len(CUSTOMER_TIERS):
+        raise ValueError("Unknown customer tier.")
+    commit_mutation({"op": "customer_tier", "customer": customer_name, "tier": tier})
+
+
+def view_promotions() -> None:
+    """Displays every promotion rule."""
+    print("\n" + "="*90)
+    print("PROMOTIONS".center(90))
+    print("="*90)
+    
+    if not promotions:
+        print("No promotions defined.")
+        return
+    
+    print(f"{'ID':<5} {'Name':<22} {'Applies To':<24} {'Offer':<14} {'Tier':<8} {'Ends':<12}")
+    print("-"*90)
+    for promotion_id, rule in sorted(promotions.items()):
+        target = "Everything" if rule["scope"] == "all" else f"{rule['scope']}: {rule['value']}"
+        offer = (f"{rule['percent']}% off" if rule["kind"] == "percent"
+                 else f"Buy {rule['buy']} get {rule['free']}")
+        ends = datetime.fromtimestamp(rule["ends"]).strftime("%Y-%m-%d") if rule["ends"] else "-"
+        print(f"{promotion_id:<5} {rule['name']:<22} {target:<24} {offer:<14} "
+              f"{CUSTOMER_TIERS[rule['min_tier']]:<8} {ends:<12}")
+    print("="*90)
+
+
+def read_promotion_window() -> Tuple[Optional[float], Optional[float]]:
+    """
+    Reads a promotion's start and end dates (blank for none).
+    
+    Returns:
+        Tuple of (starts, ends) timestamps; a bare start date means the
+        start of that day and a bare end date the end of it
+    """
+    start_text = prompt_input("Start date YYYY-MM-DD (Enter for now): ").strip()
+    end_text = prompt_input("End date YYYY-MM-DD (Enter for none): ").strip()
+    starts = ends = None
+    if start_text:
+        starts = (datetime.strptime(start_text, "%Y-%m-%d").timestamp()
+                  if len(start_text) == 10 else parse_timestamp(start_text))
+    if end_text:
+        ends = parse_timestamp(end_text)
+    return starts, ends
+
+
+def promotions_menu() -> None:
+    """Displays the promotions submenu."""
+    tiers = ", ".join(f"{number}={tier}" for number, tier in enumerate(CUSTOMER_TIERS))
+    while True:
+        print("\n" + "="*40)
+        print("PROMOTIONS MENU".center(40))
+        print("="*40)
+        print("1. View Promotions")
+        print("2. Add Promotion")
+        print("3. End Promotion")
+        print("4. Set Customer Tier")
+        print("5. Back to Main Menu")
+        print("="*40)
+        
+        try:
+            choice = prompt_input("Select an option: ")
+            
+            with timed_operation(f"promotions:{choice}"):
+                if choice == '1':
+                    view_promotions()
+                elif choice == '2':
+                    name = validate_non_empty_string("Enter promotion name: ")
+                    kind = {"1": "percent", "2": "buy_get"}.get(
+                        prompt_input("Offer (1) percentage off or (2) buy N get M free? ").strip())
+                    scope = prompt_input(f"Applies to ({'/'.join(PROMOTION_SCOPES)}): ").strip().lower()
+                    value = None
+                    if scope == "product":
+                        value = select_product_id("Enter product ID or search text: ")
+                    elif scope in ("author", "category"):
+                        value = validate_non_empty_string(f"Enter {scope}: ")
+                    percent, buy, free = 0.0, 0, 0
+                    if kind == "percent":
+                        percent = float(prompt_input("Enter discount percentage: "))
+                    elif kind == "buy_get":
+                        buy = int(prompt_input("Buy how many? "))
+                        free = int(prompt_input("Get how many free? "))
+                    min_tier = int(prompt_input(f"Minimum customer tier ({tiers}) [0]: ").strip() or 0)
+                    starts, ends = read_promotion_window()
+                    promotion_id = add_promotion(name, kind, scope, value, percent, buy, free,
+                                                 min_tier, starts, ends)
+                    print(f"\n✓ Promotion added with ID: {promotion_id}")
+                elif choice == '3':
+                    end_promotion(int(prompt_input("Enter promotion ID: ")))
+                    print("\n✓ Promotion ended.")
+                elif choice == '4':
+                    customer_name = validate_non_empty_string("Enter customer name: ")
+                    set_customer_tier(customer_name, int(prompt_input(f"Tier ({tiers}): ")))
+                    print("\n✓ Customer tier updated.")
+                elif choice == '5':
+                    break
+                else:
+                    print("Invalid option. Please try again.")
+        except Exception as e:
+            print(f"Error: {str(e)}")
+
+
+# ==================== STOCK RESERVATIONS ====================
+
+def available_stock(product_id: int) -> int:
+    """
+    Returns the stock of a product that is not held by a reservation.
+    
+    Args:
+        product_id: Product identifier
+    
+    Returns:
+        Units available for sale or new holds
+    """
+    return inventory[product_id]["stock"] - reserved_stock.get(product_id, 0)
+
+
+def wheel_schedule(reservation_id: int, expiry_tick: int) -> None:
+    """
+    Places a reservation in the timing wheel slot for its expiry tick.
+    
+    The level is the highest wheel digit in which the expiry differs from
+    the current tick, so each hold is touched once per level on its way
+    down instead of on every tick.
+    
+    Args:
+        reservation_id: Reservation identifier
+        expiry_tick: Tick at which the hold expires
+    """
+    current = timing_wheel["tick"]
+    expiry_tick = max(expiry_tick, current)
+    level = max(0, ((expiry_tick ^ current).bit_length() - 1) // TIMING_WHEEL_BITS)
+    level = min(level, TIMING_WHEEL_LEVELS - 1)
+    index = (expiry_tick >> (TIMING_WHEEL_BITS * level)) & ((1 << TIMING_WHEEL_BITS) - 1)
+    timing_wheel["levels"][level][index].add(reservation_id)
+    reservations[reservation_id]["slot"] = (level, index)
+
+
+def wheel_unschedule(reservation_id: int) -> None:
+    """
+    Removes a reservation from the timing wheel in O(1).
+    
+    Args:
+        reservation_id: Reservation identifier
+    """
+    level, index = reservations[reservation_id]["slot"]
+    timing_wheel["levels"][level][index].discard(reservation_id)
+
+
+def wheel_tick() -> List[int]:
+    """
+    Advances the timing wheel by one tick.
+    
+    When a lower wheel wraps around, the matching slot of the wheel above
+    is cascaded (its holds re-scheduled into finer slots); then the
+    current level-0 slot is emptied.
+    
+    Returns:
+        Reservation ids that expire at the new tick
+    """
+    timing_wheel["tick"] += 1
+    tick = timing_wheel["tick"]
+    mask = (1 << TIMING_WHEEL_BITS) - 1
+    levels = timing_wheel["levels"]
+    
+    for level in range(TIMING_WHEEL_LEVELS - 1, 0, -1):
+        if tick & ((1 << (TIMING_WHEEL_BITS * level)) - 1) == 0:
+            index = (tick >> (TIMING_WHEEL_BITS * level)) & mask
+            cascading, levels[level][index] = levels[level][index], set()
+            for reservation_id in cascading:
+                wheel_schedule(reservation_id,
+                               int(reservations[reservation_id]["expires_at"] // RESERVATION_TICK))
+    
+    expired, levels[0][tick & mask] = levels[0][tick & mask], set()
+    return list(expired)
+
+
+def advance_reservations(now: Optional[float] = None) -> None:
+    """
+    Runs the timing wheel up to now and releases holds that have expired.
+    
+    Replicas never call this: expiries reach them as release entries in
+    the primary's log.
+    
+    Args:
+        now: Current time (defaults to now)
+    """
+    if replication_state["role"] == "replica":
+        return
+    if now is None:
+        now = current_time()
+    target = int(now // RESERVATION_TICK)
+    
+    with state_lock:
+        if not reservations:
+            timing_wheel["tick"] = max(timing_wheel["tick"], target)
+            return
+        while timing_wheel["tick"] < target:
+            for reservation_id in wheel_tick():
+                commit_mutation({"op": "release", "reservation_id": reservation_id,
+                                 "reason": "expired"})
+
+
+def apply_reservation(mutation: Dict) -> None:
+    """
+    Applies a "reserve" log entry: holds the stock and schedules its expiry.
+    
+    Args:
+        mutation: Reserve entry
+    """
+    global next_reservation_id
+    
+    reservation_id = mutation["reservation_id"]
+    reservations[reservation_id] = {
+        "product_id": mutation["product_id"],
+        "quantity": mutation["quantity"],
+        "expires_at": mutation["expires_at"]
+    }
+    reserved_stock[mutation["product_id"]] = (
+        reserved_stock.get(mutation["product_id"], 0) + mutation["quantity"])
+    next_reservation_id = max(next_reservation_id, reservation_id + 1)
+    # The current tick's slot has already been emptied, so a hold due by
+    # then goes in the next one rather than waiting a full rotation
+    wheel_schedule(reservation_id, max(int(mutation["expires_at"] // RESERVATION_TICK),
+                                       timing_wheel["tick"] + 1))
+
+
+def apply_release(reservation_id: int) -> None:
+    """
+    Applies a "release" log entry: returns the held stock to availability.
+    
+    Args:
+        reservation_id: Reservation identifier
+    """
+    wheel_unschedule(reservation_id)
+    hold = reservations.pop(reservation_id)
+    remaining = reserved_stock[hold["product_id"]] - hold["quantity"]
+    if remaining:
+        reserved_stock[hold["product_id"]] = remaining
+    else:
+        del reserved_stock[hold["product_id"]]
+
+
+def reserve_stock(product_id: int, quantity: int, ttl: float = RESERVATION_TTL) -> int:
+    """
+    Places a timed hold on stock, e.g. for a web order awaiting payment.
+    
+    Args:
+        product_id: Product identifier
+        quantity: Units to hold
+        ttl: Seconds until the hold expires
+    
+    Returns:
+        Reservation ID
+    
+    Raises:
+        ValueError: If the product is unknown, not enough stock is available
+            or the hold time is not positive
+    """
+    if ttl <= 0:
+        raise ValueError("Hold time must be positive.")
+    with state_lock:
+        advance_reservations()
+        if product_id not in inventory:
+            raise ValueError("Product not found.")
+        if quantity < MIN_QUANTITY:
+            raise ValueError("Quantity must be positive.")
+        if available_stock(product_id) < quantity:
+            raise ValueError(f"Insufficient stock. Available: {available_stock(product_id)}")
+        
+        reservation_id = next_reservation_id
+        commit_mutation({
+            "op": "reserve",
+            "reservation_id": reservation_id,
+            "product_id": product_id,
+            "quantity": quantity,
+            "expires_at": current_time() + ttl
+        })
+        return reservation_id
+
+
+def release_reservation(reservation_id: int) -> None:
+    """
+    Cancels a hold before it expires.
+    
+    Args:
+        reservation_id: Reservation identifier
+    
+    Raises:
+        ValueError: If the reservation does not exist (or already expired)
+    """
+    with state_lock:
+        advance_reservations()
+        if reservation_id not in reservations:
+            raise ValueError("Reservation not found or expired.")
+        commit_mutation({"op": "release", "reservation_id": reservation_id,
+                         "reason": "cancelled"})
+
+
+def confirm_reservation(reservation_id: int, customer_name: str, discount: float = 0.0,
+                        request_id: Optional[str] = None) -> Dict:
+    """
+    Turns a hold into a sale once payment has gone through.
+    
+    The sale and the release of the hold are a single log entry; if the
+    sale is rejected (e.g. an invalid discount) the hold stays in place.
+    
+    Args:
+        reservation_id: Reservation identifier
+        customer_name: Customer name
+        discount: Discount percentage (0-100)
+        request_id: Idempotency key; a retried confirmation returns the sale
+    
+    Returns:
+        The recorded sale
+    
+    Raises:
+        ValueError: If the reservation does not exist (or already expired),
+            the sale is invalid, or the request id was already used for a
+            different sale
+    """
+    with state_lock:
+        if request_id:
+            original = find_sale_request(request_id)
+            if original is not None:
+                # Once confirmed the hold is gone, and the sale stands in for it
+                hold = reservations.get(reservation_id, original)
+                return check_duplicate_sale(original, customer_name, hold["product_id"],
+                                            hold["quantity"], reservation_id)
+        advance_reservations()
+        if reservation_id not in reservations:
+            raise ValueError("Reservation not found or expired.")
+        hold = reservations[reservation_id]
+        return create_sale(customer_name, hold["product_id"], hold["quantity"], discount,
+                           request_id, reservation_id)
+
+
+def view_reservations() -> None:
+    """Displays all pending stock holds."""
+    advance_reservations()
+    print("\n" + "="*70)
+    print("PENDING RESERVATIONS".center(70))
+    print("="*70)
+    
+    if not reservations:
+        print("No pending reservations.")
+        return
+    
+    print(f"{'ID':<6} {'Product':<30} {'Qty':<6} {'Expires':<20}")
+    print("-"*70)
+    for reservation_id, hold in sorted(reservations.items()):
+        product = inventory.get(hold["product_id"])
+        title = product['title'] if product else f"Product #{hold['product_id']}"
+        expires = datetime.fromtimestamp(hold["expires_at"]).strftime(DATE_FORMAT)
+        print(f"{reservation_id:<6} {title:<30} {hold['quantity']:<6} {expires:<20}")
+    print("="*70)
+
+
+def reservations_menu() -> None:
+    """Displays the stock reservations submenu."""
+    while True:
+        print("\n" + "="*40)
+        print("RESERVATIONS MENU".center(40))
+        print("="*40)
+        print("1. Place Hold")
+        print("2. Confirm Hold as Sale")
+        print("3. Cancel Hold")
+        print("4. View Pending Holds")
+        print("5. Back to Main Menu")
+        print("="*40)
+        
+        try:
+            choice = prompt_input("Select an option: ")
+            
+            with timed_operation(f"reservations:{choice}"):
+                if choice == '1':
+                    product_id = select_product_id("Enter product ID or search text: ")
+                    quantity = int(validate_positive_number("Enter quantity: ", int))
+                    minutes = prompt_input(f"Hold for minutes [{RESERVATION_TTL // 60}]: ").strip()
+                    ttl = float(minutes) * 60 if minutes else RESERVATION_TTL
+                    reservation_id = reserve_stock(product_id, quantity, ttl)
+                    print(f"\n✓ Stock held with reservation ID: {reservation_id}")
+                elif choice == '2':
+                    reservation_id = int(prompt_input("Enter reservation ID: "))
+                    customer_name = validate_non_empty_string("Enter customer name: ")
+                    discount = float(prompt_input("Enter discount percentage (0 if none): "))
+                    sale = confirm_reservation(reservation_id, customer_name, discount)
+                    print(f"\n✓ Sale {sale['sale_id']} registered: ${format_money(sale['total'])}")
+                elif choice == '3':
+                    release_reservation(int(prompt_input("Enter reservation ID: ")))
+                    print("\n✓ Hold cancelled.")
+                elif choice == '4':
+                    view_reservations()
+                elif choice == '5':
+                    break
+                else:
+                    print("Invalid option. Please try again.")
+        except Exception as e:
+            print(f"Error: {str(e)}")
+
+
+# ==================== STREAMING ANALYTICS ====================
+
+def stream_hash(key: str) -> int:
+    """
+    Hashes a key to 64 bits, identically in every process.
+    
+    Args:
+        key: Key to hash
+    
+    Returns:
+        Unsigned 64-bit hash
+    """
+    digest = hashlib.blake2b(key.encode("utf-8"), digest_size=8).digest()
+    return int.from_bytes(digest, "big")
+
+
+def new_count_min_sketch(epsilon: float, delta: float) -> Dict:
+    """
+    Creates a Count-Min Sketch.
+    
+    Args:
+        epsilon: Overestimate bound as a fraction of the total count
+        delta: Probability of exceeding the bound
+    
+    Returns:
+        Empty sketch
+    """
+    width = math.ceil(math.e / epsilon)
+    depth = math.ceil(math.log(1 / delta))
+    return {"width": width, "depth": depth, "table": [[0] * width for _ in range(depth)]}
+
+
+def cms_add(sketch: Dict, key: str, count: int = 1) -> None:
+    """
+    Adds a count for a key to a Count-Min Sketch.
+    
+    Args:
+        sketch: Count-Min Sketch
+        key: Item key
+        count: Amount to add
+    """
+    hashed = stream_hash(key)
+    first, second = hashed & 0xFFFFFFFF, hashed >> 32
+    width = sketch["width"]
+    for row, counters in enumerate(sketch["table"]):
+        counters[(first + row * second) % width] += count
+
+
+def cms_estimate(sketch: Dict, key: str) -> int:
+    """
+    Estimates the count of a key (never underestimates).
+    
+    Args:
+        sketch: Count-Min Sketch
+        key: Item key
+    
+    Returns:
+        Estimated count
+    """
+    hashed = stream_hash(key)
+    first, second = hashed & 0xFFFFFFFF, hashed >> 32
+    width = sketch["width"]
+    return min(counters[(first + row * second) % width]
+               for row, counters in enumerate(sketch["table"]))
+
+
+def cms_merge(target: Dict, other: Dict) -> None:
+    """
+    Merges another Count-Min Sketch of the same shape into target.
+    
+    Args:
+        target: Sketch to update
+        other: Sketch to merge in
+    """
+    if (target["width"], target["depth"]) != (other["width"], other["depth"]):
+        raise ValueError("Count-Min Sketches have different dimensions")
+    for counters, others in zip(target["table"], other["table"]):
+        for i, count in enumerate(others):
+            counters[i] += count
+
+
+def new_space_saving(capacity: int) -> Dict:
+    """
+    Creates a Space-Saving heavy-hitters summary.
+    
+    Args:
+        capacity: Number of monitored items
+    
+    Returns:
+        Empty summary mapping item -> [count, overestimation], plus a lazy
+        min-heap of (count, item) entries used to find the smallest counter
+    """
+    return {"capacity": capacity, "counters": {}, "heap": []}
+
+
+def space_saving_add(summary: Dict, key: str, count: int = 1) -> None:
+    """
+    Adds a weighted occurrence of an item to a Space-Saving summary.
+    
+    Args:
+        summary: Space-Saving summary
+        key: Item key
+        count: Weight of the occurrence
+    """
+    counters = summary["counters"]
+    heap = summary["heap"]
+    if key in counters:
+        counters[key][0] += count
+    elif count < 0:
+        return  # Returned units of an unmonitored item: already within its error
+    elif len(counters) < summary["capacity"]:
+        counters[key] = [count, 0]
+    else:
+        # Replace the smallest counter; its count becomes the new error.
+        # Heap entries whose count is out of date are discarded on the way.
+        while heap[0][0] != counters.get(heap[0][1], [None])[0]:
+            heapq.heappop(heap)
+        floor, victim = heapq.heappop(heap)
+        del counters[victim]
+        counters[key] = [floor + count, floor]
+    heapq.heappush(heap, (counters[key][0], key))
+    if len(heap) > 4 * summary["capacity"]:
+        rebuild_space_saving_heap(summary)
+
+
+def rebuild_space_saving_heap(summary: Dict) -> None:
+    """
+    Rebuilds the min-heap of a Space-Saving summary from its counters.
+    
+    Args:
+        summary: Space-Saving summary
+    """
+    summary["heap"] = [(count, key) for key, (count, _) in summary["counters"].items()]
+    heapq.heapify(summary["heap"])
+
+
+def space_saving_merge(target: Dict, other: Dict) -> None:
+    """
+    Merges another Space-Saving summary into target, keeping the largest items.
+    
+    Args:
+        target: Summary to update
+        other: Summary to merge in
+    """
+    counters = target["counters"]
+    for key, (count, error) in other["counters"].items():
+        if key in counters:
+            counters[key][0] += count
+            counters[key][1] += error
+        else:
+            counters[key] = [count, error]
+    if len(counters) > target["capacity"]:
+        kept = sorted(counters.items(), key=lambda x: x[1][0], reverse=True)
+        target["counters"] = dict(kept[:target["capacity"]])
+    rebuild_space_saving_heap(target)
+
+
+def space_saving_top(summary: Dict, n: int) -> List[Tuple[str, int, int]]:
+    """
+    Returns the heaviest items of a Space-Saving summary.
+    
+    Args:
+        summary: Space-Saving summary
+        n: Number of items
+    
+    Returns:
+        List of (key, estimated count, maximum overestimation)
+    """
+    ranked = sorted(summary["counters"].items(), key=lambda x: x[1][0], reverse=True)
+    return [(key, count, error) for key, (count, error) in ranked[:n]]
+
+
+def new_hyperloglog(relative_error: float) -> Dict:
+    """
+    Creates a HyperLogLog distinct counter.
+    
+    Args:
+        relative_error: Target standard error (1.04 / sqrt(registers))
+    
+    Returns:
+        Empty HyperLogLog
+    """
+    precision = min(18, max(4, math.ceil(math.log2((1.04 / relative_error) ** 2))))
+    return {"precision": precision, "registers": [0] * (1 << precision)}
+
+
+def hll_add(hll: Dict, key: str) -> None:
+    """
+    Adds an item to a HyperLogLog.
+    
+    Args:
+        hll: HyperLogLog
+        key: Item key
+    """
+    hashed = stream_hash(key)
+    precision = hll["precision"]
+    index = hashed >> (64 - precision)
+    remainder = hashed & ((1 << (64 - precision)) - 1)
+    rank = (64 - precision) - remainder.bit_length() + 1
+    if rank > hll["registers"][index]:
+        hll["registers"][index] = rank
+
+
+def hll_estimate(hll: Dict) -> int:
+    """
+    Estimates the number of distinct items added to a HyperLogLog.
+    
+    Args:
+        hll: HyperLogLog
+    
+    Returns:
+        Estimated distinct count
+    """
+    registers = hll["registers"]
+    m = len(registers)
+    alpha = 0.7213 / (1 + 1.079 / m)
+    estimate = alpha * m * m / sum(2.0 ** -register for register in registers)
+    zeros = registers.count(0)
+    if estimate <= 2.5 * m and zeros:
+        # Small-range correction (linear counting)
+        estimate = m * math.log(m / zeros)
+    return round(estimate)
+
+
+def hll_merge(target: Dict, other: Dict) -> None:
+    """
+    Merges another HyperLogLog of the same precision into target.
+    
+    Args:
+        target: HyperLogLog to update
+        other: HyperLogLog to merge in
+    """
+    if target["precision"] != other["precision"]:
+        raise ValueError("HyperLogLogs have different precisions")
+    target["registers"] = [max(a, b) for a, b in zip(target["registers"], other["registers"])]
+
+
+def new_stream_sketches() -> Dict:
+    """
+    Creates the set of sketches behind the live dashboard.
+    
+    Returns:
+        Empty sketches configured from the STREAM_* error bounds
+    """
+    capacity = max(STREAM_TOP_K, math.ceil(1 / STREAM_EPSILON))
+    return {
+        "total_units": 0,
+        "product_units": new_count_min_sketch(STREAM_EPSILON, STREAM_DELTA),
+        "author_units": new_count_min_sketch(STREAM_EPSILON, STREAM_DELTA),
+        "top_products": new_space_saving(capacity),
+        "top_authors": new_space_saving(capacity),
+        "customers": new_hyperloglog(STREAM_HLL_ERROR)
+    }
+
+
+def update_stream_sketches(sale: Dict) -> None:
+    """
+    Feeds a registered sale into the streaming sketches.
+    
+    Args:
+        sale: Sale record
+    """
+    product_key = str(sale['product_id'])
+    quantity = sale['quantity']
+    stream_sketches["total_units"] += quantity
+    cms_add(stream_sketches["product_units"], product_key, quantity)
+    cms_add(stream_sketches["author_units"], sale['author'], quantity)
+    space_saving_add(stream_sketches["top_products"], product_key, quantity)
+    space_saving_add(stream_sketches["top_authors"], sale['author'], quantity)
+    hll_add(stream_sketches["customers"], normalize_text(sale['customer']))
+
+
+def export_stream_sketches(path: str) -> None:
+    """
+    Writes the streaming sketches to a file so another process can merge them.
+    
+    Args:
+        path: Destination file
+    """
+    with state_lock:
+        text = json.dumps(stream_sketches)
+    with open(path, "w", encoding="utf-8") as handle:
+        handle.write(text)
+
+
+def merge_stream_sketches(path: str) -> None:
+    """
+    Merges sketches exported by another process into this process's sketches.
+    
+    Args:
+        path: File written by export_stream_sketches
+    """
+    with open(path, encoding="utf-8") as handle:
+        other = json.load(handle)
+    with state_lock:
+        stream_sketches["total_units"] += other["total_units"]
+        cms_merge(stream_sketches["product_units"], other["product_units"])
+        cms_merge(stream_sketches["author_units"], other["author_units"])
+        space_saving_merge(stream_sketches["top_products"], other["top_products"])
+        space_saving_merge(stream_sketches["top_authors"], other["top_authors"])
+        hll_merge(stream_sketches["customers"], other["customers"])
+
+
+def product_label(product_key: str) -> str:
+    """Returns a display title for a product key used in the sketches."""
+    product = inventory.get(int(product_key))
+    return product['title'] if product else f"Product #{product_key}"
+
+
+def generate_live_dashboard() -> None:
+    """Displays approximate best-sellers and distinct customers from the sketches."""
+    print("\n" + "="*70)
+    print("LIVE DASHBOARD (APPROXIMATE)".center(70))
+    print("="*70)
+    
+    total_units = stream_sketches["total_units"]
+    if not total_units:
+        print("No sales data available.")
+        return
+    
+    print(f"Units Sold: {total_units}   "
+          f"Distinct Customers: ~{hll_estimate(stream_sketches['customers'])}")
+    print(f"Counts are within +{math.ceil(STREAM_EPSILON * total_units)} units "
+          f"with {1 - STREAM_DELTA:.0%} confidence")
+    
+    print(f"\n{'Product':<40} {'Units (est.)':<14} {'Max Over':<10}")
+    print("-"*70)
+    for key, count, error in space_saving_top(stream_sketches["top_products"], STREAM_TOP_K):
+        print(f"{product_label(key):<40} {count:<14} {error:<10}")
+    
+    print(f"\n{'Author':<40} {'Units (est.)':<14} {'Max Over':<10}")
+    print("-"*70)
+    for key, count, error in space_saving_top(stream_sketches["top_authors"], STREAM_TOP_K):
+        print(f"{key:<40} {count:<14} {error:<10}")
+    print("="*70)
+
+
+def validate_stream_sketches() -> None:
+    """Compares the sketch estimates against exact figures from the sales ledger."""
+    print("\n" + "="*70)
+    print("STREAMING ESTIMATES VS EXACT".center(70))
+    print("="*70)
+    
+    if next_sale_id == 1:
+        print("No sales data available.")
+        return
+    
+    product_units: Dict[str, int] = {}
+    author_units: Dict[str, int] = {}
+    customers = set()
+    with contextlib.ExitStack() as reads:
+        # The sketches are copied at the same log position as the snapshot
+        # the ledger is then scanned from, while sales carry on
+        with state_lock:
+            reads.enter_context(snapshot_reads())
+            sketches = {}
+            for name in ("product_units", "author_units"):
+                sketch = stream_sketches[name]
+                sketches[name] = dict(sketch, table=[list(row) for row in sketch["table"]])
+            estimate = hll_estimate(stream_sketches["customers"])
+            sketch_top = [key for key, _, _ in space_saving_top(stream_sketches["top_products"], 3)]
+        for sale in iter_sales():
+            product_key = str(sale['product_id'])
+            product_units[product_key] = product_units.get(product_key, 0) + sale['quantity']
+            author_units[sale['author']] = author_units.get(sale['author'], 0) + sale['quantity']
+            customers.add(normalize_text(sale['customer']))
+    
+    bound = STREAM_EPSILON * sum(product_units.values())
+    for label, exact, sketch in (("Products", product_units, sketches["product_units"]),
+                                 ("Authors", author_units, sketches["author_units"])):
+        errors = [cms_estimate(sketch, key) - count for key, count in exact.items()]
+        within = sum(1 for error in errors if error <= bound)
+        print(f"{label}: max overestimate {max(errors)} units, "
+              f"{within}/{len(errors)} within bound {bound:.1f}")
+    
+    error = abs(estimate - len(customers)) / len(customers)
+    print(f"Distinct customers: exact {len(customers)}, estimated {estimate} "
+          f"({error:.2%} error, target {STREAM_HLL_ERROR:.0%})")
+    
+    exact_top = sorted(product_units, key=product_units.get, reverse=True)[:3]
+    print(f"Top 3 products match exact report: {'yes' if exact_top == sketch_top else 'no'}")
+    print("="*70)
+
+
+# ==================== ROLLING METRICS ====================
+
+def new_rolling_window(label: str, resolution: int, size: int) -> Dict:
+    """
+    Creates a ring buffer of per-slot totals covering size * resolution seconds.
+    
+    Args:
+        label: Display name of the window
+        resolution: Seconds covered by each slot
+        size: Number of slots
+    
+    Returns:
+        Empty rolling window
+    """
+    return {
+        "label": label,
+        "resolution": resolution,
+        "slots": [[0] * len(ROLLING_METRICS) for _ in range(size)],
+        "totals": [0] * len(ROLLING_METRICS),
+        "current": 0
+    }
+
+
+def advance_rolling_window(window: Dict, timestamp: float) -> None:
+    """
+    Moves a window forward to a point in time, expiring slots that fell out.
+    
+    At most one pass over the ring is needed however long the window was
+    idle, so the cost is amortized O(1) per call.
+    
+    Args:
+        window: Rolling window
+        timestamp: Current time (seconds since the epoch)
+    """
+    slots = window["slots"]
+    current = int(timestamp // window["resolution"])
+    if current > window["current"]:
+        totals = window["totals"]
+        start = max(window["current"] + 1, current - len(slots) + 1)
+        for slot_number in range(start, current + 1):
+            slot = slots[slot_number % len(slots)]
+            for i, value in enumerate(slot):
+                totals[i] -= value
+                slot[i] = 0
+        window["current"] = current
+
+
+def update_rolling_windows(sale: Dict, timestamp: float) -> None:
+    """
+    Adds a sale to every rolling window.
+    
+    Args:
+        sale: Sale record
+        timestamp: Time of the sale (seconds since the epoch)
+    """
+    values = (sale['total'], sale['quantity'], sale['discount_amount'])
+    for window in rolling_windows:
+        advance_rolling_window(window, timestamp)
+        slots = window["slots"]
+        slot_number = int(timestamp // window["resolution"])
+        if slot_number <= window["current"] - len(slots):
+            continue  # Already outside the window
+        slot = slots[slot_number % len(slots)]
+        totals = window["totals"]
+        for i, value in enumerate(values):
+            slot[i] += value
+            totals[i] += value
+
+
+def rolling_metrics(timestamp: Optional[float] = None) -> List[Tuple[str, Dict[str, int]]]:
+    """
+    Reads the rolling totals without touching sales_records.
+    
+    Args:
+        timestamp: Time to evaluate at (defaults to now)
+    
+    Returns:
+        List of (window label, {metric: total}) pairs
+    """
+    if timestamp is None:
+        timestamp = current_time()
+    metrics = []
+    for window in rolling_windows:
+        advance_rolling_window(window, timestamp)
+        metrics.append((window["label"], dict(zip(ROLLING_METRICS, window["totals"]))))
+    return metrics
+
+
+def generate_rolling_metrics_report() -> None:
+    """Displays revenue, units and discounts over the rolling windows."""
+    print("\n" + "="*60)
+    print("ROLLING REVENUE".center(60))
+    print("="*60)
+    print(f"{'Window':<18} {'Revenue':<14} {'Units':<10} {'Discount':<12}")
+    print("-"*60)
+    for label, totals in rolling_metrics():
+        print(f"{label:<18} ${format_money(totals['revenue']):<13} {totals['units']:<10} "
+              f"${format_money(totals['discount']):<11}")
+    print("="*60)
+
+
+# ==================== REPLICATION ====================
+
+def send_json_line(stream, message: Dict) -> None:
+    """Writes one newline-delimited JSON message to a socket stream."""
+    stream.write(json.dumps(message) + "\n")
+
+
+def serve_replica(connection: socket.socket, address: Tuple) -> None:
+    """
+    Ships the mutation log to one replica until it disconnects.
+    
+    The replica first sends how many entries it already has; the log is
+    then streamed from that point, with heartbeats carrying the primary's
+    head position while there is nothing new to send. A replica whose
+    position has been truncated from the log gets a checkpoint first.
+    
+    Args:
+        connection: Accepted replica socket
+        address: Replica address, used as its name in the status report
+    """
+    name = f"{address[0]}:{address[1]}"
+    try:
+        with connection, connection.makefile("r", encoding="utf-8") as reader, \
+                connection.makefile("w", encoding="utf-8") as writer:
+            cursor = int(json.loads(reader.readline())["from_seq"])
+            while True:
+                with log_updated:
+                    log_updated.wait_for(lambda: log_head() > cursor,
+                                         timeout=REPLICATION_HEARTBEAT)
+                checkpoint, entries = read_mutation_log(cursor)
+                if checkpoint is not None:
+                    send_json_line(writer, checkpoint)
+                    cursor = checkpoint["seq"]
+                for entry in entries:
+                    send_json_line(writer, entry)
+                cursor += len(entries)
+                send_json_line(writer, {"op": "heartbeat", "seq": cursor, "ts": time.time()})
+                writer.flush()
+                replication_state["replicas"][name] = cursor
+    except (OSError, ValueError, KeyError):
+        pass
+    finally:
+        replication_state["replicas"].pop(name, None)
+
+
+def start_primary(port: int = REPLICATION_PORT) -> None:
+    """
+    Starts accepting replica connections in the background.
+    
+    Args:
+        port: Local TCP port to listen on
+    """
+    server = socket.create_server((REPLICATION_HOST, port))
+    replication_state["role"] = "primary"
+    
+    def accept_replicas() -> None:
+        while True:
+            connection, address = server.accept()
+            threading.Thread(target=serve_replica, args=(connection, address),
+                             daemon=True).start()
+    
+    threading.Thread(target=accept_replicas, daemon=True).start()
+    print(f"Primary listening for replicas on {REPLICATION_HOST}:{port}")
+
+
+def follow_primary(host: str, port: int) -> None:
+    """
+    Applies the primary's mutation log as it arrives, reconnecting on failure.
+    
+    Args:
+        host: Primary host
+        port: Primary replication port
+    """
+    while True:
+        try:
+            with socket.create_connection((host, port)) as connection, \
+                    connection.makefile("r", encoding="utf-8") as reader, \
+                    connection.makefile("w", encoding="utf-8") as writer:
+                send_json_line(writer, {"from_seq": log_head()})
+                writer.flush()
+                replication_state["connected"] = True
+                for line in reader:
+                    entry = json.loads(line)
+                    if entry["op"] == "heartbeat":
+                        replication_state["primary_seq"] = entry["seq"]
+                        if entry["seq"] <= log_head():
+                            replication_state["lag_seconds"] = 0.0
+                        continue
+                    if entry["op"] == "checkpoint":
+                        load_checkpoint(entry)
+                    elif entry["seq"] <= log_head():
+                        continue  # Already applied before a reconnect
+                    else:
+                        commit_mutation(entry)
+                    replication_state["applied_seq"] = entry["seq"]
+                    replication_state["primary_seq"] = max(replication_state["primary_seq"],
+                                                           entry["seq"])
+                    replication_state["lag_seconds"] = max(0.0, time.time() - entry["ts"])
+        except (OSError, ValueError, KeyError):
+            pass
+        replication_state["connected"] = False
+        time.sleep(REPLICATION_RETRY_DELAY)
+
+
+def replication_lag() -> Dict:
+    """
+    Reports how far this replica is behind its primary.
+    
+    Returns:
+        Dict with applied/primary sequence numbers, lag in entries and in
+        seconds (delay between commit on the primary and apply here)
+    """
+    return {
+        "applied_seq": replication_state["applied_seq"],
+        "primary_seq": replication_state["primary_seq"],
+        "lag_entries": max(0, replication_state["primary_seq"] - replication_state["applied_seq"]),
+        "lag_seconds": replication_state["lag_seconds"],
+        "connected": replication_state["connected"]
+    }
+
+
+def view_replication_status() -> None:
+    """Displays the replication role and lag of this process."""
+    print("\n" + "="*50)
+    print("REPLICATION STATUS".center(50))
+    print("="*50)
+    role = replication_state["role"]
+    print(f"Role: {role}")
+    print(f"Log Entries: {log_head()} ({len(mutation_log)} retained, "
+          f"{log_state['checkpoints']} checkpoints sent)")
+    
+    if role == "primary":
+        if not replication_state["replicas"]:
+            print("No replicas connected.")
+        for name, cursor in list(replication_state["replicas"].items()):
+            print(f"Replica {name}: shipped {cursor} (behind {log_head() - cursor})")
+    elif role == "replica":
+        lag = replication_lag()
+        print(f"Connected: {'yes' if lag['connected'] else 'no'}")
+        print(f"Applied: {lag['applied_seq']} / {lag['primary_seq']} "
+              f"(lag {lag['lag_entries']} entries, {lag['lag_seconds']:.3f}s)")
+    print("="*50)
+
+
+def run_replica(address: str) -> None:
+    """
+    Runs this process as a read replica serving the reports menu.
+    
+    Args:
+        address: Primary address as "host:port"
+    """
+    host, _, port = address.rpartition(":")
+    replication_state["role"] = "replica"
+    threading.Thread(target=follow_primary, args=(host or REPLICATION_HOST, int(port)),
+                     daemon=True).start()
+    print(f"Replica following primary at {address}")
+    reports_menu()
+
+
+# ==================== CHANGE DATA CAPTURE ====================
+
+def stock_event(product_id: int, delta: int) -> Tuple[str, Dict]:
+    """Builds a stock.changed event from the product's current stock."""
+    product = inventory.get(product_id)
+    stock = product['stock'] if product else 0
+    return "stock.changed", {"product_id": product_id, "delta": delta, "stock": stock,
+                             "available": stock - reserved_stock.get(product_id, 0)}
+
+
+def mutation_events(mutation: Dict, hold: Optional[Dict] = None,
+                    stock_before: Optional[int] = None) -> List[Tuple[str, Dict]]:
+    """
+    Translates an applied mutation into typed change events.
+    
+    Args:
+        mutation: Mutation just applied
+        hold: For a "release" (or a sale confirming a reservation), the
+            reservation as it was before the release
+        stock_before: For an "update_product", the product's stock before it
+    
+    Returns:
+        List of (event type, data) pairs
+    """
+    op = mutation["op"]
+    if op == "add_product":
+        return [("product.created", {"product_id": mutation["product_id"],
+                                     "product": dict(inventory[mutation["product_id"]])})]
+    if op == "update_product":
+        product_id = mutation["product_id"]
+        events = [("product.updated", {"product_id": product_id, "changes": mutation["changes"],
+                                       "product": dict(inventory[product_id])})]
+        if "stock" in mutation["changes"]:
+            delta = 0 if stock_before is None else inventory[product_id]['stock'] - stock_before
+            events.append(stock_event(product_id, delta))
+        return events
+    if op == "delete_product":
+        return [("product.deleted", {"product_id": mutation["product_id"]})]
+    if op in ("sale", "return"):
+        sale = mutation["sale"]
+        kind = "sale.recorded" if op == "sale" else "sale.returned"
+        events = [(kind, sale), stock_event(sale['product_id'], -sale['quantity'])]
+        if hold is not None:
+            events.insert(0, ("stock.released", {"reservation_id": mutation["reservation_id"],
+                                                 "product_id": hold["product_id"],
+                                                 "quantity": hold["quantity"],
+                                                 "reason": "confirmed"}))
+        return events
+    if op == "reserve":
+        return [("stock.reserved", {"reservation_id": mutation["reservation_id"],
+                                    "product_id": mutation["product_id"],
+                                    "quantity": mutation["quantity"],
+                                    "expires_at": mutation["expires_at"]}),
+                stock_event(mutation["product_id"], 0)]
+    if op == "release":
+        return [("stock.released", {"reservation_id": mutation["reservation_id"],
+                                    "product_id": hold["product_id"],
+                                    "quantity": hold["quantity"],
+                                    "reason": mutation.get("reason")}),
+                stock_event(hold["product_id"], 0)]
+    if op == "add_promotion":
+        return [("promotion.created", {"promotion_id": mutation["promotion_id"],
+                                       "promotion": mutation["promotion"]})]
+    if op == "end_promotion":
+        return [("promotion.ended", {"promotion_id": mutation["promotion_id"]})]
+    if op == "customer_tier":
+        return [("customer.tier_changed", {"customer": mutation["customer"],
+                                           "tier": CUSTOMER_TIERS[mutation["tier"]]})]
+    return []
+
+
+def publish_change_events(mutation: Dict, hold: Optional[Dict] = None,
+                          stock_before: Optional[int] = None) -> None:
+    """
+    Appends the events of a committed mutation to the change stream.
+    
+    Called by the writer under the state lock; it never waits for
+    subscribers. Events every subscriber has acknowledged are dropped in
+    bulk, keeping the newest CDC_RETAIN_ACKED of them; once CDC_MAX_BACKLOG
+    is exceeded because a subscriber lags, the oldest half of the backlog
+    is dropped regardless (that subscriber then skips ahead and counts
+    the gap).
+    
+    Args:
+        mutation: Mutation just applied
+        hold: For a "release" (or a sale confirming a reservation), the
+            reservation before it was released
+        stock_before: For an "update_product", the product's stock before it
+    """
+    for event_type, data in mutation_events(mutation, hold, stock_before):
+        change_events.append({"offset": change_stream["base"] + len(change_events) + 1,
+                              "type": event_type, "seq": mutation["seq"],
+                              "ts": mutation["ts"], "data": data})
+    
+    head = change_stream["base"] + len(change_events)
+    acknowledged = min((subscriber["committed"] for subscriber
+                        in change_stream["subscribers"].values()), default=head)
+    if acknowledged - change_stream["base"] > 2 * CDC_RETAIN_ACKED or len(change_events) > CDC_MAX_BACKLOG:
+        drop = max(acknowledged - change_stream["base"] - CDC_RETAIN_ACKED,
+                   len(change_events) - CDC_MAX_BACKLOG // 2)
+        del change_events[:drop]
+        change_stream["base"] += drop
+        change_stream["trimmed"] += drop
+
+
+def deliver_to_file(subscriber: Dict, batch: List[Dict]) -> None:
+    """Appends a batch to a JSON-lines file; it counts once flushed to disk."""
+    with open(subscriber["target"], "a", encoding="utf-8") as sink:
+        sink.write("".join(json.dumps(event, ensure_ascii=False) + "\n" for event in batch))
+        sink.flush()
+        os.fsync(sink.fileno())
+
+
+def deliver_to_socket(subscriber: Dict, batch: List[Dict]) -> None:
+    """
+    Sends a batch to a local socket consumer and waits for its ack.
+    
+    Each batch is one JSON line, {"events": [...]}. The consumer must
+    answer with {"ack": offset} for the last event it has processed;
+    anything less is treated as a failure and the batch is sent again
+    (at-least-once delivery).
+    """
+    if subscriber["connection"] is None:
+        host, _, port = subscriber["target"].rpartition(":")
+        connection = socket.create_connection((host or REPLICATION_HOST, int(port)),
+                                              timeout=CDC_ACK_TIMEOUT)
+        subscriber["connection"] = (connection, connection.makefile("r", encoding="utf-8"),
+                                    connection.makefile("w", encoding="utf-8"))
+    _, reader, writer = subscriber["connection"]
+    send_json_line(writer, {"events": batch})
+    writer.flush()
+    ack = json.loads(reader.readline() or "{}").get("ack", 0)
+    if ack < batch[-1]["offset"]:
+        raise ValueError(f"Consumer acknowledged {ack} of {batch[-1]['offset']}")
+
+
+def close_subscriber_connection(subscriber: Dict) -> None:
+    """Drops a socket subscriber's connection so the next batch reconnects."""
+    if subscriber["connection"] is not None:
+        for resource in reversed(subscriber["connection"]):
+            try:
+                resource.close()
+            except OSError:
+                pass
+        subscriber["connection"] = None
+
+
+def run_subscriber(subscriber: Dict) -> None:
+    """
+    Delivers the change stream to one subscriber, batch by batch.
+    
+    The committed offset only advances after a batch is delivered, so a
+    failed batch is retried from the same point.
+    
+    Args:
+        subscriber: Subscriber state (see add_change_subscriber)
+    """
+    deliver = deliver_to_file if subscriber["kind"] == "file" else deliver_to_socket
+    while True:
+        with log_updated:
+            log_updated.wait_for(lambda: change_stream["base"] + len(change_events) > subscriber["committed"],
+                                 timeout=CDC_HEARTBEAT)
+        with state_lock:
+            if subscriber["committed"] < change_stream["base"]:
+                subscriber["skipped"] += change_stream["base"] - subscriber["committed"]
+                subscriber["committed"] = change_stream["base"]
+            start = subscriber["committed"] - change_stream["base"]
+            batch = change_events[start:start + CDC_BATCH_SIZE]
+        if not batch:
+            continue
+        
+        try:
+            deliver(subscriber, batch)
+            subscriber["committed"] = batch[-1]["offset"]
+            subscriber["delivered"] += len(batch)
+            subscriber["batches"] += 1
+        except (OSError, ValueError) as e:
+            subscriber["errors"] += 1
+            subscriber["last_error"] = str(e)
+            close_subscriber_connection(subscriber)
+            time.sleep(CDC_RETRY_DELAY)
+
+
+def add_change_subscriber(kind: str, target: str, from_offset: Optional[int] = None) -> Dict:
+    """
+    Subscribes a sink to the change stream.
+    
+    Args:
+        kind: "file" (JSON lines appended to a path) or "socket"
+            (a local consumer at "host:port" that acks each batch)
+        target: File path or socket address
+        from_offset: First offset to deliver (default: new events only)
+    
+    Returns:
+        Subscriber state
+    
+    Raises:
+        ValueError: If the kind is unknown
+    """
+    if kind not in ("file", "socket"):
+        raise ValueError("Subscriber kind must be 'file' or 'socket'.")
+    with state_lock:
+        head = change_stream["base"] + len(change_events)
+        subscriber = {
+            "name": f"{kind}:{target}",
+            "kind": kind,
+            "target": target,
+            "committed": head if from_offset is None else from_offset - 1,
+            "delivered": 0,
+            "batches": 0,
+            "errors": 0,
+            "skipped": 0,
+            "last_error": None,
+            "connection": None
+        }
+        change_stream["subscribers"][subscriber["name"]] = subscriber
+    threading.Thread(target=run_subscriber, args=(subscriber,), daemon=True).start()
+    return subscriber
+
+
+def view_change_stream() -> None:
+    """Displays change-stream offsets and each subscriber's progress."""
+    print("\n" + "="*80)
+    print("CHANGE STREAM".center(80))
+    print("="*80)
+    head = change_stream["base"] + len(change_events)
+    print(f"Events published: {head} (retained from offset {change_stream['base'] + 1})")
+    
+    if not change_stream["subscribers"]:
+        print("No subscribers.")
+        return
+    
+    print(f"\n{'Subscriber':<32} {'Committed':<10} {'Lag':<8} {'Batches':<8} {'Errors':<7} {'Skipped':<8}")
+    print("-"*80)
+    for name, subscriber in change_stream["subscribers"].items():
+        print(f"{name[:32]:<32} {subscriber['committed']:<10} {head - subscriber['committed']:<8} "
+              f"{subscriber['batches']:<8} {subscriber['errors']:<7} {subscriber['skipped']:<8}")
+        if subscriber["last_error"]:
+            print(f"  last error: {subscriber['last_error']}")
+    print("="*80)
+
+
+# ==================== TIERED SALES STORAGE ====================
+
+def new_sales_summary() -> Dict:
+    """
+    Creates an empty set of sales aggregates.
+    
+    Returns:
+        Summary with overall totals (net of returns) plus per-product
+        and per-author totals
+    """
+    return {"count": 0, "returns": 0, "units": 0, "gross": 0, "discount": 0, "net": 0,
+            "products": {}, "authors": {}}
+
+
+def add_sale_to_summary(summary: Dict, sale: Dict) -> None:
+    """
+    Adds one sale to a set of sales aggregates.
+    
+    Args:
+        summary: Aggregates to update
+        sale: Sale record
+    """
+    if 'returns_sale_id' in sale:
+        summary["returns"] += 1
+    else:
+        summary["count"] += 1
+    summary["units"] += sale['quantity']
+    summary["gross"] += sale['subtotal']
+    summary["discount"] += sale['discount_amount']
+    summary["net"] += sale['total']
+    
+    product = summary["products"].setdefault(
+        sale['product_id'], {'title': sale['product_title'], 'quantity': 0, 'revenue': 0})
+    product['quantity'] += sale['quantity']
+    product['revenue'] += sale['total']
+    
+    author = summary["authors"].setdefault(
+        sale['author'], {'units_sold': 0, 'gross_revenue': 0, 'net_revenue': 0, 'total_discount': 0})
+    author['units_sold'] += sale['quantity']
+    author['gross_revenue'] += sale['subtotal']
+    author['net_revenue'] += sale['total']
+    author['total_discount'] += sale['discount_amount']
+
+
+def merge_sales_summary(target: Dict, other: Dict) -> None:
+    """
+    Adds one set of sales aggregates into another.
+    
+    Args:
+        target: Aggregates to update
+        other: Aggregates to add
+    """
+    for field in ("count", "returns", "units", "gross", "discount", "net"):
+        target[field] += other[field]
+    for group in ("products", "authors"):
+        for key, values in other[group].items():
+            totals = target[group].get(key)
+            if totals is None:
+                target[group][key] = dict(values)
+                continue
+            for field, value in values.items():
+                if field != 'title':
+                    totals[field] += value
+
+
+def sales_archive_directory() -> str:
+    """Returns the directory holding sealed segments, creating it if needed."""
+    global SALES_ARCHIVE_DIR
+    if SALES_ARCHIVE_DIR is None:
+        SALES_ARCHIVE_DIR = tempfile.mkdtemp(prefix="sales-archive-")
+    os.makedirs(SALES_ARCHIVE_DIR, exist_ok=True)
+    return SALES_ARCHIVE_DIR
+
+
+def write_segment(sales: List[Dict]) -> Dict:
+    """
+    Seals sales into an immutable compressed segment file.
+    
+    The file starts with one plain JSON line holding the segment's
+    metadata and aggregates, followed by the zlib-compressed sales.
+    
+    Args:
+        sales: Consecutive sales, oldest first
+    
+    Returns:
+        Segment metadata (also kept in sales_segments)
+    """
+    summary = new_sales_summary()
+    for sale in sales:
+        add_sale_to_summary(summary, sale)
+    
+    segment = {
+        "first_sale_id": sales[0]['sale_id'],
+        "last_sale_id": sales[-1]['sale_id'],
+        "first_date": sales[0]['date'],
+        "last_date": sales[-1]['date'],
+        "summary": summary
+    }
+    payload = zlib.compress("\n".join(json.dumps(sale) for sale in sales).encode("utf-8"),
+                            SEGMENT_COMPRESSION_LEVEL)
+    
+    name = f"sales-{segment['first_sale_id']:010d}-{segment['last_sale_id']:010d}.seg"
+    path = os.path.join(sales_archive_directory(), name)
+    with open(path + ".tmp", "wb") as handle:
+        handle.write(json.dumps(segment).encode("utf-8") + b"\n")
+        handle.write(payload)
+    os.replace(path + ".tmp", path)
+    
+    segment["path"] = path
+    segment["size"] = os.path.getsize(path)
+    return segment
+
+
+def read_segment(segment: Dict) -> List[Dict]:
+    """
+    Decompresses the sales stored in a segment.
+    
+    Args:
+        segment: Segment metadata
+    
+    Returns:
+        Sales in the segment, oldest first
+    """
+    with open(segment["path"], "rb") as handle:
+        handle.readline()
+        payload = zlib.decompress(handle.read())
+    return [json.loads(line) for line in payload.decode("utf-8").split("\n")]
+
+
+def seal_cold_sales(now: Optional[float] = None) -> None:
+    """
+    Seals whole months of hot sales into one segment each.
+    
+    A month is sealed once it ended before the month that was current
+    HOT_SALES_DAYS ago, so every segment covers a complete period and
+    the check on each sale is a single string comparison.
+    
+    Args:
+        now: Current time (defaults to now)
+    """
+    global sales_records
+    if not sales_records:
+        return
+    if now is None:
+        now = current_time()
+    cutoff = datetime.fromtimestamp(now - HOT_SALES_DAYS * 86400).strftime("%Y-%m-01")
+    if sales_records[0]['date'] >= cutoff:
+        return
+    
+    cold_count = bisect_right(sales_records, cutoff, key=lambda sale: sale['date'])
+    start = 0
+    while start < cold_count:
+        month = sales_records[start]['date'][:7]
+        end = start
+        while end < cold_count and sales_records[end]['date'][:7] == month:
+            end += 1
+        sales_segments.append(write_segment(sales_records[start:end]))
+        start = end
+    sales_records = sales_records[cold_count:]
+    evict_sealed_cells(cutoff)
+
+
+def iter_sales(since: Optional[str] = None) -> Iterator[Dict]:
+    """
+    Iterates over every sale, archived and hot, oldest first.
+    
+    Args:
+        since: Only yield sales dated on or after this date string;
+            segments ending earlier are not decompressed
+    
+    Yields:
+        Sale records
+    """
+    segments, hot, count = visible_ledger()
+    for segment in segments:
+        if since is not None and segment["last_date"] < since:
+            continue
+        for sale in read_segment(segment):
+            if since is None or sale['date'] >= since:
+                yield sale
+    for sale in islice(hot, count):
+        if since is None or sale['date'] >= since:
+            yield sale
+
+
+def sales_summary(as_of: Optional[float] = None) -> Dict:
+    """
+    Aggregates all sales up to a point in time.
+    
+    Sealed segments contribute their precomputed aggregates; only a
+    segment that straddles as_of is decompressed.
+    
+    Args:
+        as_of: Only include sales up to this time (default: all sales)
+    
+    Returns:
+        Sales aggregates (see new_sales_summary)
+    """
+    cutoff = None if as_of is None else datetime.fromtimestamp(as_of).strftime(DATE_FORMAT)
+    summary = new_sales_summary()
+    segments, hot, _ = visible_ledger()
+    
+    for segment in segments:
+        if cutoff is None or segment["last_date"] <= cutoff:
+            merge_sales_summary(summary, segment["summary"])
+        elif segment["first_date"] <= cutoff:
+            for sale in read_segment(segment):
+                if sale['date'] <= cutoff:
+                    add_sale_to_summary(summary, sale)
+    
+    for sale in islice(hot, count_sales_as_of(as_of)):
+        add_sale_to_summary(summary, sale)
+    return summary
+
+
+def view_storage_tiers() -> None:
+    """Displays how many sales are hot in memory and how many are archived."""
+    print("\n" + "="*70)
+    print("SALES STORAGE TIERS".center(70))
+    print("="*70)
+    print(f"Hot sales in memory: {len(sales_records)}")
+    print(f"Archived segments: {len(sales_segments)} "
+          f"({sum(segment['summary']['count'] for segment in sales_segments)} sales, "
+          f"{sum(segment['size'] for segment in sales_segments) // 1024} KiB on disk)")
+    
+    if sales_segments:
+        print(f"\n{'First Date':<20} {'Last Date':<20} {'Sales':<10} {'Size (KiB)':<10}")
+        print("-"*70)
+        for segment in sales_segments:
+            print(f"{segment['first_date']:<20} {segment['last_date']:<20} "
+                  f"{segment['summary']['count']:<10} {segment['size'] // 1024:<10}")
+    print("="*70)
+
+
+# ==================== OLAP CUBE ====================
+
+def discount_band(discount: float) -> str:
+    """
+    Returns the discount band label for a discount percentage.
+    
+    Args:
+        discount: Discount percentage (0-100)
+    
+    Returns:
+        Band label from DISCOUNT_BANDS
+    """
+    for upper, label in DISCOUNT_BANDS:
+        if discount <= upper:
+            return label
+    return DISCOUNT_BANDS[-1][1]
+
+
+def add_to_cuboid(cuboid: Dict[Tuple, List[int]], key: Tuple, measures: List[int]) -> None:
+    """
+    Adds measures to one cell of a cuboid.
+    
+    Args:
+        cuboid: Cuboid to update
+        key: Cell key
+        measures: Values in OLAP_MEASURES order
+    """
+    cell = cuboid.get(key)
+    if cell is None:
+        cuboid[key] = list(measures)
+    else:
+        for i, value in enumerate(measures):
+            cell[i] += value
+
+
+def olap_cell(sale: Dict) -> Tuple[Tuple, List[int]]:
+    """
+    Returns a sale's base cuboid cell key and measures.
+    
+    Args:
+        sale: Sale record
+    
+    Returns:
+        Tuple of (values in OLAP_DIMENSIONS order, values in OLAP_MEASURES order)
+    """
+    key = (sale['product_id'], sale['author'], sale['category'], sale['customer'],
+           sale['date'][:10], discount_band(sale['discount_percent']))
+    measures = [sale['quantity'], sale['subtotal'], sale['discount_amount'], sale['total'],
+                0 if 'returns_sale_id' in sale else 1]
+    return key, measures
+
+
+def update_olap_cube(sale: Dict) -> None:
+    """
+    Adds a sale to the base cuboid and every materialized cuboid.
+    
+    Args:
+        sale: Sale record
+    """
+    key, measures = olap_cell(sale)
+    values = dict(zip(OLAP_DIMENSIONS, key))
+    for dimensions, cuboid in olap_cuboids.items():
+        add_to_cuboid(cuboid, tuple(values[dimension] for dimension in dimensions), measures)
+
+
+def evict_sealed_cells(cutoff: str) -> None:
+    """
+    Drops base cuboid cells for days that have been sealed into segments.
+    
+    The base cuboid has a cell per customer, product and day, so it grows
+    with the ledger; once sealed, those sales are read from their segments
+    when a new cuboid is first rolled up. Materialized cuboids keep them.
+    
+    Args:
+        cutoff: Sealing cutoff date ("YYYY-MM-DD"); earlier days are dropped
+    """
+    day = OLAP_DIMENSIONS.index("day")
+    base = olap_cuboids[OLAP_DIMENSIONS]
+    for key in [key for key in base if key[day] < cutoff]:
+        del base[key]
+
+
+def cuboid_for(dimensions: Tuple[str, ...]) -> Dict[Tuple, List[int]]:
+    """
+    Returns a copy of the cuboid for a set of base dimensions.
+    
+    A materialized cuboid is copied under the state lock. Otherwise it is
+    rolled up without the lock, from a read snapshot of the sealed segments
+    and a copy of the base cuboid taken at the same log position; the
+    first time, it is then caught up with the sales logged meanwhile and
+    kept maintained.
+    
+    Args:
+        dimensions: Base dimensions, in OLAP_DIMENSIONS order
+    
+    Returns:
+        Cuboid mapping cell keys to measures
+    """
+    with contextlib.ExitStack() as reads:
+        with state_lock:
+            if dimensions in olap_cuboids and (dimensions != OLAP_DIMENSIONS or not sales_segments):
+                return {key: list(measures) for key, measures in olap_cuboids[dimensions].items()}
+            snapshot = reads.enter_context(snapshot_reads())
+            base = olap_cuboids[OLAP_DIMENSIONS]
+            base_cells = [(key, list(measures)) for key, measures in base.items()]
+        
+        positions = [OLAP_DIMENSIONS.index(dimension) for dimension in dimensions]
+        cuboid: Dict[Tuple, List[int]] = {}
+        for segment in snapshot["segments"]:
+            for sale in read_segment(segment):
+                key, measures = olap_cell(sale)
+                add_to_cuboid(cuboid, tuple(key[i] for i in positions), measures)
+        for key, measures in base_cells:
+            add_to_cuboid(cuboid, tuple(key[i] for i in positions), measures)
+    
+    with state_lock:
+        if (dimensions not in olap_cuboids and len(olap_cuboids) < OLAP_MAX_CUBOIDS
+                and olap_cuboids.get(OLAP_DIMENSIONS) is base and snapshot["seq"] >= log_state["base"]):
+            kept = {key: list(measures) for key, measures in cuboid.items()}
+            for entry in mutation_log[snapshot["seq"] - log_state["base"]:]:
+                if entry["op"] in ("sale", "return"):
+                    key, measures = olap_cell(entry["sale"])
+                    add_to_cuboid(kept, tuple(key[i] for i in positions), measures)
+            olap_cuboids[dimensions] = kept
+    return cuboid
+
+
+def level_value(level: str, values: Dict) -> str:
+    """Returns the value of a base or derived level for a cuboid cell."""
+    if level in OLAP_DERIVED_LEVELS:
+        dimension, length = OLAP_DERIVED_LEVELS[level]
+        return values[dimension][:length]
+    return values[level]
+
+
+def query_cube(group_by: List[str], where: Optional[Dict[str, str]] = None) -> List[Tuple[Tuple, Dict[str, int]]]:
+    """
+    Answers a group-by / roll-up / slice query from the cube.
+    
+    Only the cuboid covering the requested levels is read, so the cost is
+    proportional to its number of cells rather than to the number of sales.
+    
+    Args:
+        group_by: Levels to group by (OLAP_DIMENSIONS or OLAP_DERIVED_LEVELS);
+            an empty list rolls everything up into one row
+        where: Level -> value filters (case- and accent-insensitive)
+    
+    Returns:
+        List of (group values, {measure: total}) pairs, highest net first
+    
+    Raises:
+        ValueError: If a level is unknown
+    """
+    where = where or {}
+    levels = list(group_by) + list(where)
+    for level in levels:
+        if level not in OLAP_DIMENSIONS and level not in OLAP_DERIVED_LEVELS:
+            raise ValueError(f"Unknown level: {level}")
+    
+    needed = {OLAP_DERIVED_LEVELS.get(level, (level,))[0] for level in levels}
+    dimensions = tuple(dimension for dimension in OLAP_DIMENSIONS if dimension in needed)
+    filters = {level: normalize_text(str(value)) for level, value in where.items()}
+    
+    groups: Dict[Tuple, List[int]] = {}
+    for key, measures in cuboid_for(dimensions).items():
+        values = dict(zip(dimensions, key))
+        if all(normalize_text(str(level_value(level, values))) == expected
+               for level, expected in filters.items()):
+            add_to_cuboid(groups, tuple(level_value(level, values) for level in group_by), measures)
+    
+    rows = [(group, dict(zip(OLAP_MEASURES, measures))) for group, measures in groups.items()]
+    rows.sort(key=lambda row: row[1]["net"], reverse=True)
+    return rows
+
+
+def generate_cube_report() -> None:
+    """Runs an ad-hoc breakdown of sales from the OLAP cube."""
+    levels = ", ".join(OLAP_DIMENSIONS + tuple(OLAP_DERIVED_LEVELS))
+    print(f"\nLevels: {levels}")
+    group_by = [level.strip() for level in prompt_input("Group by (comma-separated): ").split(",")
+                if level.strip()]
+    where = {}
+    for condition in prompt_input("Filter (level=value, comma-separated, Enter for none): ").split(","):
+        if "=" in condition:
+            level, value = condition.split("=", 1)
+            where[level.strip()] = value.strip()
+    
+    try:
+        rows = query_cube(group_by, where)
+    except ValueError as e:
+        print(f"Error: {str(e)}")
+        return
+    
+    print("\n" + "="*100)
+    print("SALES BREAKDOWN".center(100))
+    print("="*100)
+    if not rows:
+        print("No sales data available.")
+        return
+    
+    heading = " / ".join(group_by) or "All sales"
+    print(f"{heading[:40]:<40} {'Units':<8} {'Gross':<14} {'Discount':<12} {'Net':<14} {'Sales':<6}")
+    print("-"*100)
+    for group, totals in rows:
+        labels = [product_label(str(value)) if level == "product" else str(value)
+                  for level, value in zip(group_by, group)]
+        label = " / ".join(labels) or "All sales"
+        print(f"{label[:40]:<40} {totals['units']:<8} ${format_money(totals['gross']):<13} "
+              f"${format_money(totals['discount']):<11} ${format_money(totals['net']):<13} "
+              f"{totals['sales']:<6}")
+    print("="*100)
+
+
+# ==================== AD-HOC QUERIES ====================
+
+def tokenize_query(text: str) -> List[Tuple[str, str]]:
+    """
+    Splits a query expression into (kind, text) tokens.
+    
+    Args:
+        text: Query expression
+    
+    Returns:
+        Tokens of kind "number", "string", "op" or "word"
+    
+    Raises:
+        ValueError: If the expression contains an unexpected character
+    """
+    tokens = []
+    position = 0
+    text = text.rstrip()
+    while position < len(text):
+        match = QUERY_TOKEN_PATTERN.match(text, position)
+        if not match:
+            raise ValueError(f"Unexpected character at position {position}: {text[position]!r}")
+        kind = match.lastgroup
+        tokens.append((kind, match.group(kind)))
+        position = match.end()
+    return tokens
+
+
+def parse_query(tokens: List[Tuple[str, str]], fields: Dict[str, str]) -> Tuple:
+    """
+    Parses query tokens into an expression tree.
+    
+    Grammar: expr := term ("or" term)*, term := factor ("and" factor)*,
+    factor := "not" factor | "(" expr ")" | field op literal, where op is
+    one of == != < <= > >= contains.
+    
+    Args:
+        tokens: Output of tokenize_query
+        fields: Queryable fields and their types
+    
+    Returns:
+        Tree of ("or", [...]), ("and", [...]), ("not", node) and
+        ("cmp", field, op, value) nodes
+    
+    Raises:
+        ValueError: On a syntax error or an unknown field
+    """
+    position = 0
+    
+    def peek() -> Tuple[str, str]:
+        return tokens[position] if position < len(tokens) else ("end", "")
+    
+    def take() -> Tuple[str, str]:
+        nonlocal position
+        token = peek()
+        position += 1
+        return token
+    
+    def keyword(word: str) -> bool:
+        return peek()[0] == "word" and peek()[1].lower() == word
+    
+    def expression() -> Tuple:
+        terms = [term()]
+        while keyword("or"):
+            take()
+            terms.append(term())
+        return terms[0] if len(terms) == 1 else ("or", terms)
+    
+    def term() -> Tuple:
+        factors = [factor()]
+        while keyword("and"):
+            take()
+            factors.append(factor())
+        return factors[0] if len(factors) == 1 else ("and", factors)
+    
+    def factor() -> Tuple:
+        if keyword("not"):
+            take()
+            return ("not", factor())
+        if peek() == ("op", "("):
+            take()
+            node = expression()
+            if take() != ("op", ")"):
+                raise ValueError("Expected ')'")
+            return node
+        return comparison()
+    
+    def comparison() -> Tuple:
+        kind, field = take()
+        if kind != "word" or field not in fields:
+            raise ValueError(f"Unknown field: {field or 'end of query'}. "
+                             f"Fields: {', '.join(fields)}")
+        kind, op = take()
+        if kind == "word" and op.lower() == "contains":
+            op = "contains"
+        elif kind != "op" or op in "()":
+            raise ValueError(f"Expected a comparison after {field}")
+        kind, literal = take()
+        return ("cmp", field, op, query_literal(fields[field], op, kind, literal))
+    
+    tree = expression()
+    if position < len(tokens):
+        raise ValueError(f"Unexpected {peek()[1]!r}")
+    return tree
+
+
+def query_literal(field_type: str, op: str, kind: str, literal: str):
+    """
+    Converts a literal to the type of the field it is compared with.
+    Money literals are written in currency units and stored in cents.
+    
+    Raises:
+        ValueError: If the literal does not suit the field or operator
+    """
+    if kind == "string":
+        if field_type != "text":
+            raise ValueError(f"Expected a number, got {literal}")
+        value = literal[1:-1]
+        return normalize_text(value) if op == "contains" else value
+    if kind != "number" or field_type == "text" or op == "contains":
+        raise ValueError(f"Unexpected value: {literal or 'end of query'}")
+    if field_type == "money":
+        return parse_money(literal)
+    if field_type == "int":
+        value = Decimal(literal)
+        if value != value.to_integral_value():
+            raise ValueError(f"Expected a whole number, got {literal}")
+        return int(value)
+    return float(literal)
+
+
+def predicate_source(node: Tuple) -> str:
+    """
+    Generates Python source for an expression tree over a record "r".
+    
+    Only whitelisted field names and repr() of parsed literals reach the
+    source, so the generated code cannot do anything but compare.
+    
+    Args:
+        node: Expression tree from parse_query
+    
+    Returns:
+        Python expression
+    """
+    kind = node[0]
+    if kind in ("and", "or"):
+        return "(" + f" {kind} ".join(predicate_source(child) for child in node[1]) + ")"
+    if kind == "not":
+        return f"(not {predicate_source(node[1])})"
+    _, field, op, value = node
+    if field == "day":
+        accessor = "r['date'][:10]"
+    else:
+        accessor = f"r[{field!r}]"
+    if op == "contains":
+        return f"({value!r} in normalize_text({accessor}))"
+    return f"({accessor} {op} {value!r})"
+
+
+def top_level_conditions(node: Tuple) -> List[Tuple]:
+    """Returns the comparisons that every matching record must satisfy."""
+    if node[0] == "cmp":
+        return [node]
+    if node[0] == "and":
+        return [condition for child in node[1] for condition in top_level_conditions(child)]
+    return []
+
+
+@lru_cache(maxsize=QUERY_PLAN_CACHE_SIZE)
+def compile_query(target: str, text: str) -> Dict:
+    """
+    Parses and compiles a query into a reusable plan (cached per text).
+    
+    The plan holds the compiled predicate plus the access path: a
+    product ID lookup or trigram candidates for inventory, and a date
+    range for sales that prunes sealed segments and bisects hot sales.
+    
+    Args:
+        target: "inventory" or "sales"
+        text: Query expression, e.g. 'category == "Fiction" and price < 20'
+    
+    Returns:
+        Query plan
+    
+    Raises:
+        ValueError: If the target or the expression is invalid
+    """
+    if target not in QUERY_FIELDS:
+        raise ValueError(f"Unknown target: {target}")
+    tree = parse_query(tokenize_query(text), QUERY_FIELDS[target])
+    source = predicate_source(tree)
+    predicate = eval(f"lambda r: {source}", {"__builtins__": {}, "normalize_text": normalize_text})
+    plan = {"target": target, "source": source, "predicate": predicate,
+            "product_id": None, "contains": None, "date_range": None}
+    
+    conditions = top_level_conditions(tree)
+    for _, field, op, value in conditions:
+        if target == "inventory" and field == "id" and op == "==":
+            plan["product_id"] = value
+        elif target == "inventory" and op == "contains" and len(value) >= SEARCH_NGRAM_SIZE:
+            if plan["contains"] is None or len(value) > len(plan["contains"]):
+                plan["contains"] = value
+    
+    if target == "sales":
+        low, high = "", "~"
+        for _, field, op, value in conditions:
+            if field in ("date", "day") and op in ("==", ">", ">="):
+                low = max(low, value)
+            if field in ("date", "day") and op in ("==", "<", "<="):
+                high = min(high, value + "~")
+        if (low, high) != ("", "~"):
+            plan["date_range"] = (low, high)
+    
+    if plan["product_id"] is not None:
+        plan["access"] = f"product ID lookup ({plan['product_id']})"
+    elif plan["contains"] is not None:
+        plan["access"] = f"trigram index for {plan['contains']!r}"
+    elif plan["date_range"] is not None:
+        plan["access"] = f"date range {plan['date_range'][0] or '-'} .. {plan['date_range'][1].rstrip('~') or '-'}"
+    else:
+        plan["access"] = "full scan"
+    return plan
+
+
+def inventory_candidates(plan: Dict) -> Iterable[int]:
+    """Returns the product IDs a query has to check, using indexes where possible."""
+    products = visible_inventory()
+    if plan["product_id"] is not None:
+        return [plan["product_id"]] if plan["product_id"] in products else []
+    if plan["contains"] is not None:
+        # Every trigram inside the needle occurs inside a matching word
+        needle = plan["contains"]
+        terms = [needle[i:i + SEARCH_NGRAM_SIZE] for i in range(len(needle) - SEARCH_NGRAM_SIZE + 1)
+                 if " " not in needle[i:i + SEARCH_NGRAM_SIZE]]
+        if terms:
+            with state_lock:
+                if not search_index_ready:
+                    rebuild_search_index()  # First use after a catalogue snapshot load
+                postings = sorted((search_index.get(term, set()) for term in terms), key=len)
+                return set(postings[0]).intersection(*postings[1:])
+    return list(products)
+
+
+def run_query(target: str, text: str) -> Tuple[Dict, List]:
+    """
+    Runs an ad-hoc query against the inventory or the sales ledger.
+    
+    Args:
+        target: "inventory" or "sales"
+        text: Query expression
+    
+    Returns:
+        Tuple of (plan, results); inventory results are (product_id,
+        product) pairs, sales results are sale records
+    
+    Raises:
+        ValueError: If the query is invalid
+    """
+    plan = compile_query(target, text.strip())
+    predicate = plan["predicate"]
+    
+    if target == "inventory":
+        products = visible_inventory()
+        results = []
+        for product_id in sorted(inventory_candidates(plan)):
+            product = products.get(product_id)
+            if product is None:
+                continue  # Indexed after the read snapshot was taken
+            if predicate(dict(product, id=product_id)):
+                results.append((product_id, product))
+        return plan, results
+    
+    low, high = plan["date_range"] or ("", "~")
+    segments, hot, count = visible_ledger()
+    results = []
+    for segment in segments:
+        if segment["last_date"] < low or segment["first_date"] > high:
+            continue
+        results.extend(sale for sale in read_segment(segment) if predicate(sale))
+    start = bisect_left(hot, low, hi=count, key=lambda sale: sale['date'])
+    end = bisect_right(hot, high, hi=count, key=lambda sale: sale['date'])
+    results.extend(sale for sale in islice(hot, start, end) if predicate(sale))
+    return plan, results
+
+
+def query_menu() -> None:
+    """Prompts for and runs an ad-hoc query."""
+    target = prompt_input("\nQuery (1) inventory or (2) sales? ").strip()
+    target = {"1": "inventory", "2": "sales"}.get(target, target.lower())
+    if target not in QUERY_FIELDS:
+        print("Error: Unknown target.")
+        return
+    print(f"Fields: {', '.join(QUERY_FIELDS[target])}")
+    print('Example: category == "Fiction" and price < 20 and stock > 0')
+    
+    text = prompt_input("Query: ")
+    try:
+        with snapshot_reads():
+            plan, results = run_query(target, text)
+    except ValueError as e:
+        print(f"Error: {str(e)}")
+        return
+    
+    print(f"\nPlan: {plan['access']} -> {len(results)} match(es)")
+    if target == "inventory":
+        print(f"{'ID':<5} {'Title':<30} {'Author':<20} {'Category':<12} {'Price':<10} {'Stock':<6}")
+        print("-"*86)
+        for product_id, product in results:
+            print(f"{product_id:<5} {product['title']:<30} {product['author']:<20} "
+                  f"{product['category']:<12} ${format_money(product['price']):<9} {product['stock']:<6}")
+    else:
+        print(f"{'ID':<5} {'Customer':<15} {'Product':<25} {'Qty':<5} {'Total':<12} {'Date':<20}")
+        print("-"*86)
+        for sale in results:
+            print(f"{sale['sale_id']:<5} {sale['customer']:<15} {sale['product_title']:<25} "
+                  f"{sale['quantity']:<5} ${format_money(sale['total']):<11} {sale['date']:<20}")
+
+
+# ==================== DEMAND FORECASTING ====================
+
+def build_sales_matrix(product_ids: List[int], days: int,
+                       end: Optional[datetime] = None) -> "np.ndarray":
+    """
+    Builds a products x days matrix of units sold.
+    
+    Sales are mapped to (row, day) cells in one pass and summed with a
+    single bincount; no per-product work is done. Archived segments that
+    end before the window are skipped without being decompressed.
+    
+    Args:
+        product_ids: Products in row order
+        days: Number of days of history, ending with the end date
+        end: Last day included (defaults to today)
+    
+    Returns:
+        Array of shape (len(product_ids), days), oldest day first
+    """
+    last_day = (end or datetime.fromtimestamp(current_time())).date().toordinal()
+    first_date = datetime.fromordinal(last_day - days + 1).strftime("%Y-%m-%d")
+    columns = {datetime.fromordinal(last_day - days + 1 + column).strftime("%Y-%m-%d"): column
+               for column in range(days)}
+    rows = {product_id: row for row, product_id in enumerate(product_ids)}
+    
+    cells = []
+    units = []
+    for sale in iter_sales(since=first_date):
+        row = rows.get(sale['product_id'])
+        column = columns.get(sale['date'][:10])
+        if row is not None and column is not None:
+            cells.append(row * days + column)
+            units.append(sale['quantity'])
+    
+    counts = np.bincount(np.array(cells, dtype=np.int64),
+                         weights=np.array(units, dtype=np.float64),
+                         minlength=len(product_ids) * days)
+    return counts.reshape(len(product_ids), days)
+
+
+def forecast_demand(matrix: "np.ndarray", stock: "np.ndarray") -> Dict[str, "np.ndarray"]:
+    """
+    Forecasts daily demand and reorder quantities for every product at once.
+    
+    Exponential smoothing runs over the day axis with each step vectorized
+    across all products, so the Python loop is per day, not per product.
+    
+    Args:
+        matrix: Products x days units sold (see build_sales_matrix)
+        stock: Available stock per product, in the same row order
+    
+    Returns:
+        Dict of per-product arrays: smoothed, moving_average, std,
+        reorder_point and reorder_qty
+    """
+    level = matrix[:, 0].copy()
+    for day in range(1, matrix.shape[1]):
+        level = FORECAST_ALPHA * matrix[:, day] + (1 - FORECAST_ALPHA) * level
+    
+    window = matrix[:, -FORECAST_MA_WINDOW:]
+    moving_average = window.mean(axis=1)
+    std = window.std(axis=1)
+    
+    daily_demand = np.maximum(level, moving_average)
+    safety_stock = FORECAST_SERVICE_Z * std * np.sqrt(FORECAST_LEAD_TIME_DAYS)
+    reorder_point = daily_demand * FORECAST_LEAD_TIME_DAYS + safety_stock
+    target = daily_demand * (FORECAST_LEAD_TIME_DAYS + FORECAST_REVIEW_DAYS) + safety_stock
+    reorder_qty = np.where(stock <= reorder_point, np.ceil(target - stock), 0)
+    
+    return {
+        "smoothed": level,
+        "moving_average": moving_average,
+        "std": std,
+        "reorder_point": reorder_point,
+        "reorder_qty": np.maximum(reorder_qty, 0).astype(np.int64)
+    }
+
+
+def generate_forecast_report() -> None:
+    """Displays forecast daily demand and suggested reorders."""
+    print("\n" + "="*80)
+    print("DEMAND FORECAST & REORDERS".center(80))
+    print("="*80)
+    
+    if np is None:
+        print("Error: NumPy is required for demand forecasting.")
+        return
+    products = visible_inventory()
+    if not products:
+        print("No products in inventory.")
+        return
+    
+    held_stock = visible_reserved_stock()
+    product_ids = list(products)
+    matrix = build_sales_matrix(product_ids, FORECAST_HISTORY_DAYS)
+    stock = np.fromiter((products[product_id]['stock'] - held_stock.get(product_id, 0)
+                         for product_id in product_ids),
+                        dtype=np.float64, count=len(product_ids))
+    forecast = forecast_demand(matrix, stock)
+    
+    reorders = np.flatnonzero(forecast["reorder_qty"])
+    if not len(reorders):
+        print("No products need reordering.")
+        return
+    
+    ranked = reorders[np.argsort(-forecast["reorder_qty"][reorders], kind="stable")]
+    print(f"{'ID':<5} {'Title':<30} {'Daily (SES)':<12} {'Daily (MA)':<11} "
+          f"{'Stock':<7} {'Reorder':<8}")
+    print("-"*80)
+    for row in ranked[:FORECAST_REPORT_LIMIT]:
+        product_id = product_ids[row]
+        print(f"{product_id:<5} {products[product_id]['title']:<30} "
+              f"{forecast['smoothed'][row]:<12.2f} {forecast['moving_average'][row]:<11.2f} "
+              f"{int(stock[row]):<7} {forecast['reorder_qty'][row]:<8}")
+    print("="*80)
+
+
+# ==================== PRICING SIMULATION ====================
+
+def pricing_history_from_arrays(product_index: "np.ndarray", unit_price: "np.ndarray",
+                                quantity: "np.ndarray", discount_percent: "np.ndarray",
+                                products: Optional[int] = None) -> Dict:
+    """
+    Sums the ledger into a products x discount-levels matrix of gross
+    revenue at the prices actually charged, plus net units per product.
+    
+    A scenario scales each product's prices by one factor and maps each
+    historical discount level to a new one, so its revenue follows from
+    this matrix alone: scenarios cost O(products x levels), not O(sales).
+    
+    Args:
+        product_index: Product column of each sale line
+        unit_price: Unit price in cents
+        quantity: Units (negative for returns)
+        discount_percent: Discount percentage
+        products: Number of product columns (default: highest index + 1)
+    
+    Returns:
+        Dict with gross (products x levels), units (products) and the
+        discount percentage of each level
+    """
+    basis_points, level = np.unique(np.round(discount_percent * BASIS_POINTS_PER_PERCENT).astype(np.int64),
+                                    return_inverse=True)
+    if products is None:
+        products = int(product_index.max()) + 1 if len(product_index) else 0
+    cells = product_index.astype(np.int64) * len(basis_points) + level.ravel()
+    gross = np.bincount(cells, weights=unit_price.astype(np.float64) * quantity,
+                        minlength=products * len(basis_points))
+    return {
+        "gross": gross.reshape(products, len(basis_points)),
+        "units": np.bincount(product_index.astype(np.int64), weights=quantity.astype(np.float64),
+                             minlength=products),
+        "discounts": basis_points / BASIS_POINTS_PER_PERCENT
+    }
+
+
+def build_pricing_history() -> Dict:
+    """
+    Extracts the sales ledger into a pricing history.
+    
+    Returns:
+        pricing_history_from_arrays() result plus product_ids (column
+        order), per-product author/category, sale count and actual revenue
+    """
+    columns = {}
+    metadata = {}
+    lines = []
+    revenue = 0
+    for sale in iter_sales():
+        product_id = sale['product_id']
+        column = columns.get(product_id)
+        if column is None:
+            column = columns[product_id] = len(columns)
+            metadata[product_id] = (sale['author'], sale['category'])
+        lines.append((column, sale['unit_price'], sale['quantity'], sale['discount_percent']))
+        revenue += sale['total']
+    
+    table = np.array(lines, dtype=np.float64).reshape(-1, 4)
+    history = pricing_history_from_arrays(table[:, 0], table[:, 1], table[:, 2], table[:, 3],
+                                          len(columns))
+    history.update(product_ids=list(columns), metadata=metadata, sales=len(lines), revenue=revenue)
+    return history
+
+
+def simulate_pricing(history: Dict, multipliers: "np.ndarray", flat_discount: "np.ndarray",
+                     discount_cap: "np.ndarray", elasticity: float = 0.0) -> Dict[str, "np.ndarray"]:
+    """
+    Re-prices the sales history under many scenarios at once.
+    
+    Scenario s charges multipliers[s, product] times the historical
+    price, with every discount replaced by flat_discount[s] (unless NaN)
+    or capped at discount_cap[s]. With a non-zero elasticity, units
+    scale by (price ratio) ** elasticity; otherwise volumes are as sold.
+    Scenarios are evaluated in chunks with one matrix product each.
+    
+    Args:
+        history: Pricing history (see pricing_history_from_arrays)
+        multipliers: Price multipliers, shape (scenarios, products)
+        flat_discount: Replacement discount % per scenario (NaN: keep)
+        discount_cap: Highest discount % kept per scenario
+        elasticity: Price elasticity of demand (e.g. -1.5)
+    
+    Returns:
+        Dict with revenue, discount and units per scenario (revenue and
+        discount in cents)
+    """
+    gross, units = history["gross"], history["units"]
+    scenarios, products = multipliers.shape
+    revenue = np.empty(scenarios)
+    discounts = np.empty(scenarios)
+    units_sold = np.empty(scenarios)
+    step = max(1, PRICING_CHUNK_CELLS // max(1, products))
+    
+    for start in range(0, scenarios, step):
+        chunk = slice(start, start + step)
+        discount = np.minimum(history["discounts"], discount_cap[chunk, None])
+        discount = np.where(np.isnan(flat_discount[chunk, None]), discount, flat_discount[chunk, None])
+        volume = multipliers[chunk] ** elasticity if elasticity else 1.0
+        scale = multipliers[chunk] * volume
+        net = np.einsum("sp,ps->s", scale, gross @ (1 - discount / 100).T)
+        revenue[chunk] = net
+        discounts[chunk] = scale @ gross.sum(axis=1) - net
+        units_sold[chunk] = volume @ units if elasticity else units.sum()
+    return {"revenue": revenue, "discount": discounts, "units": units_sold}
+
 
-def add_product() -> None:
-    """Registers a new product in the inventory."""
-    global next_product_id
+def pricing_scenarios(history: Dict, low: float, high: float, step: float,
+                      scope: Optional[str] = None) -> Tuple[List[str], Dict[str, "np.ndarray"]]:
+    """
+    Builds the scenario grid: every price change from low to high percent
+    combined with every PRICING_POLICIES discount policy.
     
-    print("\n=== ADD NEW PRODUCT ===")
-    try:
-        title = validate_non_empty_string("Enter product title: ")
-        author = validate_non_empty_string("Enter author name: ")
-        category = validate_non_empty_string("Enter category: ")
-        price = validate_positive_number("Enter price: $", float)
-        stock = int(validate_positive_number("Enter initial stock: ", int))
-        
-        inventory[next_product_id] = {
-            "title": title,
-            "author": author,
-            "category": category,
-            "price": price,
-            "stock": stock
-        }
-        
-        print(f"\n✓ Product added successfully with ID: {next_product_id}")
-        next_product_id += 1
-        
-    except Exception as e:
-        print(f"Error adding product: {str(e)}")
+    Args:
+        history: Pricing history (for the product columns)
+        low: Lowest price change in percent
+        high: Highest price change in percent
+        step: Price change step in percent
+        scope: Only re-price products by this author or in this category
+    
+    Returns:
+        Tuple of (scenario labels, arrays for simulate_pricing)
+    """
+    affected = np.ones(len(history["product_ids"]), dtype=bool)
+    if scope:
+        affected = np.array([scope in history["metadata"][product_id]
+                             for product_id in history["product_ids"]], dtype=bool)
+    changes = np.arange(low, high + step / 2, step)
+    
+    labels = [f"{change:+g}% / {policy[0]}" for change in changes for policy in PRICING_POLICIES]
+    factors = np.repeat(1 + changes / 100, len(PRICING_POLICIES))
+    multipliers = np.where(affected, factors[:, None], 1.0)
+    flat = np.tile([np.nan if policy[1] is None else policy[1] for policy in PRICING_POLICIES], len(changes))
+    cap = np.tile([policy[2] for policy in PRICING_POLICIES], len(changes))
+    return labels, {"multipliers": multipliers, "flat_discount": flat, "discount_cap": cap}
 
 
-def view_inventory() -> None:
-    """Displays all products in the inventory."""
+def generate_pricing_simulation_report() -> None:
+    """Prompts for a price-change grid and shows how revenue would have moved."""
     print("\n" + "="*80)
-    print("INVENTORY".center(80))
+    print("WHAT-IF PRICING SIMULATION".center(80))
     print("="*80)
     
-    if not inventory:
-        print("No products in inventory.")
+    if np is None:
+        print("Error: NumPy is required for pricing simulation.")
         return
     
-    print(f"{'ID':<5} {'Title':<30} {'Author':<20} {'Price':<10} {'Stock':<8}")
-    print("-"*80)
+    try:
+        low = float(prompt_input("Lowest price change % [-20]: ").strip() or -20)
+        high = float(prompt_input("Highest price change % [20]: ").strip() or 20)
+        step = float(prompt_input("Step % [5]: ").strip() or 5)
+        elasticity = float(prompt_input("Price elasticity of demand (0 = volumes as sold) [0]: ").strip() or 0)
+    except ValueError:
+        print("Error: Invalid number.")
+        return
+    if step <= 0 or high < low or low <= -100:
+        print("Error: Step must be positive and the range non-empty, above -100%.")
+        return
+    scope = prompt_input("Only re-price an author or category (Enter for all): ").strip() or None
     
-    for product_id, product in inventory.items():
-        print(f"{product_id:<5} {product['title']:<30} {product['author']:<20} "
-              f"${product['price']:<9.2f} {product['stock']:<8}")
+    started = time.perf_counter()
+    with snapshot_reads():
+        history = build_pricing_history()
+    if not history["sales"]:
+        print("No sales data available.")
+        return
+    extracted = time.perf_counter()
+    labels, scenarios = pricing_scenarios(history, low, high, step, scope)
+    result = simulate_pricing(history, elasticity=elasticity, **scenarios)
+    simulated = time.perf_counter()
+    
+    print(f"\n{history['sales']} sales of {len(history['units'])} products; "
+          f"{len(labels)} scenarios in {(simulated - extracted) * 1000:.1f} ms "
+          f"(ledger read in {(extracted - started) * 1000:.1f} ms)")
+    print(f"Actual net revenue: ${format_money(history['revenue'])}")
+    
+    print(f"\n{'Scenario':<32} {'Net Revenue':<16} {'Change':<10} {'Discounts':<14} {'Units':<8}")
+    print("-"*80)
+    for row in np.argsort(-result["revenue"], kind="stable")[:PRICING_REPORT_LIMIT]:
+        revenue = int(round(result["revenue"][row]))
+        change = (revenue - history["revenue"]) / history["revenue"] * 100 if history["revenue"] else 0.0
+        print(f"{labels[row]:<32} ${format_money(revenue):<15} {change:<+10.2f} "
+              f"${format_money(int(round(result['discount'][row]))):<13} {result['units'][row]:<8.0f}")
     print("="*80)
 
 
-def update_product() -> None:
-    """Updates an existing product in the inventory."""
-    view_inventory()
+def benchmark_pricing_simulation(sales: int = 2_000_000, products: int = 50_000,
+                                 scenarios: int = 500) -> None:
+    """
+    Times the simulation on a synthetic ledger.
     
-    try:
-        product_id = int(input("\nEnter product ID to update: "))
-        
-        if product_id not in inventory:
-            print("Error: Product not found.")
-            return
-        
-        product = inventory[product_id]
-        print(f"\nUpdating: {product['title']}")
-        print("(Press Enter to keep current value)")
-        
-        title = input(f"New title [{product['title']}]: ").strip()
-        if title:
-            product['title'] = title
-        
-        author = input(f"New author [{product['author']}]: ").strip()
-        if author:
-            product['author'] = author
-        
-        category = input(f"New category [{product['category']}]: ").strip()
-        if category:
-            product['category'] = category
-        
-        price_input = input(f"New price [${product['price']}]: ").strip()
-        if price_input:
-            product['price'] = float(price_input)
-        
-        stock_input = input(f"New stock [{product['stock']}]: ").strip()
-        if stock_input:
-            product['stock'] = int(stock_input)
-        
-        print("\n✓ Product updated successfully!")
-        
-    except ValueError:
-        print("Error: Invalid input format.")
-    except Exception as e:
-        print(f"Error updating product: {str(e)}")
+    Args:
+        sales: Number of synthetic sale lines
+        products: Number of distinct products
+        scenarios: Number of random price vectors to evaluate
+    """
+    rng = np.random.default_rng(0)
+    product_index = rng.integers(0, products, sales)
+    base_price = rng.integers(500, 5000, products)
+    unit_price = base_price[product_index]
+    quantity = rng.integers(1, 4, sales)
+    discount = rng.choice([0.0, 5.0, 10.0, 15.0, 25.0], sales)
+    
+    started = time.perf_counter()
+    history = pricing_history_from_arrays(product_index, unit_price, quantity, discount, products)
+    grouped = time.perf_counter()
+    result = simulate_pricing(history, rng.uniform(0.8, 1.2, (scenarios, products)),
+                              np.full(scenarios, np.nan), rng.uniform(0, 30, scenarios))
+    simulated = time.perf_counter()
+    
+    exact = (unit_price * quantity * (1 - discount / 100)).sum()
+    as_sold = simulate_pricing(history, np.ones((1, products)), np.array([np.nan]), np.array([100.0]))
+    print(f"{sales} sales of {products} products summarized in {(grouped - started) * 1000:.0f} ms")
+    print(f"{scenarios} scenarios in {(simulated - grouped) * 1000:.0f} ms "
+          f"(best revenue {result['revenue'].max() / CENTS_PER_UNIT:,.0f})")
+    print(f"As-sold check: {as_sold['revenue'][0]:.0f} vs per-sale {exact:.0f}")
 
 
-def delete_product() -> None:
-    """Removes a product from the inventory."""
-    view_inventory()
+# ==================== INVENTORY VALUATION ====================
+
+def add_to_valuation(valuation: Dict, product_id: int, sign: int) -> None:
+    """
+    Adds (sign 1) or removes (sign -1) a product's stock value.
     
-    try:
-        product_id = int(input("\nEnter product ID to delete: "))
-        
-        if product_id not in inventory:
-            print("Error: Product not found.")
-            return
-        
-        product = inventory[product_id]
-        confirm = input(f"Are you sure you want to delete '{product['title']}'? (yes/no): ")
-        
-        if confirm.lower() == 'yes':
-            del inventory[product_id]
-            print("\n✓ Product deleted successfully!")
-        else:
-            print("Deletion cancelled.")
-            
-    except ValueError:
-        print("Error: Invalid product ID.")
-    except Exception as e:
-        print(f"Error deleting product: {str(e)}")
+    apply_mutation removes a product before changing it and adds it back
+    afterwards, so every total moves by exactly the product's delta.
+    
+    Args:
+        valuation: Valuation to update
+        product_id: Product identifier (ignored if not in the inventory)
+        sign: 1 to add, -1 to remove
+    """
+    product = inventory.get(product_id)
+    if product is None:
+        return
+    value = product['price'] * product['stock']
+    valuation["value"] += sign * value
+    valuation["units"] += sign * product['stock']
+    valuation["products"] += sign
+    for group in ("category", "author"):
+        cell = valuation[group].setdefault(product[group], [0, 0, 0])
+        cell[0] += sign * value
+        cell[1] += sign * product['stock']
+        cell[2] += sign
+        if not cell[2]:
+            del valuation[group][product[group]]
 
 
-# ==================== SALES MANAGEMENT ====================
+def compute_inventory_valuation() -> Dict:
+    """
+    Values the whole inventory from scratch.
+    
+    Returns:
+        Valuation in the inventory_valuation layout
+    """
+    valuation = {"ready": True, "value": 0, "units": 0, "products": 0, "category": {}, "author": {}}
+    for product_id in inventory:
+        add_to_valuation(valuation, product_id, 1)
+    return valuation
 
-def register_sale() -> None:
-    """Registers a new sale transaction."""
-    print("\n=== REGISTER NEW SALE ===")
-    view_inventory()
+
+def current_valuation() -> Dict:
+    """Returns the maintained valuation, building it first if necessary."""
+    if not inventory_valuation["ready"]:
+        inventory_valuation.update(compute_inventory_valuation())
+    return inventory_valuation
+
+
+def generate_valuation_report() -> None:
+    """Displays the value of stock on hand by category and by author."""
+    valuation = current_valuation()
+    print("\n" + "="*70)
+    print("INVENTORY VALUATION".center(70))
+    print("="*70)
+    print(f"Stock on hand: {valuation['units']} units across {valuation['products']} products")
+    print(f"Total value at list price: ${format_money(valuation['value'])}")
     
-    try:
-        customer_name = validate_non_empty_string("\nEnter customer name: ")
-        product_id = int(input("Enter product ID: "))
-        
-        if product_id not in inventory:
-            print("Error: Product not found.")
-            return
-        
-        product = inventory[product_id]
-        quantity = int(validate_positive_number("Enter quantity: ", int))
-        
-        if not validate_stock(quantity, product_id):
-            print(f"Error: Insufficient stock. Available: {product['stock']}")
-            return
-        
-        discount = float(input("Enter discount percentage (0 if none): "))
-        if discount < 0 or discount > 100:
-            print("Error: Discount must be between 0 and 100.")
-            return
-        
-        # Calculate totals
-        subtotal = product['price'] * quantity
-        discount_amount = subtotal * (discount / 100)
-        total = subtotal - discount_amount
-        
-        # Create sale record
-        sale = {
-            "sale_id": len(sales_records) + 1,
-            "customer": customer_name,
-            "product_id": product_id,
-            "product_title": product['title'],
-            "author": product['author'],
-            "quantity": quantity,
-            "unit_price": product['price'],
-            "subtotal": subtotal,
-            "discount_percent": discount,
-            "discount_amount": discount_amount,
-            "total": total,
-            "date": datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-        }
-        
-        # Update inventory stock
-        inventory[product_id]['stock'] -= quantity
-        
-        # Add to sales records
-        sales_records.append(sale)
-        
-        print("\n" + "="*50)
-        print("SALE RECEIPT".center(50))
-        print("="*50)
-        print(f"Customer: {customer_name}")
-        print(f"Product: {product['title']}")
-        print(f"Quantity: {quantity}")
-        print(f"Unit Price: ${product['price']:.2f}")
-        print(f"Subtotal: ${subtotal:.2f}")
-        if discount > 0:
-            print(f"Discount ({discount}%): -${discount_amount:.2f}")
-        print(f"Total: ${total:.2f}")
-        print(f"Date: {sale['date']}")
-        print("="*50)
-        print("✓ Sale registered successfully!")
-        
-    except ValueError:
-        print("Error: Invalid input format.")
-    except Exception as e:
-        print(f"Error registering sale: {str(e)}")
+    for group in ("category", "author"):
+        print(f"\n{group.title():<30} {'Products':<10} {'Units':<10} {'Value':<15}")
+        print("-"*70)
+        for name, (value, units, products) in sorted(valuation[group].items(),
+                                                     key=lambda x: x[1][0], reverse=True):
+            print(f"{name[:30]:<30} {products:<10} {units:<10} ${format_money(value):<14}")
+    print("="*70)
 
 
-def view_sales() -> None:
-    """Displays all sales records."""
-    print("\n" + "="*100)
-    print("SALES HISTORY".center(100))
-    print("="*100)
+def verify_inventory_valuation() -> bool:
+    """
+    Recomputes the valuation from scratch and compares it with the
+    incrementally maintained one.
     
-    if not sales_records:
-        print("No sales recorded yet.")
-        return
+    Returns:
+        True if they match
+    """
+    valuation = current_valuation()
+    started = time.perf_counter()
+    expected = compute_inventory_valuation()
+    elapsed = time.perf_counter() - started
     
-    print(f"{'ID':<5} {'Customer':<15} {'Product':<25} {'Qty':<5} {'Total':<12} {'Date':<20}")
-    print("-"*100)
+    mismatches = []
+    for field in ("value", "units", "products"):
+        if valuation[field] != expected[field]:
+            mismatches.append(f"{field}: maintained {valuation[field]}, recomputed {expected[field]}")
+    for group in ("category", "author"):
+        for name in sorted(set(valuation[group]) | set(expected[group])):
+            maintained = valuation[group].get(name)
+            recomputed = expected[group].get(name)
+            if maintained != recomputed:
+                mismatches.append(f"{group} {name}: maintained {maintained}, recomputed {recomputed}")
     
-    for sale in sales_records:
-        print(f"{sale['sale_id']:<5} {sale['customer']:<15} {sale['product_title']:<25} "
-              f"{sale['quantity']:<5} ${sale['total']:<11.2f} {sale['date']:<20}")
-    print("="*100)
+    print("\n" + "="*70)
+    print("VALUATION CHECK".center(70))
+    print("="*70)
+    print(f"Recomputed from {expected['products']} products in {elapsed * 1000:.2f} ms")
+    if mismatches:
+        print(f"{len(mismatches)} mismatches:")
+        for mismatch in mismatches:
+            print(f"  {mismatch}")
+    else:
+        print("Maintained valuation matches a full recomputation.")
+    print("="*70)
+    return not mismatches
 
 
 # ==================== REPORTS MODULE ====================
 
-def generate_top_products_report() -> None:
-    """Generates a report of the top 3 best-selling products."""
+def generate_top_products_report(as_of: Optional[float] = None) -> None:
+    """
+    Generates a report of the top 3 best-selling products.
+    
+    Args:
+        as_of: Only include sales up to this time (default: all sales)
+    """
     print("\n" + "="*60)
     print("TOP 3 BEST-SELLING PRODUCTS".center(60))
     print("="*60)
     
-    if not sales_records:
+    summary = sales_summary(as_of)
+    if not summary["count"]:
         print("No sales data available.")
         return
     
-    # Aggregate sales by product using lambda
-    product_sales = {}
-    for sale in sales_records:
-        product_id = sale['product_id']
-        if product_id not in product_sales:
-            product_sales[product_id] = {
-                'title': sale['product_title'],
-                'quantity': 0,
-                'revenue': 0.0
-            }
-        product_sales[product_id]['quantity'] += sale['quantity']
-        product_sales[product_id]['revenue'] += sale['total']
-    
-    # Sort by quantity sold and get top 3
-    sorted_products = sorted(product_sales.items(), 
+    # Sort by quantity sold and get top 3 using lambda
+    sorted_products = sorted(summary["products"].items(), 
                            key=lambda x: x[1]['quantity'], 
                            reverse=True)[:3]
     
@@ -361,78 +5046,85 @@ def generate_top_products_report() -> None:
     print("-"*60)
     
     for rank, (product_id, data) in enumerate(sorted_products, 1):
-        print(f"{rank:<6} {data['title']:<30} {data['quantity']:<12} ${data['revenue']:<11.2f}")
+        print(f"{rank:<6} {data['title']:<30} {data['quantity']:<12} ${format_money(data['revenue']):<11}")
     
     print("="*60)
 
 
-def generate_sales_by_author_report() -> None:
-    """Generates a report of total sales grouped by author."""
+def generate_sales_by_author_report(as_of: Optional[float] = None) -> None:
+    """
+    Generates a report of total sales grouped by author.
+    
+    Args:
+        as_of: Only include sales up to this time (default: all sales)
+    """
     print("\n" + "="*70)
     print("SALES REPORT BY AUTHOR".center(70))
     print("="*70)
     
-    if not sales_records:
+    summary = sales_summary(as_of)
+    if not summary["count"]:
         print("No sales data available.")
         return
     
-    # Aggregate sales by author
-    author_sales = {}
-    for sale in sales_records:
-        author = sale['author']
-        if author not in author_sales:
-            author_sales[author] = {
-                'units_sold': 0,
-                'gross_revenue': 0.0,
-                'net_revenue': 0.0,
-                'total_discount': 0.0
-            }
-        author_sales[author]['units_sold'] += sale['quantity']
-        author_sales[author]['gross_revenue'] += sale['subtotal']
-        author_sales[author]['net_revenue'] += sale['total']
-        author_sales[author]['total_discount'] += sale['discount_amount']
-    
     print(f"{'Author':<25} {'Units':<8} {'Gross Revenue':<15} {'Net Revenue':<15} {'Discount':<12}")
     print("-"*70)
     
     # Sort by net revenue
-    sorted_authors = sorted(author_sales.items(), 
+    sorted_authors = sorted(summary["authors"].items(), 
                           key=lambda x: x[1]['net_revenue'], 
                           reverse=True)
     
     for author, data in sorted_authors:
-        print(f"{author:<25} {data['units_sold']:<8} ${data['gross_revenue']:<14.2f} "
-              f"${data['net_revenue']:<14.2f} ${data['total_discount']:<11.2f}")
+        print(f"{author:<25} {data['units_sold']:<8} ${format_money(data['gross_revenue']):<14} "
+              f"${format_money(data['net_revenue']):<14} ${format_money(data['total_discount']):<11}")
     
     print("="*70)
 
 
-def generate_financial_summary() -> None:
-    """Calculates and displays gross and net income totals."""
+def generate_financial_summary(as_of: Optional[float] = None) -> None:
+    """
+    Calculates and displays gross and net income totals.
+    
+    Args:
+        as_of: Only include sales up to this time (default: all sales)
+    """
     print("\n" + "="*50)
     print("FINANCIAL SUMMARY".center(50))
     print("="*50)
     
-    if not sales_records:
+    summary = sales_summary(as_of)
+    if not summary["count"]:
         print("No sales data available.")
         return
     
-    # Calculate totals using lambda functions
-    total_gross = sum(map(lambda sale: sale['subtotal'], sales_records))
-    total_discounts = sum(map(lambda sale: sale['discount_amount'], sales_records))
-    total_net = sum(map(lambda sale: sale['total'], sales_records))
-    total_units = sum(map(lambda sale: sale['quantity'], sales_records))
+    # Totals in exact integer cents
+    total_gross = summary["gross"]
+    total_discounts = summary["discount"]
+    total_net = summary["net"]
+    total_units = summary["units"]
     
     print(f"Total Units Sold: {total_units}")
-    print(f"Gross Revenue (before discounts): ${total_gross:.2f}")
-    print(f"Total Discounts Applied: ${total_discounts:.2f}")
-    print(f"Net Revenue (after discounts): ${total_net:.2f}")
-    print(f"Average Discount per Sale: ${(total_discounts/len(sales_records)):.2f}")
+    print(f"Gross Revenue (before discounts): ${format_money(total_gross)}")
+    print(f"Total Discounts Applied: ${format_money(total_discounts)}")
+    print(f"Net Revenue (after discounts): ${format_money(total_net)}")
+    print(f"Average Discount per Sale: ${format_money(round(total_discounts / summary['count']))}")
+    if summary["returns"]:
+        print(f"Returns Processed: {summary['returns']}")
     print("="*50)
 
 
 def reports_menu() -> None:
-    """Displays the reports submenu."""
+    """
+    Displays the reports submenu.
+    
+    Reports never see a half-applied mutation: those over the inventory
+    and the sales ledger run against a read snapshot, so sales (or, on a
+    replica, the log applier) carry on meanwhile; the others run under
+    the state lock. Reports that ask for input take their snapshot only
+    once it has been entered, and those that read both aggregates and the
+    ledger copy the aggregates under a brief lock and scan a snapshot.
+    """
     while True:
         print("\n" + "="*40)
         print("REPORTS MENU".center(40))
@@ -440,26 +5132,279 @@ def reports_menu() -> None:
         print("1. Top 3 Best-Selling Products")
         print("2. Sales by Author")
         print("3. Financial Summary")
-        print("4. Back to Main Menu")
+        print("4. Reports As Of a Date")
+        print("5. Product Price History")
+        print("6. Live Dashboard (Approximate)")
+        print("7. Validate Live Dashboard")
+        print("8. Rolling Revenue (5 min / 1 h / 24 h)")
+        print("9. Replication Status")
+        print("10. Demand Forecast & Reorders")
+        print("11. Sales Storage Tiers")
+        print("12. Custom Breakdown (Cube)")
+        print("13. Ad-hoc Query")
+        print("14. Change Stream Status")
+        print("15. Inventory Valuation")
+        print("16. Verify Inventory Valuation")
+        print("17. What-If Pricing Simulation")
+        print("18. Back to Main Menu")
         print("="*40)
         
         try:
-            choice = input("Select an option: ")
+            choice = prompt_input("Select an option: ")
             
-            if choice == '1':
-                generate_top_products_report()
-            elif choice == '2':
-                generate_sales_by_author_report()
-            elif choice == '3':
-                generate_financial_summary()
-            elif choice == '4':
+            if choice == '18':
                 break
+            
+            # Ledger and inventory reports read a snapshot; the rest
+            # briefly lock the incrementally maintained structures
+            if choice in SNAPSHOT_REPORTS:
+                guard = snapshot_reads()
+            elif choice in SELF_GUARDED_REPORTS:
+                guard = contextlib.nullcontext()
             else:
-                print("Invalid option. Please try again.")
+                guard = state_lock
+            with guard, timed_operation(f"reports:{choice}"):
+                if choice == '1':
+                    generate_top_products_report()
+                elif choice == '2':
+                    generate_sales_by_author_report()
+                elif choice == '3':
+                    generate_financial_summary()
+                elif choice == '4':
+                    reports_as_of()
+                elif choice == '5':
+                    view_price_history()
+                elif choice == '6':
+                    generate_live_dashboard()
+                elif choice == '7':
+                    validate_stream_sketches()
+                elif choice == '8':
+                    generate_rolling_metrics_report()
+                elif choice == '9':
+                    view_replication_status()
+                elif choice == '10':
+                    generate_forecast_report()
+                elif choice == '11':
+                    view_storage_tiers()
+                elif choice == '12':
+                    generate_cube_report()
+                elif choice == '13':
+                    query_menu()
+                elif choice == '14':
+                    view_change_stream()
+                elif choice == '15':
+                    generate_valuation_report()
+                elif choice == '16':
+                    verify_inventory_valuation()
+                elif choice == '17':
+                    generate_pricing_simulation_report()
+                else:
+                    print("Invalid option. Please try again.")
         except Exception as e:
             print(f"Error: {str(e)}")
 
 
+# ==================== WORKLOAD CAPTURE & REPLAY ====================
+
+class ReplayFinished(BaseException):
+    """Raised when a replayed workload runs out of recorded input.
+    
+    Derives from BaseException so the menus' catch-all handlers let it
+    through instead of prompting again.
+    """
+
+
+def current_time() -> float:
+    """
+    Returns the time that sales, holds and other state changes are stamped
+    and evaluated with: the wall clock, or while replaying a workload, the
+    time at which the latest replayed input was recorded. Replays at any
+    speed therefore expire holds, apply promotions and seal sales exactly
+    as the recorded session did.
+    
+    Returns:
+        Seconds since the epoch
+    """
+    if workload_state["mode"] == "replay":
+        return workload_state["clock"]
+    return time.time()
+
+
+def prompt_input(prompt: str = "") -> str:
+    """
+    Reads a line of user input, recording or replaying it as configured.
+    
+    When replaying, inputs come from the log and are paced to their
+    recorded offsets divided by the replay speed (no pacing at speed 0),
+    and the replay clock moves to the time each one was recorded at.
+    Time spent here is excluded from operation latencies.
+    
+    Args:
+        prompt: Message to display to user
+    
+    Returns:
+        Line entered (without the trailing newline)
+    """
+    waiting_since = time.perf_counter()
+    try:
+        if workload_state["mode"] == "replay":
+            position = workload_state["position"]
+            if position >= len(workload_state["events"]):
+                raise ReplayFinished()
+            offset, text = workload_state["events"][position]
+            workload_state["position"] = position + 1
+            workload_state["clock"] = workload_state["recorded"] + offset
+            if workload_state["speed"]:
+                delay = workload_state["started"] + offset / workload_state["speed"] - time.perf_counter()
+                if delay > 0:
+                    time.sleep(delay)
+            print(f"{prompt}{text}")
+            return text
+        
+        text = input(prompt)
+        if workload_state["mode"] == "record":
+            offset = round(time.perf_counter() - workload_state["started"], 4)
+            workload_state["log"].write(json.dumps([offset, text], ensure_ascii=False) + "\n")
+            workload_state["log"].flush()
+        return text
+    finally:
+        waited = time.perf_counter() - waiting_since
+        for operation in workload_state["operations"]:
+            operation["waited"] += waited
+
+
+@contextlib.contextmanager
+def timed_operation(name: str) -> Iterator[None]:
+    """
+    Times one menu operation for the latency report.
+    
+    Operations that only open a submenu are not sampled themselves; the
+    operations chosen inside them are.
+    
+    Args:
+        name: Operation name, e.g. "main:5"
+    """
+    operations = workload_state["operations"]
+    if operations:
+        operations[-1]["submenu"] = True
+    operation = {"waited": 0.0, "submenu": False}
+    operations.append(operation)
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        operations.pop()
+        if workload_state["mode"] != "live" and not operation["submenu"]:
+            elapsed = time.perf_counter() - started - operation["waited"]
+            workload_state["latencies"].setdefault(name, []).append(elapsed)
+
+
+def state_fingerprint() -> str:
+    """
+    Hashes inventory and sales, ignoring wall-clock fields, so that two
+    runs of the same workload can be compared for determinism.
+    
+    Returns:
+        Hex digest
+    """
+    digest = hashlib.sha256()
+    digest.update(json.dumps(sorted(inventory.items()), ensure_ascii=False).encode("utf-8"))
+    for sale in iter_sales():
+        fields = {key: value for key, value in sale.items() if key != 'date'}
+        digest.update(json.dumps(fields, sort_keys=True, ensure_ascii=False).encode("utf-8"))
+    digest.update(json.dumps(sorted(reserved_stock.items())).encode("utf-8"))
+    return digest.hexdigest()
+
+
+def record_workload(path: str) -> None:
+    """
+    Runs the interactive system while capturing every input to a log.
+    
+    The log is newline-delimited JSON: a header, one [offset, text] pair
+    per input, and a footer with the final state fingerprint.
+    
+    Args:
+        path: Log file to write
+    """
+    with open(path, "w", encoding="utf-8") as log:
+        log.write(json.dumps({"version": WORKLOAD_LOG_VERSION, "started": time.time()}) + "\n")
+        workload_state.update(mode="record", log=log, started=time.perf_counter())
+        try:
+            main()
+        finally:
+            duration = time.perf_counter() - workload_state["started"]
+            log.write(json.dumps({"duration": round(duration, 4),
+                                  "fingerprint": state_fingerprint()}) + "\n")
+            workload_state.update(mode="live", log=None)
+    print(f"Workload recorded to {path}")
+    print_latency_report()
+
+
+def replay_workload(path: str, speed: float = 1.0) -> bool:
+    """
+    Re-runs a recorded workload headlessly and reports latencies.
+    
+    Args:
+        path: Log written by record_workload
+        speed: 1.0 for original pacing, 2.0 for twice as fast, 0 for flat-out
+    
+    Returns:
+        True if the final state matches the recording's fingerprint
+    """
+    with open(path, encoding="utf-8") as log:
+        lines = [json.loads(line) for line in log if line.strip()]
+    header, footer = lines[0], lines[-1] if isinstance(lines[-1], dict) else {}
+    if header.get("version") != WORKLOAD_LOG_VERSION:
+        raise ValueError(f"Unsupported workload log version: {header.get('version')}")
+    events = [line for line in lines[1:] if isinstance(line, list)]
+    
+    workload_state.update(mode="replay", events=events, position=0, speed=speed,
+                          recorded=header["started"], clock=header["started"],
+                          started=time.perf_counter())
+    with state_lock:
+        # The wheel starts at the recorded time rather than at process start
+        timing_wheel["tick"] = int(current_time() // RESERVATION_TICK)
+    with open(os.devnull, "w") as devnull, contextlib.redirect_stdout(devnull):
+        try:
+            main()
+        except ReplayFinished:
+            pass
+    duration = time.perf_counter() - workload_state["started"]
+    workload_state["mode"] = "live"
+    
+    fingerprint = state_fingerprint()
+    matches = fingerprint == footer.get("fingerprint")
+    print(f"Replayed {len(events)} inputs in {duration:.3f}s "
+          f"(recorded {footer.get('duration', 0):.3f}s, speed {'flat-out' if not speed else speed})")
+    print_latency_report()
+    if "fingerprint" not in footer:
+        print("Final state: recording has no fingerprint (incomplete log)")
+    else:
+        print(f"Final state: {'matches recording' if matches else 'DIFFERS from recording'}")
+    return matches
+
+
+def print_latency_report() -> None:
+    """Displays latency percentiles for every sampled operation."""
+    print("\n" + "="*72)
+    print("OPERATION LATENCY (ms)".center(72))
+    print("="*72)
+    latencies = workload_state["latencies"]
+    if not latencies:
+        print("No operations recorded.")
+        return
+    
+    print(f"{'Operation':<16} {'Count':<7} {'Mean':<9} {'p50':<9} {'p95':<9} {'p99':<9} {'Max':<9}")
+    print("-"*72)
+    for name, samples in sorted(latencies.items()):
+        ordered = sorted(samples)
+        percentile = lambda q: ordered[min(len(ordered) - 1, int(q * len(ordered)))] * 1000
+        print(f"{name:<16} {len(ordered):<7} {sum(ordered) / len(ordered) * 1000:<9.3f} "
+              f"{percentile(0.50):<9.3f} {percentile(0.95):<9.3f} {percentile(0.99):<9.3f} "
+              f"{ordered[-1] * 1000:<9.3f}")
+    print("="*72)
+
+
 # ==================== MAIN MENU ====================
 
 def display_main_menu() -> None:
@@ -474,7 +5419,11 @@ def display_main_menu() -> None:
     print("5. Register Sale")
     print("6. View Sales History")
     print("7. Generate Reports")
-    print("8. Exit")
+    print("8. Search Catalogue")
+    print("9. Stock Reservations")
+    print("10. Process Return")
+    print("11. Promotions")
+    print("12. Exit")
     print("="*50)
 
 
@@ -487,27 +5436,38 @@ def main() -> None:
     while True:
         try:
             display_main_menu()
-            choice = input("Select an option: ")
+            choice = prompt_input("Select an option: ")
             
-            if choice == '1':
-                view_inventory()
-            elif choice == '2':
-                add_product()
-            elif choice == '3':
-                update_product()
-            elif choice == '4':
-                delete_product()
-            elif choice == '5':
-                register_sale()
-            elif choice == '6':
-                view_sales()
-            elif choice == '7':
-                reports_menu()
-            elif choice == '8':
-                print("\nThank you for using the system. Goodbye!")
-                break
-            else:
-                print("Invalid option. Please select a number between 1 and 8.")
+            with timed_operation(f"main:{choice}"):
+                if choice == '1':
+                    with snapshot_reads():
+                        view_inventory()
+                elif choice == '2':
+                    add_product()
+                elif choice == '3':
+                    update_product()
+                elif choice == '4':
+                    delete_product()
+                elif choice == '5':
+                    register_sale()
+                elif choice == '6':
+                    with snapshot_reads():
+                        view_sales()
+                elif choice == '7':
+                    reports_menu()
+                elif choice == '8':
+                    search_catalogue()
+                elif choice == '9':
+                    reservations_menu()
+                elif choice == '10':
+                    process_return()
+                elif choice == '11':
+                    promotions_menu()
+                elif choice == '12':
+                    print("\nThank you for using the system. Goodbye!")
+                    break
+                else:
+                    print("Invalid option. Please select a number between 1 and 12.")
                 
         except KeyboardInterrupt:
             print("\n\nProgram interrupted by user. Exiting...")
@@ -517,5 +5477,81 @@ def main() -> None:
             print("Please try again.")
 
 
-if _name_ == "_main_":
-    main()
+# Index the pre-loaded inventory and record its first catalogue versions
+rebuild_search_index()
+for _product_id in inventory:
+    record_product_version(_product_id)
+stream_sketches.update(new_stream_sketches())
+inventory_valuation.update(compute_inventory_valuation())
+rolling_windows.extend(new_rolling_window(*window) for window in ROLLING_WINDOWS)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Bookstore inventory and sales system")
+    parser.add_argument("--primary", metavar="PORT", type=int, nargs="?",
+                        const=REPLICATION_PORT, help="ship the mutation log to replicas")
+    parser.add_argument("--replica", metavar="HOST:PORT",
+                        help="run as a read replica of a primary")
+    parser.add_argument("--record", metavar="LOG",
+                        help="capture every input of this session to a workload log")
+    parser.add_argument("--replay", metavar="LOG",
+                        help="re-run a workload log headlessly and report latencies")
+    parser.add_argument("--speed", type=float, default=1.0,
+                        help="replay speed factor (0 = flat-out, default 1.0)")
+    parser.add_argument("--catalogue", metavar="SNAPSHOT",
+                        help="load the inventory from a catalogue snapshot")
+    parser.add_argument("--save-catalogue", metavar="SNAPSHOT",
+                        help="write the current inventory as a catalogue snapshot and exit")
+    parser.add_argument("--receipts", metavar="PATH",
+                        help="append receipts to a file or printer spool instead of the terminal")
+    parser.add_argument("--cdc-file", metavar="PATH", action="append", default=[],
+                        help="stream change events as JSON lines to a file (repeatable)")
+    parser.add_argument("--cdc-socket", metavar="HOST:PORT", action="append", default=[],
+                        help="stream change events to a local consumer that acks each batch (repeatable)")
+    parser.add_argument("--merge-sketches", metavar="PATH", action="append", default=[],
+                        help="add another process's exported dashboard sketches to this one (repeatable)")
+    parser.add_argument("--export-sketches", metavar="PATH",
+                        help="write the dashboard sketches to a file when the session ends")
+    parser.add_argument("--benchmark-money", action="store_true",
+                        help="time summing 10^7 sale totals as float, Decimal and integer cents and exit")
+    parser.add_argument("--benchmark-reads", action="store_true",
+                        help="measure sale throughput while reports run concurrently and exit")
+    parser.add_argument("--benchmark-pricing", action="store_true",
+                        help="time the what-if pricing simulation on a synthetic ledger and exit")
+    parser.add_argument("--benchmark-startup", action="store_true",
+                        help="measure snapshot startup time for growing catalogues and exit")
+    args = parser.parse_args()
+    
+    if args.catalogue:
+        load_catalogue_snapshot(args.catalogue)
+    if args.receipts:
+        start_receipt_writer(args.receipts)
+    for path in args.cdc_file:
+        add_change_subscriber("file", path)
+    for address in args.cdc_socket:
+        add_change_subscriber("socket", address)
+    for path in args.merge_sketches:
+        merge_stream_sketches(path)
+    
+    if args.save_catalogue:
+        write_catalogue_snapshot(args.save_catalogue)
+    elif args.benchmark_startup:
+        benchmark_catalogue_startup()
+    elif args.benchmark_money:
+        benchmark_money_sums()
+    elif args.benchmark_reads:
+        benchmark_snapshot_reads()
+    elif args.benchmark_pricing:
+        benchmark_pricing_simulation()
+    elif args.replica:
+        run_replica(args.replica)
+    elif args.replay:
+        replay_workload(args.replay, args.speed)
+    elif args.record:
+        record_workload(args.record)
+    else:
+        if args.primary is not None:
+            start_primary(args.primary)
+        main()
+    if args.export_sketches:
+        export_stream_sketches(args.export_sketches)
@@ -3,20 +3,33 @@ Inventory and Sales Management System
 Simplified version with all required features
 """
 
+import queue
+import sys
+import threading
 from datetime import datetime
+from decimal import Decimal, InvalidOperation, ROUND_HALF_UP
 
-# Pre-loaded inventory
+# Pre-loaded inventory (prices in cents)
 inventory = {
-    1: {"title": "One Hundred Years of Solitude", "author": "Gabriel García Márquez", "category": "Fiction", "price": 25.99, "stock": 15},
-    2: {"title": "The Alchemist", "author": "Paulo Coelho", "category": "Fiction", "price": 18.50, "stock": 20},
-    3: {"title": "Sapiens", "author": "Yuval Noah Harari", "category": "Non-Fiction", "price": 22.00, "stock": 12},
-    4: {"title": "Educated", "author": "Tara Westover", "category": "Biography", "price": 19.99, "stock": 8},
-    5: {"title": "Becoming", "author": "Michelle Obama", "category": "Biography", "price": 24.99, "stock": 10}
+    1: {"title": "One Hundred Years of Solitude", "author": "Gabriel García Márquez", "category": "Fiction", "price": 2599, "stock": 15},
+    2: {"title": "The Alchemist", "author": "Paulo Coelho", "category": "Fiction", "price": 1850, "stock": 20},
+    3: {"title": "Sapiens", "author": "Yuval Noah Harari", "category": "Non-Fiction", "price": 2200, "stock": 12},
+    4: {"title": "Educated", "author": "Tara Westover", "category": "Biography", "price": 1999, "stock": 8},
+    5: {"title": "Becoming", "author": "Michelle Obama", "category": "Biography", "price": 2499, "stock": 10}
 }
 
 sales = []
 next_id = 6
 
+# Receipts are rendered and printed by a background thread, in batches
+RECEIPT = ("\n" + "="*40 + "\n"
+           "Customer: {customer}\n"
+           "Product: {title}\n"
+           "Quantity: {qty} x ${price} = ${subtotal}\n"
+           "{disc_line}"
+           "TOTAL: ${total}\n" + "="*40 + "\n")
+receipts = queue.Queue(maxsize=100)
+
 # ============ VALIDATION ============
 
 def get_positive_num(msg, typ=float):
@@ -30,6 +43,30 @@ def get_positive_num(msg, typ=float):
         except:
             print("Error: Invalid input")
 
+def to_cents(txt):
+    """Convert a typed amount like '25.99' to integer cents"""
+    try:
+        amount = Decimal(txt.strip().lstrip("$"))
+        return int((amount * 100).quantize(Decimal(1), rounding=ROUND_HALF_UP))
+    except InvalidOperation:
+        raise ValueError(f"Invalid amount: {txt}")
+
+def money(cents):
+    """Format integer cents as '25.99'"""
+    sign = "-" if cents < 0 else ""
+    return f"{sign}{abs(cents) // 100}.{abs(cents) % 100:02d}"
+
+def get_price(msg):
+    """Get and validate positive price in cents"""
+    while True:
+        try:
+            val = to_cents(input(msg))
+            if val > 0:
+                return val
+            print("Error: Must be positive")
+        except:
+            print("Error: Invalid input")
+
 def get_text(msg):
     """Get and validate non-empty text"""
     while True:
@@ -46,7 +83,7 @@ def view_inventory():
     print(f"{'ID':<5} {'Title':<30} {'Author':<20} {'Price':<10} {'Stock':<8}")
     print("-"*80)
     for pid, p in inventory.items():
-        print(f"{pid:<5} {p['title']:<30} {p['author']:<20} ${p['price']:<9.2f} {p['stock']:<8}")
+        print(f"{pid:<5} {p['title']:<30} {p['author']:<20} ${money(p['price']):<9} {p['stock']:<8}")
     print("="*80)
 
 def add_product():
@@ -58,7 +95,7 @@ def add_product():
             "title": get_text("Title: "),
             "author": get_text("Author: "),
             "category": get_text("Category: "),
-            "price": get_positive_num("Price: $"),
+            "price": get_price("Price: $"),
             "stock": int(get_positive_num("Stock: ", int))
         }
         print(f"✓ Product added with ID: {next_id}")
@@ -84,8 +121,8 @@ def update_product():
         author = input(f"Author [{p['author']}]: ").strip()
         if author: p['author'] = author
         
-        price = input(f"Price [${p['price']}]: ").strip()
-        if price: p['price'] = float(price)
+        price = input(f"Price [${money(p['price'])}]: ").strip()
+        if price: p['price'] = to_cents(price)
         
         stock = input(f"Stock [{p['stock']}]: ").strip()
         if stock: p['stock'] = int(stock)
@@ -136,8 +173,9 @@ def register_sale():
             print("Error: Discount must be 0-100")
             return
         
+        # Integer cents; discount rounded half-up via basis points
         subtotal = p['price'] * qty
-        disc_amt = subtotal * (disc / 100)
+        disc_amt = (subtotal * round(disc * 100) + 5000) // 10000
         total = subtotal - disc_amt
         
         sale = {
@@ -158,18 +196,28 @@ def register_sale():
         inventory[pid]['stock'] -= qty
         sales.append(sale)
         
-        print("\n" + "="*40)
-        print(f"Customer: {customer}")
-        print(f"Product: {p['title']}")
-        print(f"Quantity: {qty} x ${p['price']:.2f} = ${subtotal:.2f}")
-        if disc > 0:
-            print(f"Discount ({disc}%): -${disc_amt:.2f}")
-        print(f"TOTAL: ${total:.2f}")
-        print("="*40)
         print("✓ Sale registered")
+        receipts.put(sale)  # Blocks only if the printer falls 100 receipts behind
     except Exception as e:
         print(f"Error: {e}")
 
+def render_receipt(s):
+    """Fill the receipt template for a sale"""
+    disc_line = f"Discount ({s['disc_pct']}%): -${money(s['disc_amt'])}\n" if s['disc_pct'] > 0 else ""
+    return RECEIPT.format(customer=s['customer'], title=s['title'], qty=s['qty'], price=money(s['price']),
+                          subtotal=money(s['subtotal']), disc_line=disc_line, total=money(s['total']))
+
+def print_receipts():
+    """Background printer: write whatever receipts are queued in one go"""
+    while True:
+        batch = [receipts.get()]
+        while len(batch) < 32 and not receipts.empty():
+            batch.append(receipts.get())
+        sys.stdout.write("".join(map(render_receipt, batch)))
+        sys.stdout.flush()
+        for _ in batch:
+            receipts.task_done()
+
 def view_sales():
     """Display sales history"""
     print("\n" + "="*90)
@@ -180,7 +228,7 @@ def view_sales():
     print(f"{'ID':<5} {'Customer':<15} {'Product':<25} {'Qty':<5} {'Total':<12} {'Date':<20}")
     print("-"*90)
     for s in sales:
-        print(f"{s['id']:<5} {s['customer']:<15} {s['title']:<25} {s['qty']:<5} ${s['total']:<11.2f} {s['date']:<20}")
+        print(f"{s['id']:<5} {s['customer']:<15} {s['title']:<25} {s['qty']:<5} ${money(s['total']):<11} {s['date']:<20}")
     print("="*90)
 
 # ============ REPORTS ============
@@ -207,7 +255,7 @@ def top_products():
     print(f"{'Rank':<6} {'Product':<30} {'Units':<10} {'Revenue':<12}")
     print("-"*60)
     for i, (pid, data) in enumerate(top3, 1):
-        print(f"{i:<6} {data['title']:<30} {data['qty']:<10} ${data['revenue']:<11.2f}")
+        print(f"{i:<6} {data['title']:<30} {data['qty']:<10} ${money(data['revenue']):<11}")
 
 def sales_by_author():
     """Sales grouped by author"""
@@ -229,7 +277,7 @@ def sales_by_author():
     print(f"{'Author':<25} {'Units':<8} {'Gross':<12} {'Net':<12} {'Discount':<10}")
     print("-"*70)
     for author, data in sorted(author_data.items(), key=lambda x: x[1]['net'], reverse=True):
-        print(f"{author:<25} {data['units']:<8} ${data['gross']:<11.2f} ${data['net']:<11.2f} ${data['disc']:<9.2f}")
+        print(f"{author:<25} {data['units']:<8} ${money(data['gross']):<11} ${money(data['net']):<11} ${money(data['disc']):<9}")
 
 def financial_summary():
     """Calculate gross and net income"""
@@ -244,9 +292,9 @@ def financial_summary():
     units = sum(map(lambda s: s['qty'], sales))
     
     print(f"Total Units: {units}")
-    print(f"Gross Revenue: ${gross:.2f}")
-    print(f"Discounts: ${disc:.2f}")
-    print(f"Net Revenue: ${net:.2f}")
+    print(f"Gross Revenue: ${money(gross)}")
+    print(f"Discounts: ${money(disc)}")
+    print(f"Net Revenue: ${money(net)}")
 
 def reports_menu():
     """Reports submenu"""
@@ -272,9 +320,11 @@ def reports_menu():
 def main():
     """Main program"""
     print("\n=== INVENTORY & SALES SYSTEM ===")
+    threading.Thread(target=print_receipts, daemon=True).start()
     
     while True:
         try:
+            receipts.join()  # Let pending receipts print before the menu
             print("\n=== MAIN MENU ===")
             print("1. View Inventory")
             print("2. Add Product")
@@ -312,5 +362,5 @@ def main():
         except Exception as e:
             print(f"Error: {e}")
 
-if _name_ == "_main_":
+if __name__ == "__main__":
     main()
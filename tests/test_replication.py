@@ -0,0 +1,215 @@
+"""
+Log-shipping replication across real processes: a --primary process takes
+sales through its menu while --replica processes follow its log, and the
+replicas' reports and lag are checked against the primary.
+"""
+
+import importlib.util
+import json
+import os
+import queue
+import re
+import socket
+import subprocess
+import sys
+import threading
+import time
+import unittest
+
+SCRIPT = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "2.py")
+TIMEOUT = 20.0
+REPLICAS = 2
+
+
+def free_port() -> int:
+    """Returns a local TCP port that is currently free."""
+    with socket.socket() as probe:
+        probe.bind(("127.0.0.1", 0))
+        return probe.getsockname()[1]
+
+
+class MenuProcess:
+    """A copy of the system driven through its menus over stdin/stdout."""
+
+    def __init__(self, *args: str):
+        self.process = subprocess.Popen([sys.executable, "-u", SCRIPT, *args],
+                                        stdin=subprocess.PIPE, stdout=subprocess.PIPE,
+                                        stderr=subprocess.STDOUT, text=True, encoding="utf-8")
+        self.lines: "queue.Queue[str]" = queue.Queue()
+        threading.Thread(target=self._read, daemon=True).start()
+
+    def _read(self) -> None:
+        for line in self.process.stdout:
+            self.lines.put(line.rstrip("\n"))
+
+    def send(self, *inputs: str) -> None:
+        """Types one line per input."""
+        self.process.stdin.write("".join(f"{text}\n" for text in inputs))
+        self.process.stdin.flush()
+
+    def expect(self, pattern: str) -> re.Match:
+        """Reads output until a line matches the pattern."""
+        deadline = time.monotonic() + TIMEOUT
+        while True:
+            try:
+                line = self.lines.get(timeout=max(0.0, deadline - time.monotonic()))
+            except queue.Empty:
+                raise AssertionError(f"Timed out waiting for {pattern!r}")
+            match = re.search(pattern, line)
+            if match:
+                return match
+
+    def financial_summary(self) -> list:
+        """Runs the financial summary report (already in the reports menu)."""
+        self.send("3")
+        self.expect("FINANCIAL SUMMARY")
+        self.expect("^=+$")
+        summary = []
+        while True:
+            line = self.lines.get(timeout=TIMEOUT)
+            if re.match("^=+$", line):
+                return summary
+            summary.append(line)
+
+    def close(self) -> None:
+        self.process.kill()
+        self.process.wait()
+        self.process.stdin.close()
+        self.process.stdout.close()
+
+
+class ReplicationTest(unittest.TestCase):
+
+    def setUp(self):
+        port = free_port()
+        self.primary = MenuProcess("--primary", str(port))
+        self.addCleanup(self.primary.close)
+        self.primary.expect("Primary listening")
+
+        self.replicas = []
+        for _ in range(REPLICAS):
+            replica = MenuProcess("--replica", f"127.0.0.1:{port}")
+            self.addCleanup(replica.close)
+            replica.expect("Replica following primary")
+            self.replicas.append(replica)
+
+    def register_sale(self, customer: str, product_id: int, quantity: int, discount: float):
+        self.primary.send("5", customer, str(product_id), str(quantity), str(discount))
+        self.primary.expect("Sale registered successfully")
+
+    def wait_until_caught_up(self, replica: MenuProcess, seq: int) -> re.Match:
+        deadline = time.monotonic() + TIMEOUT
+        while True:
+            replica.send("9")
+            status = replica.expect(r"Applied: (\d+) / (\d+) \(lag (\d+) entries")
+            if int(status.group(1)) == seq or time.monotonic() > deadline:
+                return status
+            time.sleep(0.1)
+
+    def test_replicas_match_primary(self):
+        self.register_sale("Ann", 1, 2, 10)
+        self.register_sale("Bob", 3, 1, 0)
+        self.register_sale("Ann", 2, 4, 25)
+
+        self.primary.send("7", "9")
+        seq = int(self.primary.expect(r"Log Entries: (\d+)").group(1))
+        self.assertEqual(seq, 3)
+        expected = self.primary.financial_summary()
+        self.assertIn("Total Units Sold: 7", expected)
+
+        for replica in self.replicas:
+            status = self.wait_until_caught_up(replica, seq)
+            self.assertEqual([int(group) for group in status.groups()], [seq, seq, 0])
+            self.assertEqual(replica.financial_summary(), expected)
+
+    def test_replica_follows_later_sales(self):
+        self.register_sale("Ann", 1, 1, 0)
+        for replica in self.replicas:
+            self.wait_until_caught_up(replica, 1)
+
+        self.register_sale("Cid", 5, 3, 5)
+        self.primary.send("7")
+        expected = self.primary.financial_summary()
+        for replica in self.replicas:
+            status = self.wait_until_caught_up(replica, 2)
+            self.assertEqual(int(status.group(3)), 0)
+            self.assertEqual(replica.financial_summary(), expected)
+
+
+def load_system():
+    """Imports a fresh, independent copy of the system as a module."""
+    spec = importlib.util.spec_from_file_location(f"shop_{time.perf_counter_ns()}", SCRIPT)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+class CheckpointTest(unittest.TestCase):
+    """A replica behind the truncated log catches up from a checkpoint."""
+
+    def setUp(self):
+        self.primary = load_system()
+        self.primary.MUTATION_LOG_RETAIN = 50
+        for product_id in range(1, 6):
+            self.primary.commit_mutation({"op": "update_product", "product_id": product_id,
+                                          "changes": {"stock": 1000}})
+        # Sales spread over four months, so older ones are sealed into segments
+        now = time.time()
+        for i in range(300):
+            timestamp = now - (300 - i) * 36000
+            product = self.primary.inventory[i % 5 + 1]
+            subtotal, discount_amount, total = self.primary.calculate_sale_totals(
+                product['price'], 1, 10 * (i % 3))
+            self.primary.commit_mutation({"op": "sale", "ts": timestamp, "request_id": f"r{i}", "sale": {
+                "sale_id": i + 1, "customer": f"Customer {i % 7}", "product_id": i % 5 + 1,
+                "product_title": product['title'], "author": product['author'],
+                "category": product['category'], "quantity": 1, "unit_price": product['price'],
+                "subtotal": subtotal, "discount_percent": 10 * (i % 3),
+                "discount_amount": discount_amount, "total": total, "promotion": None,
+                "date": time.strftime(self.primary.DATE_FORMAT, time.localtime(timestamp))}})
+        self.primary.reserve_stock(2, 3)
+
+    def catch_up(self, replica):
+        checkpoint, entries = self.primary.read_mutation_log(replica.log_head())
+        if checkpoint is not None:
+            replica.load_checkpoint(json.loads(json.dumps(checkpoint)))
+        for entry in entries:
+            replica.commit_mutation(json.loads(json.dumps(entry)))
+
+    def test_replica_bootstraps_from_checkpoint(self):
+        self.assertGreater(self.primary.log_state["base"], 0)
+        self.assertTrue(self.primary.sales_segments)
+        replica = load_system()
+        replica.replication_state["role"] = "replica"
+        self.catch_up(replica)
+        self.assertEqual(replica.log_head(), self.primary.log_head())
+
+        self.primary.create_sale("Ann", 3, 2, 5, request_id="late")
+        self.primary.confirm_reservation(1, "Bob")
+        self.catch_up(replica)
+
+        self.assertEqual(replica.state_fingerprint(), self.primary.state_fingerprint())
+        self.assertEqual(replica.sales_summary(), self.primary.sales_summary())
+        self.assertEqual(replica.query_cube(["month", "customer"]),
+                         self.primary.query_cube(["month", "customer"]))
+        self.assertEqual(replica.find_sale_request("r10")["sale_id"], 11)
+
+    def test_checkpoint_excludes_sales_committed_before_sending(self):
+        replica = load_system()
+        replica.replication_state["role"] = "replica"
+        checkpoint, entries = self.primary.read_mutation_log(replica.log_head())
+        self.assertIsNotNone(checkpoint)
+        # Committed after the checkpoint was read, but before it is sent
+        self.primary.create_sale("Ann", 3, 1, 0, request_id="between")
+        replica.load_checkpoint(json.loads(json.dumps(checkpoint)))
+        for entry in entries:
+            replica.commit_mutation(json.loads(json.dumps(entry)))
+        self.catch_up(replica)
+
+        self.assertEqual(replica.log_head(), self.primary.log_head())
+        self.assertEqual(len(list(replica.iter_sales())), len(list(self.primary.iter_sales())))
+        self.assertEqual(replica.state_fingerprint(), self.primary.state_fingerprint())
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,48 @@
+"""
+Dashboard sketches merged across processes: two tills export their
+sketches when their sessions end, and a third process merges both.
+"""
+
+import os
+import tempfile
+import unittest
+
+from test_replication import TIMEOUT, MenuProcess
+
+
+class SketchMergeTest(unittest.TestCase):
+
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.directory = directory.name
+
+    def run_till(self, name: str, sales: list) -> str:
+        """Registers sales in a fresh process and returns its exported sketches."""
+        path = os.path.join(self.directory, f"{name}.json")
+        till = MenuProcess("--export-sketches", path)
+        self.addCleanup(till.close)
+        for customer, product_id, quantity in sales:
+            till.send("5", customer, str(product_id), str(quantity), "0")
+            till.expect("Sale registered successfully")
+        till.send("12")
+        self.assertEqual(till.process.wait(timeout=TIMEOUT), 0)
+        return path
+
+    def test_merged_dashboard_counts_both_processes(self):
+        first = self.run_till("first", [("Ann", 1, 2), ("Bob", 3, 1)])
+        second = self.run_till("second", [("Cid", 3, 4), ("Ann", 2, 1)])
+
+        merged = MenuProcess("--merge-sketches", first, "--merge-sketches", second)
+        self.addCleanup(merged.close)
+        merged.send("7", "6")
+        totals = merged.expect(r"Units Sold: (\d+)\s+Distinct Customers: ~(\d+)")
+        self.assertEqual([int(group) for group in totals.groups()], [8, 3])
+        merged.expect("^Product")
+        merged.expect("^-+$")
+        top = merged.expect(r"^(\S.*?)\s+(\d+)\s+(\d+)\s*$")
+        self.assertEqual((top.group(1), int(top.group(2))), ("Sapiens", 5))
+
+
+if __name__ == "__main__":
+    unittest.main()